@@ -28,13 +28,17 @@ inspection capabilities.
 """
 __author__ = u"Andr\xe9 Malo"
 __license__ = "Apache License, Version 2.0"
-__version__ = "0.6.9"
 
 from gensaschema import _util
+from gensaschema._version import __version__  # noqa
 from gensaschema._exceptions import *  # noqa pylint: disable = redefined-builtin, wildcard-import
 
-from gensaschema._config import Config  # noqa
+from gensaschema._config import Config, ConfigError  # noqa
+from gensaschema._observe import Event, Recorder  # noqa
+from gensaschema._plan import Plan  # noqa
+from gensaschema._reflect import ReflectionContext, TypeRegistry  # noqa
 from gensaschema._schema import Schema  # noqa
+from gensaschema._snapshot import SnapshotError  # noqa
 from gensaschema._symbols import Symbols, SymbolException  # noqa
 from gensaschema._type import Type  # noqa
 
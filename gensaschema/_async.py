@@ -0,0 +1,250 @@
+# -*- coding: ascii -*-
+u"""
+==================
+ Async reflection
+==================
+
+Reflection front-end for asyncio engines (Python 3 only).
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import asyncio as _asyncio
+import contextlib as _contextlib
+
+import sqlalchemy as _sa
+
+from . import _bulk
+from . import _meta
+from . import _pattern
+from . import _reflect
+
+#: Warning policy shared by the running reflections (see `_warning_policy`)
+#:
+#: :Type: dict
+_POLICY = dict(depth=0, context=None)
+
+
+async def reflect(
+    cls,
+    engine,
+    tables,
+    schemas,
+    symbols,
+    dbname=None,
+    types=None,
+    concurrency=8,
+):
+    """
+    Reflect a schema over an async engine
+
+    The warning policy is installed while the types are preloaded, while
+    a catalog query runs and while the tables are built. Unknown types found
+    while fetching are fed to the type loader between the rounds, and the
+    failed queries are run again. Note that the policy is process wide, so
+    other tasks of the event loop see it while the catalog queries run. It's
+    removed as soon as no reflection needs it anymore.
+
+    Parameters:
+      cls (type):
+        Schema class to instantiate
+
+      engine (sqlalchemy.ext.asyncio.AsyncEngine):
+        Async engine
+
+      tables (list):
+        List of tables to reflect, (local name, table name) pairs. Patterns
+        are expanded.
+
+      schemas (dict):
+        schema -> module mapping
+
+      symbols (Symbols):
+        Symbol table
+
+      dbname (str):
+        Optional db identifier
+
+      types (callable):
+        Extra type loader
+
+      concurrency (int):
+        Maximum number of concurrently running catalog queries
+
+    Returns:
+      Schema: New schema instance
+
+    Raises:
+      NotImplementedError: Bulk reflection is not available
+    """
+    if not _bulk.AVAILABLE:
+        raise NotImplementedError("Async reflection requires SQLAlchemy 2.0+")
+
+    tables = list(tables)
+    if any(_pattern.is_pattern(name) for _, name in tables):
+        async with engine.connect() as conn:
+            tables = await conn.run_sync(
+                lambda sync_conn: _pattern.expand(sync_conn, tables)
+            )
+    if types is not None and not isinstance(types, _reflect.TypeRegistry):
+        types = _reflect.TypeRegistry(types)
+    metadata = _meta.BoundMetaData(engine.sync_engine)
+    reflector = _bulk.BulkReflector(metadata, symbols, types=types)
+    with _warning_policy():
+        reflector.preload()
+    await _collect(
+        engine,
+        reflector,
+        [_reflect.split_name(name) for _, name in tables],
+        concurrency,
+    )
+
+    result = cls.__new__(cls)
+
+    def build(sync_conn):
+        """Build the schema from the collected information"""
+        metadata.bind = sync_conn
+        with _warning_policy():
+            # pylint: disable = protected-access
+            result._build(
+                metadata,
+                tables,
+                schemas,
+                symbols,
+                dbname,
+                types=types,
+                reflector=reflector,
+            )
+
+    try:
+        async with engine.connect() as conn:
+            await conn.run_sync(build)
+    finally:
+        metadata.bind = engine.sync_engine
+    return result
+
+
+async def _collect(engine, reflector, keys, concurrency):
+    """
+    Collect the catalog information of the tables and their foreign key
+    targets
+
+    Parameters:
+      engine (sqlalchemy.ext.asyncio.AsyncEngine):
+        Async engine
+
+      reflector (BulkReflector):
+        Reflector
+
+      keys (list):
+        Table keys (schema, name)
+
+      concurrency (int):
+        Maximum number of concurrently running catalog queries
+    """
+    semaphore = _asyncio.Semaphore(max(1, concurrency))
+
+    def fetch_sync(sync_conn, schema, names):
+        """Fetch with the warning policy installed"""
+        with _warning_policy():
+            return reflector.fetch(_sa.inspect(sync_conn), schema, names)
+
+    async def fetch(schema, names):
+        """Fetch on a pooled connection"""
+        async with semaphore:
+            async with engine.connect() as conn:
+                return await conn.run_sync(fetch_sync, schema, names)
+
+    jobs = reflector.jobs(keys, concurrency)
+    while jobs:
+        jobs = reflector.jobs(
+            reflector.collect(await _fetch_all(reflector, fetch, jobs)),
+            concurrency,
+        )
+
+
+async def _fetch_all(reflector, fetch, jobs):
+    """
+    Run fetch jobs concurrently
+
+    The type loader is only called while no job is running.
+
+    Parameters:
+      reflector (BulkReflector):
+        Reflector
+
+      fetch (callable):
+        Fetch coroutine function
+
+      jobs (list):
+        Jobs (list of (schema, names) tuples)
+
+    Returns:
+      list: Collected information per job (``_ReflectionInfo``)
+    """
+    results = [None] * len(jobs)
+    seen = [set() for _ in jobs]
+    todo = list(range(len(jobs)))
+    while todo:
+        done = await _asyncio.gather(
+            *[fetch(*jobs[idx]) for idx in todo], return_exceptions=True
+        )
+        failed = []
+        for idx, result in zip(todo, done):
+            if isinstance(result, _sa.exc.SAWarning):
+                failed.append((idx, result))
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                results[idx] = result
+
+        todo = []
+        with _warning_policy():
+            for idx, e in failed:
+                reflector.recover(e, seen[idx])
+                todo.append(idx)
+    return results
+
+
+@_contextlib.contextmanager
+def _warning_policy():
+    """
+    Install the warning policy for the current reflection step
+
+    The sync code run by ``run_sync`` gives control back to the event loop
+    while waiting for the database, so the steps of concurrent reflections
+    interleave. The policy is therefore installed by the first step entering
+    and removed by the last step leaving, no matter which one that is.
+    Never hold it across an ``await``.
+    """
+    if not _POLICY["depth"]:
+        context = _reflect.warning_policy()
+        context.__enter__()  # pylint: disable = unnecessary-dunder-call
+        _POLICY["context"] = context
+    _POLICY["depth"] += 1
+    try:
+        yield
+    finally:
+        _POLICY["depth"] -= 1
+        if not _POLICY["depth"]:
+            context, _POLICY["context"] = _POLICY["context"], None
+            context.__exit__(None, None, None)
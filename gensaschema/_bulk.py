@@ -0,0 +1,1073 @@
+# -*- coding: ascii -*-
+u"""
+=================
+ Bulk reflection
+=================
+
+Batched catalog reflection, based on the multi reflection API of
+SQLAlchemy 2.0.
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import inspect as _inspect
+import logging as _logging
+
+import sqlalchemy as _sa
+
+from . import _cache
+from . import _meta
+from . import _observe
+from . import _reflect
+from . import _snapshot
+from . import _sqlite
+
+try:
+    from sqlalchemy.engine import reflection as _sa_reflection
+except ImportError:  # pragma: no cover
+    _sa_reflection = None
+
+logger = _logging.getLogger(__name__)
+
+
+#: Fields of the collected catalog information, which are keyed by table
+#:
+#: :Type: tuple
+INFO_FIELDS = (
+    "columns",
+    "pk_constraint",
+    "foreign_keys",
+    "indexes",
+    "unique_constraints",
+    "table_comment",
+    "check_constraints",
+    "table_options",
+)
+
+#: Fields, which are not supported by all dialects
+#:
+#: :Type: frozenset
+_OPTIONAL_FIELDS = frozenset(
+    [
+        "unique_constraints",
+        "table_comment",
+        "check_constraints",
+        "table_options",
+    ]
+)
+
+#: Reflection profiles (name -> fields to fetch). The lean profile fetches
+#: only what's needed for the generated code. Indexes, comments and table
+#: options are never emitted, check constraints are dropped.
+#:
+#: :Type: dict
+PROFILES = {
+    "full": INFO_FIELDS,
+    "lean": (
+        "columns",
+        "pk_constraint",
+        "foreign_keys",
+        "unique_constraints",
+    ),
+}
+
+#: Fields fetched for boundary tables (see `BulkReflector`)
+#:
+#: :Type: tuple
+_BOUNDARY_FIELDS = ("columns", "pk_constraint")
+
+
+def _probe(reflection, table):
+    """
+    Check if tables can be built from collected catalog information
+
+    That needs the multi reflection API and SQLAlchemy's private
+    ``_ReflectionInfo`` container, which is passed to the (equally private)
+    ``_reflect_info`` argument of ``Table``. Both exist since SQLAlchemy 2.0
+    only. Their signatures are checked, so changes in later versions lead
+    to the autoloading fallback instead of failures inside ``Table``.
+
+    Parameters:
+      reflection (module):
+        SQLAlchemy's reflection module (or ``None``)
+
+      table (type):
+        SQLAlchemy's table class
+
+    Returns:
+      bool: Available?
+    """
+    inspector = getattr(reflection, "Inspector", None)
+    info = getattr(reflection, "_ReflectionInfo", None)
+    autoload = getattr(table, "_autoload", None)
+    if (
+        not hasattr(inspector, "get_multi_columns")
+        or info is None
+        or autoload is None
+        or not hasattr(_inspect, "signature")
+    ):
+        return False
+
+    try:
+        # pylint: disable = no-member
+        fields = _inspect.signature(info).parameters
+        params = _inspect.signature(autoload).parameters
+    except (TypeError, ValueError):
+        return False
+    expected = set(INFO_FIELDS) | set(["unreflectable"])
+    return (
+        "_reflect_info" in params
+        and expected <= set(fields)
+        and all(
+            name in expected or param.default is not param.empty
+            for name, param in fields.items()
+        )
+    )
+
+
+#: Can tables be built from collected catalog information (see `_probe`)?
+#: If not, the tables are autoloaded one by one.
+#:
+#: :Type: bool
+AVAILABLE = _probe(_sa_reflection, _sa.Table)
+
+
+def make_info(tables=None):
+    """
+    Create catalog information container
+
+    Parameters:
+      tables (dict):
+        Per table information (table key -> dict, as returned by
+        `table_info`). If omitted or ``None``, the container is empty.
+
+    Returns:
+      _ReflectionInfo: New container
+
+    Raises:
+      NotImplementedError: Bulk reflection is not available
+    """
+    fields = dict((field, {}) for field in INFO_FIELDS)
+    for key, slices in (tables or {}).items():
+        for field, value in slices.items():
+            fields[field][key] = value
+    return _new_info(fields, {})
+
+
+def _new_info(fields, unreflectable):
+    """
+    Create catalog information container from per field information
+
+    That's the only place instantiating SQLAlchemy's private
+    ``_ReflectionInfo``, which is passed to the (equally private)
+    ``_reflect_info`` argument of ``Table`` later on (see `AVAILABLE`).
+
+    Parameters:
+      fields (dict):
+        Field -> (table key -> value) mapping
+
+      unreflectable (dict):
+        Table key -> exception mapping
+
+    Returns:
+      _ReflectionInfo: New container
+
+    Raises:
+      NotImplementedError: Bulk reflection is not available
+    """
+    if not AVAILABLE:
+        raise NotImplementedError(
+            "Collecting catalog information requires SQLAlchemy 2.0+"
+        )
+    # pylint: disable = protected-access
+    return _sa_reflection._ReflectionInfo(
+        unreflectable=unreflectable, **fields
+    )
+
+
+def table_info(info, key):
+    """
+    Extract the catalog information of a single table
+
+    Parameters:
+      info (_ReflectionInfo):
+        Catalog information
+
+      key (tuple):
+        Table key (schema, name)
+
+    Returns:
+      dict: Field -> value mapping. Fields not present for the table are
+      left out.
+    """
+    result = {}
+    for field in INFO_FIELDS:
+        values = getattr(info, field)
+        if key in values:
+            result[field] = values[key]
+    return result
+
+
+class BulkReflector(object):
+    """
+    Batched table reflector
+
+    Instead of autoloading the tables one by one, the catalog information
+    for all requested tables is fetched using the inspector's ``get_multi_*``
+    methods (one set of queries per schema). Foreign key targets are
+    collected the same way, level by level. The tables are built from the
+    collected information afterwards.
+
+    The catalog queries may be spread over several pooled connections and
+    run in parallel. The results are merged in a fixed order, so the outcome
+    does not depend on the timing.
+
+    Tables of schemas configured as shallow are not reflected at all.
+    Instead, stubs are built, containing just the foreign key target columns
+    (typed as ``NullType``). That's sufficient for tables which end up as
+    `TableReference`.
+
+    By default, only the catalog information needed for the generated code
+    is fetched (the "lean" profile, see `PROFILES`). Of boundary tables only
+    the columns and the primary key are fetched, so their foreign keys are
+    not followed. Built boundary tables are flagged in their ``info``
+    dict (see ``_meta.BOUNDARY``).
+
+    With SQLAlchemy versions lacking the multi reflection API (before 2.0)
+    or not matching the private parts used (see `AVAILABLE`), the tables
+    are autoloaded one by one. The options depending on the
+    collected information (`max_workers`, `cache`, `shallow`, `profile` and
+    `boundary`) are rejected there.
+
+    Attributes:
+      _metadata (SA (bound) metadata):
+        Metadata container
+
+      _symbols (Symbols):
+        Symbol table
+
+      _types (TypeRegistry):
+        Type loader (or ``None``)
+
+      _max_workers (int):
+        Maximum number of parallel fetch jobs
+
+      _cache (ReflectionCache):
+        Reflection cache or ``None``
+
+      _seen (set):
+        Type names already fed to the type loader
+
+      _fingerprints (dict):
+        Table key -> catalog fingerprint
+
+      _info (_ReflectionInfo):
+        Collected catalog information (or ``None``). Released tables are
+        dropped from it.
+
+      _collected (set):
+        Keys of the tables collected so far (including the released ones)
+
+      _done (set):
+        Table keys already asked for
+
+      _shallow (frozenset):
+        Schemas whose tables are stubbed
+
+      _stubs (dict):
+        Table key -> set of column names, for the tables to be stubbed
+
+      _profile (str):
+        Reflection profile name
+
+      _boundary (frozenset):
+        Keys of the tables to reflect lightly
+
+      _visited (set):
+        Metadata keys of the built tables checked for the boundary flag
+
+      _dialect (sqlalchemy.engine.Dialect):
+        Prefetching dialect for the inspectors or ``None``
+    """
+
+    # pylint: disable = too-many-instance-attributes
+
+    def __init__(
+        self,
+        metadata,
+        symbols,
+        types=None,
+        max_workers=None,
+        cache=None,
+        shallow=None,
+        profile=None,
+        boundary=None,
+        prefetch=False,
+    ):
+        """
+        Initialization
+
+        Parameters:
+          metadata (SA (bound) metadata):
+            Metadata container
+
+          symbols (Symbols):
+            Symbol table
+
+          types (callable):
+            Extra type loader. If the type reflection fails, because
+            SQLAlchemy cannot resolve it, the type loader will be called with
+            the type name, (bound) metadata and the symbol table. It is
+            responsible for modifying the symbols and imports *and* the
+            dialect's ``ischema_names``. If omitted or ``None``, the reflector
+            will always fail on unknown types. Plain loaders are wrapped into
+            a `TypeRegistry`.
+
+          max_workers (int):
+            Maximum number of parallel fetch jobs. Each job runs on its own
+            connection checked out from the engine's pool, so the pool should
+            be at least that large. If omitted, ``None`` or less than 2, all
+            catalog queries run serially on the bound connection.
+
+          cache (ReflectionCache):
+            Reflection cache. If omitted or ``None``, no cache is used.
+
+          shallow (iterable):
+            Schemas whose tables are stubbed instead of reflected. If omitted
+            or ``None``, all tables are reflected.
+
+          profile (str):
+            Reflection profile name (key of `PROFILES`). If omitted or
+            ``None``, the "lean" profile is used.
+
+          boundary (iterable):
+            Keys (schema, name) of the tables to reflect lightly, i.e.
+            without foreign keys and further constraints (see the
+            ``Plan``). If omitted or ``None``, all tables are reflected
+            according to the profile.
+
+          prefetch (bool):
+            Read the SQLite catalog in bulk (see ``_sqlite.prefetching``)?
+            This mostly helps with the autoloading fallback. If omitted or
+            false, the catalog is read by the dialect as usual.
+
+        Raises:
+          KeyError: Unknown profile
+
+          NotImplementedError: An option was passed, which needs bulk
+          reflection, but it's not available
+        """
+        if not AVAILABLE:
+            unsupported = [
+                name
+                for name, value in (
+                    ("max_workers", max_workers),
+                    ("cache", cache),
+                    ("shallow", shallow),
+                    ("profile", profile),
+                    ("boundary", boundary),
+                )
+                if value is not None
+            ]
+            if unsupported:
+                raise NotImplementedError(
+                    "Reflection option(s) %s require SQLAlchemy 2.0+"
+                    % (", ".join(unsupported),)
+                )
+
+        self._metadata = metadata
+        self._symbols = symbols
+        if types is not None and not isinstance(types, _reflect.TypeRegistry):
+            types = _reflect.TypeRegistry(types)
+        self._types = types
+        self._max_workers = max_workers
+        self._cache = cache
+        self._seen = set()
+        self._fingerprints = {}
+        self._info = None
+        self._collected = set()
+        self._done = set()
+        self._shallow = frozenset(shallow or ())
+        self._stubs = {}
+        self._profile = "lean" if profile is None else profile
+        if self._profile not in PROFILES:
+            raise KeyError("Unknown reflection profile %r" % (profile,))
+        self._boundary = frozenset(boundary or ())
+        self._visited = set()
+        self._dialect = (
+            _sqlite.prefetching(metadata.bind.dialect) if prefetch else None
+        )
+
+    def reflect(self, names):
+        """
+        Reflect tables
+
+        Parameters:
+          names (iterable):
+            Table names (possibly qualified)
+
+        Returns:
+          list: SA tables, in the order of `names`
+        """
+        keys = list(map(_reflect.split_name, names))
+        with _reflect.warning_policy():
+            self.prepare(keys)
+            return [self.table(key) for key in keys]
+
+    def prepare(self, keys):
+        """
+        Collect the catalog information of the tables and their foreign key
+        targets
+
+        Must be called with the warning policy installed.
+
+        Parameters:
+          keys (iterable):
+            Table keys (schema, name)
+
+        Returns:
+          bool: Was the information collected? If false, bulk reflection is
+          not available and the tables are autoloaded one by one.
+        """
+        self.preload()
+        if not AVAILABLE:
+            self._info = None
+            return False
+
+        inspector = _sqlite.inspect(self._metadata.bind, self._dialect)
+
+        with _observe.timed("collect"):
+            jobs = self.jobs(keys, self._max_workers)
+            while jobs:
+                jobs = self.jobs(
+                    self.collect(self._fetch_all(inspector, jobs)),
+                    self._max_workers,
+                )
+            self.stubs()
+        return True
+
+    def collected(self, key):
+        """
+        Check if the catalog information of a table was collected
+
+        Tables, which are stubbed or were in the metadata before, are not
+        collected.
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+        Returns:
+          bool: Collected?
+        """
+        return key in self._collected
+
+    def targets(self, key):
+        """
+        Find the foreign key targets of a collected table
+
+        The table must not be released yet.
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+        Returns:
+          list: Target table keys (schema, name)
+        """
+        if self._info is None:
+            return []
+        return [
+            (fkey["referred_schema"], fkey["referred_table"])
+            for fkey in self._info.foreign_keys.get(key, ())
+        ]
+
+    def table(self, key, resolve_fks=True):
+        """
+        Build a single table
+
+        Must be called with the warning policy installed, after `prepare`.
+        Unknown types are fed to the type loader.
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+          resolve_fks (bool):
+            Build the foreign key targets as well?
+
+        Returns:
+          sqlalchemy.Table: The table
+        """
+        with _observe.timed("reflect", ".".join(filter(None, key))):
+            result = self.retry(self._table, key, resolve_fks)
+        if self._boundary:
+            self._mark(result)
+        return result
+
+    def _mark(self, sa_table):
+        """
+        Flag the boundary tables among a built table and its foreign key
+        targets
+
+        The targets are built by SQLAlchemy, so they are found by walking the
+        foreign keys. Every table is checked once. Targets not built yet are
+        checked when they are.
+
+        Parameters:
+          sa_table (sqlalchemy.Table):
+            Built table
+        """
+        tables = self._metadata.tables
+        todo = [sa_table]
+        while todo:
+            sa_table = todo.pop()
+            if sa_table.key in self._visited:
+                continue
+            self._visited.add(sa_table.key)
+            if (sa_table.schema, sa_table.name) in self._boundary:
+                sa_table.info[_meta.BOUNDARY] = True
+            for fkey in sa_table.foreign_keys:
+                # schema.table.column -> metadata key
+                target = tables.get(fkey.target_fullname.rsplit(".", 1)[0])
+                if target is not None:
+                    todo.append(target)
+
+    def release(self, key):
+        """
+        Drop the catalog information of a built table
+
+        The table cannot be built again afterwards (it's taken from the
+        metadata, as long as it's there).
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+        """
+        if self._info is None:
+            return
+        for field in INFO_FIELDS:
+            getattr(self._info, field).pop(key, None)
+        self._info.unreflectable.pop(key, None)
+
+    def preload(self):
+        """
+        Preload the known types of the type registry
+
+        Raises:
+          sqlalchemy.exc.SAWarning: The type loader failed with an unknown
+          type
+        """
+        if self._types is not None:
+            self._types.preload(self._metadata, self._symbols)
+
+    def retry(self, func, *args):
+        """
+        Run reflection function, feed unknown types to the type loader
+
+        Parameters:
+          func (callable):
+            Function to run
+
+          `*args`:
+            Arguments
+
+        Returns:
+          any: The function's result
+        """
+        while True:
+            try:
+                return func(*args)
+            except _sa.exc.SAWarning as e:
+                if not _reflect.load_type(
+                    e, self._types, self._metadata, self._symbols, self._seen
+                ):
+                    raise
+
+    def recover(self, e, seen):
+        """
+        Recover from a failed concurrent fetch job
+
+        Must only be called while no job is running.
+
+        Parameters:
+          e (sqlalchemy.exc.SAWarning):
+            The warning the job failed with
+
+          seen (set):
+            Type names the job already failed with. Modified in place.
+
+        Raises:
+          sqlalchemy.exc.SAWarning: The job is not going to succeed
+        """
+        tname = _reflect.type_name(e)
+        if tname in seen or (
+            tname not in self._seen
+            and not _reflect.load_type(
+                e, self._types, self._metadata, self._symbols, self._seen
+            )
+        ):
+            raise e
+        seen.add(tname)
+
+    def jobs(self, keys, split=None):
+        """
+        Create fetch jobs for tables not collected yet
+
+        Parameters:
+          keys (iterable):
+            Table keys (schema, name)
+
+          split (int):
+            Split each schema into that many jobs. If omitted, ``None`` or
+            less than 2, one job per schema is created.
+
+        Returns:
+          list: Jobs (list of (schema, names) tuples)
+        """
+        schemas, batch = [], {}
+        for key in keys:
+            if key in self._done:
+                continue
+            self._done.add(key)
+            if key[0] in self._shallow:
+                self._stubs.setdefault(key, set())
+                continue
+            if key in self._collected:
+                continue
+            if ".".join(filter(None, key)) in self._metadata.tables:
+                # Reflected before (shared metadata)
+                continue
+            schema, name = key
+            group = (schema, key in self._boundary)
+            if group not in batch:
+                schemas.append(group)
+                batch[group] = []
+            batch[group].append(name)
+
+        jobs = []
+        for group in schemas:
+            schema, names = group[0], batch[group]
+            size = len(names)
+            if split is not None and split > 1:
+                size = max(1, -(-size // split))
+            jobs.extend(
+                [
+                    (schema, names[idx : idx + size])
+                    for idx in range(0, len(names), size)
+                ]
+            )
+        return jobs
+
+    def collect(self, results):
+        """
+        Merge fetched catalog information
+
+        Parameters:
+          results (iterable):
+            Collected information per job (``_ReflectionInfo``)
+
+        Returns:
+          list: Foreign key targets of the new tables, which haven't been
+          collected yet (list of table keys)
+        """
+        new = []
+        for collected in results:
+            if self._info is None:
+                self._info = collected
+            else:
+                self._info.update(collected)
+            new.extend(collected.columns)
+        self._collected.update(new)
+
+        targets = []
+        for key in new:
+            for fkey in self._info.foreign_keys.get(key, ()):
+                remote = (fkey["referred_schema"], fkey["referred_table"])
+                if remote[0] in self._shallow:
+                    self._stubs.setdefault(remote, set()).update(
+                        fkey["referred_columns"]
+                    )
+                elif remote not in self._done:
+                    targets.append(remote)
+        return targets
+
+    def stubs(self):
+        """
+        Build the stub tables
+
+        Must be called after all catalog information has been collected and
+        before the tables are built.
+        """
+        for key in sorted(self._stubs):
+            if "%s.%s" % key in self._metadata.tables:
+                continue
+            schema, name = key
+            logger.debug("Stubbing table %s.%s", schema, name)
+            _sa.Table(
+                name,
+                self._metadata,
+                *[
+                    _sa.Column(column, _sa.types.NullType())
+                    for column in sorted(self._stubs[key])
+                ],
+                schema=schema
+            )
+
+    def _fetch_all(self, inspector, jobs):
+        """
+        Run fetch jobs
+
+        Parameters:
+          inspector (sqlalchemy.engine.reflection.Inspector):
+            Inspector
+
+          jobs (list):
+            Jobs (list of (schema, names) tuples)
+
+        Returns:
+          list: Collected information per job (``_ReflectionInfo``)
+        """
+        cached = []
+        if self._cache is not None:
+            jobs, cached = self._lookup(jobs)
+
+        if len(jobs) < 2 or not self._pooled():
+            results = [
+                self.retry(self.fetch, inspector, schema, names)
+                for schema, names in jobs
+            ]
+        else:
+            results = self._fetch_jobs(inspector, jobs)
+
+        if self._cache is not None:
+            self._store(results)
+        return cached + results
+
+    def _fetch_jobs(self, inspector, jobs):
+        """
+        Run fetch jobs in parallel, falling back to the bound connection
+
+        Parameters:
+          inspector (sqlalchemy.engine.reflection.Inspector):
+            Inspector
+
+          jobs (list):
+            Jobs (list of (schema, names) tuples)
+
+        Returns:
+          list: Collected information per job (``_ReflectionInfo``)
+        """
+        results = self._fetch_parallel(jobs)
+
+        # Temporary tables (and in-memory databases) are only visible to the
+        # connection we've been passed.
+        for (schema, names), collected in zip(jobs, results):
+            missing = [
+                name
+                for name in names
+                if (schema, name) not in collected.columns
+            ]
+            if missing:
+                collected.update(
+                    self.retry(self.fetch, inspector, schema, missing)
+                )
+        return results
+
+    def _lookup(self, jobs):
+        """
+        Look up tables in the reflection cache
+
+        The type loader is replayed for all types used by the cached tables.
+
+        Parameters:
+          jobs (list):
+            Jobs (list of (schema, names) tuples)
+
+        Returns:
+          tuple: Remaining jobs (list) and cached information (list of
+          ``_ReflectionInfo``, with at most one item)
+        """
+        remaining, tables = [], {}
+        for schema, names in jobs:
+            fingerprints = self._cache.fingerprints(
+                self._metadata.bind, schema, names
+            )
+            missing = []
+            for name in names:
+                key = (schema, name)
+                info = None
+                fingerprint = fingerprints.get(name)
+                if fingerprint is not None:
+                    self._fingerprints[key] = fingerprint
+                    entry = self._cache.load(
+                        key, fingerprint, self._profile_of(key)
+                    )
+                    if entry is not None:
+                        info = self._restore(key, entry)
+                if info is None:
+                    missing.append(name)
+                    continue
+                tables[key] = info
+            if missing:
+                remaining.append((schema, missing))
+
+        logger.debug("Found %d table(s) in the cache", len(tables))
+        return remaining, ([make_info(tables)] if tables else [])
+
+    def _restore(self, key, entry):
+        """
+        Restore the catalog information of a table from a cache entry
+
+        The type loader is replayed for all types used by the table first.
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+          entry (dict):
+            Cache entry
+
+        Returns:
+          dict: Field -> value mapping (as returned by `table_info`) or
+          ``None``, if the entry is unusable
+        """
+        try:
+            tnames, info = list(entry["types"]), entry["info"]
+            for tname in tnames:
+                if tname not in self._seen:
+                    _reflect.call_loader(
+                        tname,
+                        self._types,
+                        self._metadata,
+                        self._symbols,
+                        self._seen,
+                    )
+            info = _cache.decode(info, self._metadata.bind.dialect)
+            if not isinstance(info, dict) or not set(info) <= set(
+                INFO_FIELDS
+            ):
+                raise _snapshot.SnapshotError("Invalid fields")
+        except (KeyError, TypeError, _snapshot.SnapshotError) as e:
+            logger.debug("Ignoring unusable cache entry for %r: %s", key, e)
+            return None
+        return info
+
+    def _store(self, results):
+        """
+        Store fetched tables in the reflection cache
+
+        Parameters:
+          results (list):
+            Collected information per job (``_ReflectionInfo``)
+        """
+        for collected in results:
+            for key, columns in collected.columns.items():
+                fingerprint = self._fingerprints.get(key)
+                if fingerprint is None:
+                    continue
+
+                types = set()
+                if self._types is not None:
+                    for column in columns:
+                        types.update(self._types.type_names(column["type"]))
+                try:
+                    info = _cache.encode(table_info(collected, key))
+                except _snapshot.SnapshotError as e:
+                    logger.warning("Not caching table %r: %s", key, e)
+                    continue
+                self._cache.store(
+                    key,
+                    fingerprint,
+                    self._profile_of(key),
+                    dict(info=info, types=sorted(types)),
+                )
+
+    def _pooled(self):
+        """
+        Check if the engine hands out independent connections
+
+        Single connection pools (as used for in-memory SQLite databases)
+        share one database per thread or process, so parallel fetching
+        would see a different (or no) catalog.
+
+        Returns:
+          bool: Independent connections available?
+        """
+        bind = self._metadata.bind
+        pool = getattr(getattr(bind, "engine", bind), "pool", None)
+        return pool is not None and not isinstance(
+            pool, (_sa.pool.SingletonThreadPool, _sa.pool.StaticPool)
+        )
+
+    def _fetch_parallel(self, jobs):
+        """
+        Run fetch jobs in parallel on pooled connections
+
+        The type loader is only called while no job is running.
+
+        Parameters:
+          jobs (list):
+            Jobs (list of (schema, names) tuples)
+
+        Returns:
+          list: Collected information per job (``_ReflectionInfo``)
+        """
+        # pylint: disable = import-outside-toplevel
+        from concurrent import futures as _futures
+
+        bind = self._metadata.bind
+        engine = getattr(bind, "engine", bind)
+
+        def fetch(schema, names):
+            """Fetch on a pooled connection"""
+            with engine.connect() as conn:
+                try:
+                    return self.fetch(
+                        _sqlite.inspect(conn, self._dialect), schema, names
+                    )
+                except _sa.exc.DBAPIError as e:
+                    # e.g. attached databases are connection specific as
+                    # well. The bound connection will handle it.
+                    logger.debug("Pooled fetch failed: %s", e)
+                    return make_info()
+
+        results = [None] * len(jobs)
+        seen = [set() for _ in jobs]
+        todo = list(range(len(jobs)))
+        with _futures.ThreadPoolExecutor(self._max_workers) as executor:
+            while todo:
+                running = [
+                    (idx, executor.submit(fetch, *jobs[idx])) for idx in todo
+                ]
+                failed = []
+                for idx, future in running:
+                    try:
+                        results[idx] = future.result()
+                    except _sa.exc.SAWarning as e:
+                        failed.append((idx, e))
+
+                todo = []
+                for idx, e in failed:
+                    self.recover(e, seen[idx])
+                    todo.append(idx)
+        return results
+
+    def fetch(self, inspector, schema, names):
+        """
+        Fetch catalog information for tables of a single schema
+
+        Parameters:
+          inspector (sqlalchemy.engine.reflection.Inspector):
+            Inspector
+
+          schema (str):
+            Schema name or ``None``
+
+          names (list):
+            Table names. Either all or none of them are boundary tables.
+
+        Returns:
+          _ReflectionInfo: Collected information
+        """
+        kind = _sa_reflection.ObjectKind.ANY
+        scope = _sa_reflection.ObjectScope.ANY
+        unreflectable = {}
+
+        def run(field):
+            """Run a multi reflection method"""
+            try:
+                return getattr(inspector, "get_multi_%s" % (field,))(
+                    schema=schema,
+                    filter_names=names,
+                    kind=kind,
+                    scope=scope,
+                    unreflectable=unreflectable,
+                )
+            except NotImplementedError:
+                if field not in _OPTIONAL_FIELDS:
+                    raise
+                return {}
+
+        logger.debug(
+            "Reflecting %d table(s) of schema %r", len(names), schema
+        )
+        columns = run("columns")
+        if not columns:
+            # Nothing found, nothing to add.
+            return make_info()
+
+        fields = dict((field, {}) for field in INFO_FIELDS)
+        fields["columns"] = columns
+        if (schema, names[0]) in self._boundary:
+            wanted = _BOUNDARY_FIELDS
+        else:
+            wanted = PROFILES[self._profile]
+        for field in wanted:
+            if field != "columns":
+                fields[field] = run(field)
+        return _new_info(fields, unreflectable)
+
+    def _profile_of(self, key):
+        """
+        Determine the name of the fetched information set of a table
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+        Returns:
+          str: The profile name, or "boundary" for boundary tables
+        """
+        return "boundary" if key in self._boundary else self._profile
+
+    def _table(self, key, resolve_fks=True):
+        """
+        Build a single table
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+          resolve_fks (bool):
+            Build the foreign key targets as well?
+
+        Returns:
+          sqlalchemy.Table: The table
+        """
+        schema, name = key
+        kwargs = {}
+        if schema is not None:
+            kwargs["schema"] = schema
+        if not resolve_fks:
+            kwargs["resolve_fks"] = False
+        autoload_with = self._metadata.bind
+        if self._info is not None:
+            # Created by _new_info, which checks the availability.
+            kwargs["_reflect_info"] = self._info
+        elif self._dialect is not None:
+            inspector = _sqlite.inspect(autoload_with, self._dialect)
+            if hasattr(inspector, "_inspection_context"):
+                autoload_with = inspector
+        return _sa.Table(
+            name, self._metadata, autoload_with=autoload_with, **kwargs
+        )
@@ -0,0 +1,606 @@
+# -*- coding: ascii -*-
+u"""
+==================
+ Reflection cache
+==================
+
+Persistent on-disk cache of reflected table definitions.
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import errno as _errno
+import hashlib as _hashlib
+import json as _json
+import logging as _logging
+import os as _os
+import tempfile as _tempfile
+
+import sqlalchemy as _sa
+
+from . import _snapshot
+
+logger = _logging.getLogger(__name__)
+
+#: Cache format version. Bump it, if the entry format changes.
+#:
+#: :Type: int
+_VERSION = 2
+
+
+class ReflectionCache(object):
+    """
+    Reflection cache
+
+    Entries are keyed by dialect, database identifier, table, reflection
+    profile and catalog fingerprint of the table. Changed tables therefore
+    simply miss the cache. Stale entries are never removed, the directory
+    can be wiped at any time.
+
+    Entries are stored as JSON documents (see `encode` for converting the
+    reflected information). Files which are no valid entries are treated
+    as cache misses, nothing is executed while loading.
+
+    Dialects without a fingerprint implementation are not cached.
+
+    Attributes:
+      _directory (str):
+        Cache directory
+
+      _dialect (str):
+        Dialect name
+
+      _dbname (str):
+        Database identifier
+    """
+
+    def __init__(self, directory, dialect, dbname):
+        """
+        Initialization
+
+        Parameters:
+          directory (str):
+            Cache directory. It's created if needed.
+
+          dialect (str):
+            Dialect name
+
+          dbname (str):
+            Database identifier
+        """
+        self._directory = directory
+        self._dialect = dialect
+        self._dbname = dbname
+
+    def fingerprints(self, bind, schema, names):
+        """
+        Compute the catalog fingerprints of tables
+
+        Parameters:
+          bind (Connection or Engine):
+            Database connection
+
+          schema (str):
+            Schema name or ``None``
+
+          names (list):
+            Table names
+
+        Returns:
+          dict: Table name -> fingerprint. Tables without fingerprint (for
+          example, because they do not exist) are left out.
+        """
+        if not supports(self._dialect):
+            return {}
+        return dict(
+            (name, state[0])
+            for name, state in table_states(bind, schema, names).items()
+        )
+
+    def load(self, key, fingerprint, profile):
+        """
+        Load cache entry
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+          fingerprint (str):
+            Catalog fingerprint of the table
+
+          profile (str):
+            Reflection profile name
+
+        Returns:
+          dict: The entry (JSON compatible) or ``None``, if there's no
+          (usable) entry
+        """
+        filename = self._filename(key, fingerprint, profile)
+        try:
+            with open(filename, "rb") as fp:
+                content = fp.read()
+        except IOError as e:
+            if e.errno != _errno.ENOENT:
+                raise
+            return None
+
+        try:
+            entry = _json.loads(content.decode("utf-8"))
+        except ValueError:  # includes decode errors
+            entry = None
+        if (
+            not isinstance(entry, dict)
+            or entry.get("version") != _VERSION
+            or not isinstance(entry.get("entry"), dict)
+        ):
+            logger.debug("Ignoring unusable cache entry %s", filename)
+            return None
+        return entry["entry"]
+
+    def store(self, key, fingerprint, profile, entry):
+        """
+        Store cache entry
+
+        The entry is written atomically. Entries which cannot be serialized
+        as JSON are skipped.
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+          fingerprint (str):
+            Catalog fingerprint of the table
+
+          profile (str):
+            Reflection profile name
+
+          entry (dict):
+            Entry to store. It should be JSON compatible (see `encode`).
+        """
+        try:
+            content = _json.dumps(
+                dict(version=_VERSION, entry=entry), sort_keys=True
+            )
+        except (TypeError, ValueError) as e:
+            logger.warning("Not caching table %r: %s", key, e)
+            return
+
+        filename = self._filename(key, fingerprint, profile)
+        try:
+            _os.makedirs(self._directory)
+        except OSError as e:
+            if e.errno != _errno.EEXIST:
+                raise
+
+        fd, tmpname = _tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with _os.fdopen(fd, "wb") as fp:
+                fp.write(content.encode("utf-8"))
+            getattr(_os, "replace", _os.rename)(tmpname, filename)
+        except:  # noqa pylint: disable = bare-except
+            try:
+                _os.unlink(tmpname)
+            except OSError:
+                pass
+            raise
+
+    def _filename(self, key, fingerprint, profile):
+        """
+        Compute the filename of a cache entry
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+          fingerprint (str):
+            Catalog fingerprint of the table
+
+          profile (str):
+            Reflection profile name
+
+        Returns:
+          str: The filename
+        """
+        digest = _hashlib.sha1(
+            repr(
+                (
+                    _VERSION,
+                    _sa.__version__,
+                    self._dialect,
+                    self._dbname,
+                    key,
+                    fingerprint,
+                    profile,
+                )
+            ).encode("utf-8")
+        ).hexdigest()
+        return _os.path.join(self._directory, "%s.json" % (digest,))
+
+
+def encode(value):
+    """
+    Convert reflected information into its JSON compatible form
+
+    Dicts, tuples and column types are tagged (single key dicts named
+    ``dict``, ``tuple`` and ``type``). Types are described like in
+    snapshots.
+
+    Parameters:
+      value (any):
+        Reflected information (for example, a table's information as
+        returned by ``_bulk.table_info``)
+
+    Returns:
+      any: The JSON compatible form
+
+    Raises:
+      SnapshotError: The value cannot be described
+    """
+    if isinstance(value, dict):
+        return dict(
+            dict=dict((key, encode(item)) for key, item in value.items())
+        )
+    if isinstance(value, list):
+        return list(map(encode, value))
+    if isinstance(value, tuple):
+        return dict(tuple=list(map(encode, value)))
+    if isinstance(value, _sa.types.TypeEngine):
+        return dict(type=_snapshot.describe_type(value))
+    if isinstance(value, _snapshot.PLAIN):
+        return value
+    raise _snapshot.SnapshotError("Cannot describe value %r" % (value,))
+
+
+def decode(value, dialect):
+    """
+    Restore reflected information from its JSON compatible form
+
+    Column types are resolved like in snapshots, so types set up by a type
+    loader need to be loaded before.
+
+    Parameters:
+      value (any):
+        The JSON compatible form, as returned by `encode`
+
+      dialect (sqlalchemy.engine.Dialect):
+        Dialect
+
+    Returns:
+      any: The reflected information
+
+    Raises:
+      SnapshotError: The value cannot be restored
+    """
+    classes = _snapshot.type_classes(dialect)
+
+    def restore(value):
+        """Restore a single value"""
+        if isinstance(value, list):
+            return list(map(restore, value))
+        if not isinstance(value, dict):
+            return value
+        if "dict" in value:
+            return dict(
+                (key, restore(item)) for key, item in value["dict"].items()
+            )
+        if "tuple" in value:
+            return tuple(map(restore, value["tuple"]))
+        return _snapshot.restore_type(value["type"], classes)
+
+    try:
+        return restore(value)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        # pylint: disable = raise-missing-from
+        raise _snapshot.SnapshotError("Invalid cache entry: %r" % (e,))
+
+
+def _digest(value):
+    """
+    Make fingerprint from catalog data
+
+    Parameters:
+      value (str):
+        Catalog data
+
+    Returns:
+      str: The fingerprint
+    """
+    if not isinstance(value, bytes):
+        value = value.encode("utf-8")
+    return _hashlib.sha1(value).hexdigest()
+
+
+def supports(dialect):
+    """
+    Check if table states can be computed for a dialect
+
+    Parameters:
+      dialect (str):
+        Dialect name
+
+    Returns:
+      bool: Supported?
+    """
+    return dialect in _FINGERPRINTS
+
+
+def table_states(bind, schema, names):
+    """
+    Compute the catalog states of tables
+
+    The state consists of the table's fingerprint and its foreign key
+    targets. It's computed using one catalog query.
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      schema (str):
+        Schema name or ``None``
+
+      names (list):
+        Table names
+
+    Returns:
+      dict: Table name -> (fingerprint, targets) mapping. The targets are
+      a list of table keys (schema, name). Tables without fingerprint (for
+      example, because they do not exist) are left out.
+
+    Raises:
+      KeyError: The dialect is not supported
+    """
+    if not names:
+        return {}
+    return _FINGERPRINTS[bind.dialect.name](bind, schema, names)
+
+
+def _sqlite_fingerprints(bind, schema, names):
+    """
+    Compute table states for SQLite
+
+    The fingerprint is derived from the ``CREATE`` statement stored in the
+    master table. Foreign key targets are in the same schema (SQLite does
+    not support foreign keys across databases).
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      schema (str):
+        Schema name or ``None``
+
+      names (list):
+        Table names
+
+    Returns:
+      dict: Table name -> (fingerprint, targets) mapping
+    """
+    # Table valued pragma functions exist since SQLite 3.16. The server
+    # version is only known after the first connect.
+    version = bind.dialect.server_version_info or getattr(
+        bind.dialect.dbapi, "sqlite_version_info", None
+    )
+    pragmas = (version or (0,)) >= (3, 16)
+    query, params = _sqlite_query(bind, schema, names, pragmas)
+    found = {}
+    for idx, name, sql, target in execute(bind, query, params):
+        if sql is not None:
+            targets = found.setdefault((idx, name), (sql, set()))[1]
+            if target is not None:
+                targets.add((schema, target))
+
+    result = {}
+    # The first master table wins
+    for (_, name), (sql, targets) in sorted(found.items(), reverse=True):
+        if not pragmas:
+            targets = set(
+                (schema, fkey["referred_table"])
+                for fkey in _sa.inspect(bind).get_foreign_keys(
+                    name, schema=schema
+                )
+            )
+        result[name] = (_digest(sql), sorted(targets))
+    return result
+
+
+def _sqlite_query(bind, schema, names, pragmas):
+    """
+    Create the SQLite table state query
+
+    The result rows consist of the index of the master table, the table
+    name, its SQL and a foreign key target (or ``NULL``).
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      schema (str):
+        Schema name or ``None``
+
+      names (list):
+        Table names
+
+      pragmas (bool):
+        Are table valued pragma functions available? If false, the
+        foreign key targets are ``NULL``.
+
+    Returns:
+      tuple: The query and its parameters (``(str, dict)``)
+    """
+    if schema is None:
+        # Unqualified names find temporary tables first.
+        masters = [("sqlite_temp_master", "temp"), ("sqlite_master", "main")]
+    else:
+        masters = [
+            (
+                "%s.sqlite_master"
+                % (
+                    bind.dialect.identifier_preparer.quote_identifier(schema),
+                ),
+                schema,
+            )
+        ]
+
+    params = dict(("n%d" % idx, name) for idx, name in enumerate(names))
+    names = ", ".join([":%s" % param for param in sorted(params)])
+    queries = []
+    for idx, (master, db) in enumerate(masters):
+        if pragmas:
+            params["s%d" % idx] = db
+            queries.append(
+                "SELECT %(idx)d, m.name, m.sql, f.\"table\" FROM %(master)s"
+                " AS m LEFT JOIN pragma_foreign_key_list(m.name, :s%(idx)d)"
+                " AS f WHERE m.type IN ('table', 'view')"
+                " AND m.name IN (%(names)s)"
+                % dict(idx=idx, master=master, names=names)
+            )
+        else:
+            queries.append(
+                "SELECT %(idx)d, name, sql, NULL FROM %(master)s"
+                " WHERE type IN ('table', 'view') AND name IN (%(names)s)"
+                % dict(idx=idx, master=master, names=names)
+            )
+    return " UNION ALL ".join(queries), params
+
+
+def _postgresql_fingerprints(bind, schema, names):
+    """
+    Compute table states for PostgreSQL
+
+    The fingerprint is derived from the column definitions, the constraint
+    definitions and the definitions of the column types.
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      schema (str):
+        Schema name or ``None``
+
+      names (list):
+        Table names
+
+    Returns:
+      dict: Table name -> (fingerprint, targets) mapping
+    """
+    query = """
+        SELECT c.relname, concat_ws('|', c.relkind, (
+            SELECT string_agg(concat_ws(':',
+                a.attname, format_type(a.atttypid, a.atttypmod),
+                a.attnotnull, pg_get_expr(d.adbin, d.adrelid),
+                a.attidentity, a.attgenerated
+            ), ',' ORDER BY a.attnum)
+            FROM pg_catalog.pg_attribute a
+            LEFT JOIN pg_catalog.pg_attrdef d
+                ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+            WHERE a.attrelid = c.oid AND a.attnum > 0
+                AND NOT a.attisdropped
+        ), (
+            SELECT string_agg(concat_ws(':',
+                o.conname, pg_get_constraintdef(o.oid)
+            ), ',' ORDER BY o.conname)
+            FROM pg_catalog.pg_constraint o
+            WHERE o.conrelid = c.oid
+        ), (
+            SELECT string_agg(concat_ws(':',
+                t.typname, t.typtype,
+                format_type(t.typbasetype, t.typtypmod), t.typnotnull,
+                t.typdefault, (
+                    SELECT string_agg(e.enumlabel, ','
+                                      ORDER BY e.enumsortorder)
+                    FROM pg_catalog.pg_enum e
+                    WHERE e.enumtypid = t.oid
+                )
+            ), ',' ORDER BY t.typname)
+            FROM pg_catalog.pg_type t
+            WHERE t.oid IN (
+                SELECT a.atttypid FROM pg_catalog.pg_attribute a
+                WHERE a.attrelid = c.oid AND a.attnum > 0
+                UNION
+                SELECT et.typelem FROM pg_catalog.pg_attribute a
+                JOIN pg_catalog.pg_type et ON et.oid = a.atttypid
+                WHERE a.attrelid = c.oid AND a.attnum > 0
+            ) AND t.typtype IN ('d', 'e')
+        )), ARRAY(
+            SELECT ARRAY[fn.nspname::text, fc.relname::text]
+            FROM pg_catalog.pg_constraint f
+            JOIN pg_catalog.pg_class fc ON fc.oid = f.confrelid
+            JOIN pg_catalog.pg_namespace fn ON fn.oid = fc.relnamespace
+            WHERE f.conrelid = c.oid AND f.contype = 'f'
+        ), n.nspname
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = coalesce(:schema, current_schema())
+            AND c.relname = ANY(:names)
+    """
+    result = {}
+    for name, data, fkeys, nspname in execute(
+        bind, query, dict(schema=schema, names=list(names))
+    ):
+        # Targets in the default schema are unqualified, like the
+        # inspector reports them.
+        targets = set(
+            (
+                None if schema is None and tschema == nspname else tschema,
+                tname,
+            )
+            for tschema, tname in fkeys or ()
+        )
+        result[name] = (_digest(data), sorted(targets, key=repr))
+    return result
+
+
+def execute(bind, query, params=None):
+    """
+    Execute a catalog query
+
+    Engines are not executed on directly (that's deprecated since
+    SQLAlchemy 1.4), a connection is checked out instead.
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      query (str):
+        SQL query
+
+      params (dict):
+        Query parameters. If omitted or ``None``, no parameters are passed.
+
+    Returns:
+      list: Result rows
+    """
+    query = _sa.text(query)
+    params = params or {}
+    if isinstance(bind, _sa.engine.Engine):
+        with bind.connect() as conn:
+            return list(conn.execute(query, params))
+    return list(bind.execute(query, params))
+
+
+#: Dialect name -> fingerprint function mapping
+#:
+#: :Type: dict
+_FINGERPRINTS = {
+    "postgresql": _postgresql_fingerprints,
+    "sqlite": _sqlite_fingerprints,
+}
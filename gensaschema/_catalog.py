@@ -0,0 +1,252 @@
+# -*- coding: ascii -*-
+u"""
+======================
+ Catalog fingerprints
+======================
+
+Cheap detection of catalog changes.
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import errno as _errno
+import hashlib as _hashlib
+import re as _re
+import warnings as _warnings
+
+import sqlalchemy as _sa
+
+from . import _cache
+from . import _reflect
+from . import _version
+
+#: Marker line prefix of the fingerprint in generated modules
+#:
+#: :Type: str
+MARKER = "# Catalog fingerprint: "
+
+#: Matcher for the fingerprint line
+#:
+#: :Type: callable
+_MARKER_MATCH = _re.compile(
+    r"^%s([0-9a-f]+)\s*$" % (_re.escape(MARKER),)
+).match
+
+
+def fingerprint(bind, tables):
+    """
+    Compute the catalog fingerprint
+
+    The fingerprint covers the dialect, the SQLAlchemy and GenSASchema
+    versions, the table list and the catalog state relevant for the tables.
+    It changes whenever the generated module might change due to a catalog
+    change (it may also change spuriously, but not the other way around).
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      tables (list):
+        List of tables, (local name, table name) pairs
+
+    Returns:
+      str: The fingerprint (hex string)
+    """
+    tables = list(tables)
+    keys = [_reflect.split_name(name) for _, name in tables]
+    dialect = bind.dialect.name
+    if _cache.supports(dialect):
+        func = _table_state
+    else:
+        func = _inspector_state
+    return _hashlib.sha1(
+        repr(
+            (
+                _version.__version__,
+                _sa.__version__,
+                dialect,
+                sorted(tables),
+                func(bind, keys),
+            )
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def read(name_or_file):
+    """
+    Read the fingerprint from a generated module
+
+    Only the leading comment block is inspected.
+
+    Parameters:
+      name_or_file (str or file):
+        Module filename or file pointer
+
+    Returns:
+      str: The fingerprint or ``None``, if the module does not exist or does
+      not contain a fingerprint
+
+    Raises:
+      IOError: Error reading the file (except for ENOENT)
+    """
+    read_ = getattr(name_or_file, "read", None)
+    if read_ is None:
+        kwargs = {} if str is bytes else {"encoding": "utf-8"}
+        try:
+            # pylint: disable = bad-option-value, unspecified-encoding
+            # pylint: disable = bad-option-value, consider-using-with
+            fp = open(name_or_file, **kwargs)
+        except IOError as e:
+            if e.errno != _errno.ENOENT:
+                raise
+            return None
+        try:
+            return read(fp)
+        finally:
+            fp.close()
+
+    for line in name_or_file:
+        if not isinstance(line, str):
+            line = line.decode("ascii", "replace")
+        if not line.startswith("#"):
+            break
+        match = _MARKER_MATCH(line)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _table_state(bind, keys):
+    """
+    Determine catalog state from the table fingerprints
+
+    The tables and everything reachable from them via foreign keys are
+    covered. The fingerprints (see the reflection cache) are computed level
+    by level, with one catalog query per schema and level.
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      keys (list):
+        Table keys, (schema, name) tuples
+
+    Returns:
+      list: Catalog state
+    """
+    result, todo = {}, list(keys)
+    while todo:
+        schemas = {}
+        for schema, name in todo:
+            if (schema, name) not in result:
+                result[schema, name] = None
+                schemas.setdefault(schema, []).append(name)
+
+        todo = []
+        for schema, names in sorted(schemas.items(), key=repr):
+            states = _cache.table_states(bind, schema, names)
+            for name, (digest, targets) in states.items():
+                result[schema, name] = digest
+                todo.extend(targets)
+    return sorted(result.items(), key=repr)
+
+
+def _inspector_state(bind, keys):
+    """
+    Determine catalog state via the inspector
+
+    This is the generic fallback for dialects without table fingerprint
+    query. It covers the tables and everything reachable from them via
+    foreign keys. Unknown types are reflected as ``NullType``, so the
+    warnings about them (containing the raw type names) are part of the
+    state.
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      keys (list):
+        Table keys, (schema, name) tuples
+
+    Returns:
+      list: Catalog state
+    """
+    inspector = _sa.inspect(bind)
+    result, seen, todo = [], set(), list(keys)
+    with _warnings.catch_warnings(record=True) as recorded:
+        _warnings.simplefilter("always", _sa.exc.SAWarning)
+        while todo:
+            key = todo.pop()
+            if key in seen:
+                continue
+            seen.add(key)
+            schema, name = key
+
+            del recorded[:]
+            try:
+                state = [inspector.get_columns(name, schema=schema)]
+            except _sa.exc.NoSuchTableError:
+                result.append((key, None))
+                continue
+            state.append([u"%s" % (warning.message,) for warning in recorded])
+            state.append(inspector.get_pk_constraint(name, schema=schema))
+            fkeys = inspector.get_foreign_keys(name, schema=schema)
+            state.append(fkeys)
+            for method in ("get_indexes", "get_unique_constraints"):
+                try:
+                    state.append(
+                        getattr(inspector, method)(name, schema=schema)
+                    )
+                except NotImplementedError:
+                    state.append(None)
+
+            result.append((key, _stable(state)))
+            todo.extend(
+                (fkey["referred_schema"], fkey["referred_table"])
+                for fkey in fkeys
+            )
+    return sorted(result, key=repr)
+
+
+def _stable(value):
+    """
+    Make a stable representation of inspector results
+
+    Parameters:
+      value (any):
+        Inspector result
+
+    Returns:
+      str: The representation
+    """
+    if isinstance(value, dict):
+        return "{%s}" % (
+            ", ".join(
+                sorted(
+                    "%r: %s" % (key, _stable(item))
+                    for key, item in value.items()
+                )
+            ),
+        )
+    if isinstance(value, (list, tuple)):
+        return "[%s]" % (", ".join(_stable(item) for item in value),)
+    return repr(value)
@@ -40,8 +40,25 @@ try:
 except ImportError:
     from io import StringIO as _TextIO
 
+from . import _exceptions
+from . import _pattern
 from . import _template
 
+#: Config section names
+#:
+#: :Type: tuple
+_SECTIONS = ("tables", "schemas")
+
+#: Parser key of a table pattern. Patterns may contain anything (like
+#: colons), so they are passed to the config parser as placeholders.
+#:
+#: :Type: str
+_PATTERN_KEY = "<pattern %d>"
+
+
+class ConfigError(_exceptions.Error):
+    """Config could not be parsed"""
+
 
 class Config(object):
     """
@@ -49,7 +66,8 @@ class Config(object):
 
     Attributes:
       tables (list):
-        Table list
+        Table list, (varname, name) pairs. Names may be patterns (see
+        `Schema`), the varnames are templates then.
 
       schemas (dict):
         Alien schema mapping
@@ -75,6 +93,16 @@ class Config(object):
         #
         # name = table
         #
+        # Patterns select all matching tables (listed in the database):
+        #
+        # schema.*
+        # re:^audit_
+        # schema.re:^audit_
+        #
+        # The variable names can be built from a template then:
+        #
+        # audit_%(name)s = schema.*
+        #
         # The basename of this file (modulo .schema extension) is used as
         # basename for the python file.
     """
@@ -149,13 +177,34 @@ class Config(object):
 
         Returns:
           Config: New Config instance
+
+        Raises:
+          ConfigError: Unknown section
         """
         conf_lines = ["[schemas]", "[tables]"]
+        patterns, section = {}, "tables"
         for line in lines:
             line = line.rstrip()
             if not line or line.lstrip().startswith("#"):
                 continue
-            if "=" in line or ("[" in line and "]" in line):
+            header = _header(line)
+            if header is not None:
+                if header not in _SECTIONS:
+                    raise ConfigError(
+                        "Unknown config section [%s]" % (header,)
+                    )
+                section, line = header, "[%s]" % (header,)
+            elif section == "tables":
+                if "=" in line:
+                    varname, name = line.split("=", 1)
+                else:
+                    varname, name = _pattern.VARNAME, line
+                if _pattern.is_pattern(name.strip()):
+                    key = _PATTERN_KEY % (len(patterns),)
+                    patterns[key] = (varname.strip(), name.strip())
+                    line = "%s = " % (key,)
+
+            if "=" in line or header is not None:
                 conf_lines.append(line)
             else:
                 name = line
@@ -171,7 +220,12 @@ class Config(object):
             parser = _config_parser.RawConfigParser(strict=False)
             parser.optionxform = lambda x: x
             parser.read_file(_TextIO("\n".join(conf_lines)))
-        return cls.from_parser(parser, lines=lines)
+        result = cls.from_parser(parser, lines=lines)
+        result.tables = [
+            patterns.get(varname, (varname, name))
+            for varname, name in result.tables
+        ]
+        return result
 
     @classmethod
     def from_parser(cls, parser, lines=None):
@@ -226,3 +280,25 @@ class Config(object):
         except TypeError:
             content = content.encode("utf-8")
         fp.write(content)
+
+
+def _header(line):
+    """
+    Parse a section header line
+
+    Parameters:
+      line (str):
+        Config line
+
+    Returns:
+      str: The section name or ``None``, if the line is no section header.
+      Lines with text outside of the brackets (like the glob pattern
+      ``[ab]*``) are no section headers.
+    """
+    line = line.strip()
+    if "=" in line or not line.startswith("[") or not line.endswith("]"):
+        return None
+    name = line[1:-1]
+    if "[" in name or "]" in name:
+        return None
+    return name.strip()
@@ -86,8 +86,13 @@ class Constraint(object):
             self.constraint, self.table, self._symbols, self.options
         )
 
-    def __cmp__(self, other):
-        """Compare"""
+    def sort_key(self):
+        """
+        Determine the sort key
+
+        Returns:
+          tuple: The sort key
+        """
         names = [
             "PrimaryKeyConstraint",
             "UniqueConstraint",
@@ -102,21 +107,17 @@ class Constraint(object):
             except IndexError:
                 return -1
 
-        return _util.cmp(
-            (
-                bytype(self.constraint),
-                self.options is not None,
-                self.constraint.name,
-                repr(self),
-            ),
-            (
-                bytype(other.constraint),
-                other.options is not None,
-                other.constraint.name,
-                repr(other),
-            ),
+        return (
+            bytype(self.constraint),
+            self.options is not None,
+            self.constraint.name,
+            repr(self),
         )
 
+    def __cmp__(self, other):
+        """Compare"""
+        return _util.cmp(self.sort_key(), other.sort_key())
+
     def __lt__(self, other, _cmp=__cmp__):
         """Check for '<'"""
         return _cmp(self, other) < 0
@@ -180,6 +181,55 @@ class Constraint(object):
         return "%s(%s%s)" % (self._symbols[symbol], args, params)
 
 
+class Rendered(object):
+    """
+    Rendered constraint
+
+    It replaces a constraint in a table's constraint list, without keeping
+    the SQLAlchemy objects alive.
+
+    Attributes:
+      _key (tuple):
+        Sort key
+
+      _repr (str):
+        String representation
+    """
+
+    def __init__(self, constraint):
+        """
+        Initialization
+
+        Parameters:
+          constraint (Constraint):
+            Constraint to render
+        """
+        self._key = constraint.sort_key()
+        self._repr = repr(constraint)
+
+    def sort_key(self):
+        """
+        Determine the sort key
+
+        Returns:
+          tuple: The sort key
+        """
+        return self._key
+
+    def __repr__(self):
+        """
+        Make string representation
+
+        Returns:
+          str: The string representation
+        """
+        return self._repr
+
+    def __lt__(self, other):
+        """Check for '<'"""
+        return _util.cmp(self.sort_key(), other.sort_key()) < 0
+
+
 def access_col(col):
     """
     Generate column access string (either as attribute or via dict access)
@@ -0,0 +1,122 @@
+# -*- coding: ascii -*-
+u"""
+============
+ DDL replay
+============
+
+Replay SQL DDL files into an in-memory SQLite database.
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import contextlib as _contextlib
+
+import sqlalchemy as _sa
+
+from . import _pattern
+from . import _util
+
+
+@_contextlib.contextmanager
+def replay(paths, schemas=()):
+    """
+    Replay DDL files into a fresh in-memory SQLite database
+
+    Parameters:
+      paths (iterable):
+        DDL filenames or file pointers. They are replayed in order. A
+        single filename or file pointer is accepted as well.
+
+      schemas (iterable):
+        Schema names to attach (as in-memory databases) before replaying
+
+    Returns:
+      contextmanager: Yields the connection (``sqlalchemy.Connection``).
+      The database is thrown away afterwards.
+    """
+    if isinstance(paths, (_util.unicode, _util.bytes, str)) or hasattr(
+        paths, "read"
+    ):
+        paths = [paths]
+
+    engine = _sa.create_engine("sqlite://")
+    try:
+        conn = engine.connect()
+        try:
+            dbapi_conn = conn.connection
+            quote = engine.dialect.identifier_preparer.quote_identifier
+            for schema in sorted(set(schemas) - set(["main", "temp"])):
+                dbapi_conn.execute(
+                    "ATTACH DATABASE ':memory:' AS %s" % (quote(schema),)
+                )
+            for path in paths:
+                dbapi_conn.executescript(_read(path))
+            dbapi_conn.commit()
+            yield conn
+        finally:
+            conn.close()
+    finally:
+        engine.dispose()
+
+
+def schema_names(tables, schemas):
+    """
+    Find the schema names used by the configuration
+
+    Parameters:
+      tables (iterable):
+        List of tables, (local name, table name or pattern) pairs
+
+      schemas (dict):
+        Schema -> module mapping
+
+    Returns:
+      set: Schema names
+    """
+    result = set(schemas)
+    for _, name in tables:
+        schema, _ = _pattern.split(name)
+        if schema is not None:
+            result.add(schema)
+    return result
+
+
+def _read(path):
+    """
+    Read a DDL file
+
+    Parameters:
+      path (str or file):
+        Filename or file pointer
+
+    Returns:
+      str: The file content
+    """
+    read = getattr(path, "read", None)
+    if read is None:
+        with open(path, "rb") as fp:
+            content = fp.read()
+    else:
+        content = read()
+    if isinstance(content, _util.bytes):
+        content = content.decode("utf-8")
+    return content
@@ -0,0 +1,422 @@
+# -*- coding: ascii -*-
+u"""
+===================
+ Foreign key graph
+===================
+
+Foreign key graph of the reflected tables.
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import heapq as _heapq
+import logging as _logging
+
+logger = _logging.getLogger(__name__)
+
+
+def key_of(sa_table):
+    """
+    Determine the graph key of a table
+
+    Parameters:
+      sa_table (sqlalchemy.Table):
+        The table
+
+    Returns:
+      tuple: Table key (schema, name)
+    """
+    return (sa_table.schema, sa_table.name)
+
+
+class ForeignKeyGraph(object):
+    """
+    Foreign key graph
+
+    The nodes are table keys (schema, name), the edges point from the
+    referencing table to the referenced one. Edges are stored once per pair
+    of tables, no matter how many foreign keys connect them.
+
+    Attributes:
+      outgoing (dict):
+        Table key -> keys of the referenced tables (in order of appearance)
+
+      incoming (dict):
+        Table key -> keys of the referencing tables (in order of appearance)
+
+      constraints (dict):
+        Edge (referencing key, referenced key) -> SA foreign key constraints
+
+      tables (dict):
+        Table key -> SA table, for the tables added via `add_table`
+
+      deferred (set):
+        Edges deferred in order to break the cycles (see `break_cycles`)
+
+      use_alter (bool):
+        Mark the foreign keys of deferred edges with ``use_alter``?
+    """
+
+    def __init__(self):
+        """Initialization"""
+        self.outgoing = {}
+        self.incoming = {}
+        self.constraints = {}
+        self.tables = {}
+        self.deferred = set()
+        self.use_alter = False
+
+    @classmethod
+    def from_tables(cls, sa_tables):
+        """
+        Construct from the tables reachable via foreign keys
+
+        Parameters:
+          sa_tables (iterable):
+            SA tables to start with
+
+        Returns:
+          ForeignKeyGraph: New graph instance
+        """
+        result = cls()
+        todo = list(sa_tables)
+        while todo:
+            sa_table = todo.pop()
+            if key_of(sa_table) not in result.tables:
+                result.add_table(sa_table)
+                todo.extend(
+                    fkey.column.table for fkey in sa_table.foreign_keys
+                )
+        return result
+
+    def __contains__(self, key):
+        """
+        Check if a table is a node of the graph
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+        Returns:
+          bool: Is it?
+        """
+        return key in self.outgoing
+
+    def __len__(self):
+        """
+        Count the nodes
+
+        Returns:
+          int: Number of nodes
+        """
+        return len(self.outgoing)
+
+    def add(self, key, remotes=()):
+        """
+        Add a table and its references
+
+        Adding a table again adds the new references.
+
+        Parameters:
+          key (tuple):
+            Table key (schema, name)
+
+          remotes (iterable):
+            Keys of the referenced tables
+        """
+        outgoing = self.outgoing.setdefault(key, [])
+        self.incoming.setdefault(key, [])
+        for remote in remotes:
+            if remote not in outgoing:
+                outgoing.append(remote)
+                self.outgoing.setdefault(remote, [])
+                self.incoming.setdefault(remote, []).append(key)
+
+    def add_table(self, sa_table):
+        """
+        Add an SA table and its foreign keys
+
+        The referenced tables need to be resolvable. Constraints of deferred
+        edges are marked with ``use_alter``, if requested (see
+        `break_cycles`).
+
+        Parameters:
+          sa_table (sqlalchemy.Table):
+            The table
+        """
+        key = key_of(sa_table)
+        self.tables[key] = sa_table
+        remotes = []
+        for fkey in sa_table.foreign_keys:
+            remote = key_of(fkey.column.table)
+            remotes.append(remote)
+            handles = self.constraints.setdefault((key, remote), [])
+            if not any(item is fkey.constraint for item in handles):
+                handles.append(fkey.constraint)
+        self.add(key, remotes)
+        self.defer(sa_table)
+
+    def defer(self, sa_table):
+        """
+        Mark the foreign keys of deferred edges with ``use_alter``
+
+        The table itself is not added to the graph (and not referenced by
+        it). Nothing is marked, unless requested (see `break_cycles`).
+
+        Parameters:
+          sa_table (sqlalchemy.Table):
+            The table
+        """
+        if self.use_alter and self.deferred:
+            key = key_of(sa_table)
+            for fkey in sa_table.foreign_keys:
+                if (key, key_of(fkey.column.table)) in self.deferred:
+                    _defer(fkey)
+
+    def order(self):
+        """
+        Determine the node order used for all decisions
+
+        Returns:
+          list: Table keys, sorted by name and schema
+        """
+        return sorted(self.outgoing, key=lambda key: (key[1], key[0] or ""))
+
+    def topological(self, keys, sort_key):
+        """
+        Sort tables by their dependencies
+
+        Referenced tables come before the referencing ones. Deferred edges
+        (see `break_cycles`), self references and references to tables not
+        in `keys` are ignored. Independent tables are ordered by `sort_key`.
+
+        Parameters:
+          keys (iterable):
+            Table keys to sort
+
+          sort_key (callable):
+            Sort key for independent tables, called with a table key
+
+        Returns:
+          list: Sorted table keys
+        """
+        position = dict((key, idx) for idx, key in enumerate(self.order()))
+        keys = set(keys)
+
+        dependents = dict((key, []) for key in keys)
+        pending = {}
+        for key in keys:
+            pending[key] = 0
+            for remote in self.outgoing[key]:
+                if (
+                    remote != key
+                    and remote in keys
+                    and (key, remote) not in self.deferred
+                ):
+                    dependents[remote].append(key)
+                    pending[key] += 1
+
+        heap = [
+            (sort_key(key), position[key], key)
+            for key, count in pending.items()
+            if not count
+        ]
+        _heapq.heapify(heap)
+        result = []
+        while heap:
+            key = _heapq.heappop(heap)[2]
+            result.append(key)
+            for dependent in dependents[key]:
+                pending[dependent] -= 1
+                if not pending[dependent]:
+                    _heapq.heappush(
+                        heap,
+                        (sort_key(dependent), position[dependent], dependent),
+                    )
+
+        if len(result) < len(keys):
+            # Cycles left (not broken before)
+            done = set(result)
+            result.extend(
+                sorted(
+                    (key for key in keys if key not in done),
+                    key=lambda key: (sort_key(key), position[key]),
+                )
+            )
+        return result
+
+    def closure(self, keys):
+        """
+        Find the tables reachable from the given ones
+
+        Parameters:
+          keys (iterable):
+            Table keys to start with
+
+        Returns:
+          set: Table keys, including the start keys
+        """
+        result, todo = set(), list(keys)
+        while todo:
+            key = todo.pop()
+            if key not in result:
+                result.add(key)
+                todo.extend(self.outgoing.get(key, ()))
+        return result
+
+    def components(self):
+        """
+        Find the foreign key cycles
+
+        These are the strongly connected components of the graph (with more
+        than one table), found with Tarjan's algorithm. Self references are
+        not cycles in that sense.
+
+        Returns:
+          list: Components (lists of table keys)
+        """
+        index, low, stack, active, result = {}, {}, [], set(), []
+        for root in self.order():
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            active.add(root)
+            work = [(root, iter(self.incoming[root]))]
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        active.add(child)
+                        work.append((child, iter(self.incoming[child])))
+                        break
+                    if child in active:
+                        low[node] = min(low[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while not component or component[-1] != node:
+                            component.append(stack.pop())
+                            active.discard(component[-1])
+                        if len(component) > 1:
+                            result.append(component)
+        return result
+
+    def break_cycles(self, use_alter=False):
+        """
+        Find the edges to defer in order to break all cycles
+
+        Each cycle (see `components`) is searched depth first, following
+        the references backwards, starting at the table with the smallest
+        name. The edges leading back to the tables on the search path are
+        the ones to defer. For a simple cycle that's the reference of the
+        table with the smallest name to the next table of the cycle.
+
+        The deferred edges are stored in `deferred` (the dependency order
+        ignores them). With `use_alter`, their constraints are marked with
+        ``use_alter`` as well, so SQLAlchemy can sort the tables.
+
+        Parameters:
+          use_alter (bool):
+            Mark the constraints of the deferred edges with ``use_alter``?
+
+        Returns:
+          set: The deferred edges, (referencing key, referenced key) tuples
+        """
+        position = dict((key, idx) for idx, key in enumerate(self.order()))
+        incoming = dict(
+            (key, sorted(remotes, key=position.__getitem__))
+            for key, remotes in self.incoming.items()
+        )
+        result = set()
+        for component in self.components():
+            component.sort(key=position.__getitem__)
+            logger.debug(
+                "Found foreign key cycle: %s",
+                ", ".join(repr(key[1]) for key in component),
+            )
+            result.update(_back_edges(component, incoming))
+
+        self.deferred = result
+        self.use_alter = bool(use_alter)
+        if self.use_alter:
+            for edge in result:
+                for constraint in self.constraints.get(edge, ()):
+                    for fkey in constraint.elements:
+                        _defer(fkey)
+        return result
+
+
+def _back_edges(component, incoming):
+    """
+    Find the edges leading back onto the search path within a component
+
+    The component is searched depth first, following the references
+    backwards, starting at its first table. Self references are ignored.
+
+    Parameters:
+      component (list):
+        Table keys of the component, the first one is the root
+
+      incoming (dict):
+        Table key -> keys of the referencing tables, in search order
+
+    Returns:
+      set: The edges, (referencing key, referenced key) tuples
+    """
+    members, root = set(component), component[0]
+    seen, path, result = set([root]), set([root]), set()
+    work = [(root, iter(incoming[root]))]
+    while work:
+        node, children = work[-1]
+        for child in children:
+            if child not in members or child == node:
+                continue
+            if child in path:
+                result.add((child, node))
+            elif child not in seen:
+                seen.add(child)
+                path.add(child)
+                work.append((child, iter(incoming[child])))
+                break
+        else:
+            work.pop()
+            path.discard(node)
+    return result
+
+
+def _defer(fkey):
+    """
+    Mark a foreign key with ``use_alter``
+
+    Parameters:
+      fkey (sqlalchemy.ForeignKey):
+        The foreign key
+    """
+    fkey.use_alter = True
+    fkey.constraint.use_alter = True
@@ -30,6 +30,12 @@ __author__ = u"Andr\xe9 Malo"
 
 import sqlalchemy as _sa
 
+#: Key of the table info flag marking boundary tables (reflected lightly,
+#: see ``Plan``)
+#:
+#: :Type: str
+BOUNDARY = "gensaschema_boundary"
+
 
 class BoundMetaData(object):
     """
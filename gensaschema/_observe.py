@@ -0,0 +1,401 @@
+# -*- coding: ascii -*-
+u"""
+=================
+ Instrumentation
+=================
+
+Timing and query count instrumentation.
+
+An observer is a callable receiving an `Event` per measured phase. The
+phases are:
+
+build
+  Reflection of a schema (all of it)
+
+stream
+  Streaming a schema (reflection, rendering and writing)
+
+collect
+  Bulk collection of the catalog information
+
+reflect
+  Reflection of a single table (the name is the table key). Foreign key
+  targets reflected along the way are included.
+
+type
+  Type loader call (the name is the type name)
+
+cycles
+  Foreign key cycle breaking
+
+render
+  Rendering of a single table (the name is the table key)
+
+write
+  Writing the module
+
+The statement counts are taken from the ``before_cursor_execute`` events of
+the engine and include all statements executed on the engine (from any
+thread) during the phase. Nested phases are included in the outer ones.
+
+`Recorder` is an observer collecting the events and producing a summary
+report.
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import contextlib as _contextlib
+import threading as _threading
+import time as _time
+
+import sqlalchemy as _sa
+
+#: Clock
+#:
+#: :Type: callable
+_clock = getattr(_time, "perf_counter", _time.time)
+
+#: Thread local state (stack of active instruments)
+#:
+#: :Type: threading.local
+_local = _threading.local()
+
+
+class Event(object):
+    """
+    Measured phase
+
+    Attributes:
+      kind (str):
+        Phase name, like "reflect" or "render"
+
+      name (str):
+        Table key or type name or ``None``
+
+      seconds (float):
+        Wall clock time spent
+
+      statements (int):
+        Number of SQL statements executed
+    """
+
+    def __init__(self, kind, name, seconds, statements):
+        """
+        Initialization
+
+        Parameters:
+          kind (str):
+            Phase name
+
+          name (str):
+            Table key or type name or ``None``
+
+          seconds (float):
+            Wall clock time spent
+
+          statements (int):
+            Number of SQL statements executed
+        """
+        self.kind = kind
+        self.name = name
+        self.seconds = seconds
+        self.statements = statements
+
+    def __repr__(self):
+        """
+        Make string representation
+
+        Returns:
+          str: The string representation
+        """
+        return "%s(%r, %r, seconds=%.6f, statements=%d)" % (
+            self.__class__.__name__,
+            self.kind,
+            self.name,
+            self.seconds,
+            self.statements,
+        )
+
+
+class Recorder(object):
+    """
+    Observer recording all events
+
+    Attributes:
+      events (list):
+        Recorded events (`Event`), in order of completion
+    """
+
+    def __init__(self):
+        """Initialization"""
+        self.events = []
+
+    def __call__(self, event):
+        """
+        Record an event
+
+        Parameters:
+          event (Event):
+            The event
+        """
+        self.events.append(event)
+
+    def totals(self):
+        """
+        Sum up the events per phase
+
+        Returns:
+          dict: Phase name -> (events, seconds, statements)
+        """
+        result = {}
+        for event in self.events:
+            count, seconds, statements = result.get(event.kind, (0, 0.0, 0))
+            result[event.kind] = (
+                count + 1,
+                seconds + event.seconds,
+                statements + event.statements,
+            )
+        return result
+
+    def slowest(self, kind, top=10):
+        """
+        Find the slowest events of a phase
+
+        Events with the same name are summed up.
+
+        Parameters:
+          kind (str):
+            Phase name
+
+          top (int):
+            Maximum number of events to return
+
+        Returns:
+          list: Events, slowest first
+        """
+        found = {}
+        for event in self.events:
+            if event.kind != kind:
+                continue
+            if event.name in found:
+                other = found[event.name]
+                found[event.name] = Event(
+                    kind,
+                    event.name,
+                    other.seconds + event.seconds,
+                    other.statements + event.statements,
+                )
+            else:
+                found[event.name] = event
+        return sorted(
+            found.values(), key=lambda x: (-x.seconds, -x.statements)
+        )[:top]
+
+    def summary(self, top=10):
+        """
+        Make a summary report
+
+        The report lists the totals per phase and the slowest tables (for
+        reflection and rendering) and types.
+
+        Parameters:
+          top (int):
+            Number of slowest items to list per phase
+
+        Returns:
+          str: The report
+        """
+        totals = self.totals()
+        lines = [
+            "%-10s %8s %12s %12s"
+            % ("phase", "events", "seconds", "statements")
+        ]
+        for kind in sorted(totals, key=lambda x: -totals[x][1]):
+            count, seconds, statements = totals[kind]
+            lines.append(
+                "%-10s %8d %12.3f %12d" % (kind, count, seconds, statements)
+            )
+
+        for kind in ("reflect", "render", "type"):
+            events = self.slowest(kind, top=top)
+            if not events:
+                continue
+            lines.extend(["", "slowest %s:" % (kind,)])
+            for event in events:
+                lines.append(
+                    "  %12.3f %12d  %s"
+                    % (event.seconds, event.statements, event.name)
+                )
+        return "\n".join(lines) + "\n"
+
+
+class Instrument(object):
+    """
+    Measure phases and report them to an observer
+
+    While entered, the instrument is active for the current thread (see
+    `timed`) and counts the statements executed on the engine.
+
+    Attributes:
+      statements (int):
+        Number of statements executed so far
+
+      _observer (callable):
+        Observer, receiving the events
+
+      _engine (sqlalchemy.engine.Engine):
+        Engine to count the statements of or ``None``
+
+      _lock (threading.Lock):
+        Lock guarding the statement counter
+
+      _listener (callable):
+        The registered event listener or ``None``
+    """
+
+    def __init__(self, observer, bind=None):
+        """
+        Initialization
+
+        Parameters:
+          observer (callable):
+            Observer, called with an `Event` per measured phase
+
+          bind (Connection or Engine):
+            Database connection to count the statements of. If omitted or
+            ``None``, no statements are counted.
+        """
+        self.statements = 0
+        self._observer = observer
+        self._engine = getattr(bind, "engine", bind)
+        self._lock = _threading.Lock()
+        self._listener = None
+
+    def __enter__(self):
+        """
+        Activate the instrument
+
+        Returns:
+          Instrument: The instrument itself
+        """
+        if self._engine is not None and self._listener is None:
+
+            def count(*args):
+                """Count statement"""
+                # pylint: disable = unused-argument
+                with self._lock:
+                    self.statements += 1
+
+            _sa.event.listen(self._engine, "before_cursor_execute", count)
+            self._listener = count
+
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        return self
+
+    def __exit__(self, *args):
+        """Deactivate the instrument"""
+        _local.stack.remove(self)
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            _sa.event.remove(self._engine, "before_cursor_execute", listener)
+
+    @_contextlib.contextmanager
+    def timed(self, kind, name=None):
+        """
+        Measure a phase
+
+        Parameters:
+          kind (str):
+            Phase name
+
+          name (str):
+            Table key or type name or ``None``
+
+        Returns:
+          contextmanager: Measuring context
+        """
+        statements = self.statements
+        start = _clock()
+        try:
+            yield
+        finally:
+            self._observer(
+                Event(
+                    kind,
+                    name,
+                    _clock() - start,
+                    self.statements - statements,
+                )
+            )
+
+
+@_contextlib.contextmanager
+def instrument(observer, bind=None):
+    """
+    Activate an instrument for the current thread
+
+    Parameters:
+      observer (callable):
+        Observer or ``None``. If ``None``, nothing is measured.
+
+      bind (Connection or Engine):
+        Database connection to count the statements of or ``None``
+
+    Returns:
+      contextmanager: Yields the `Instrument` or ``None``
+    """
+    if observer is None:
+        yield None
+        return
+    with Instrument(observer, bind) as result:
+        yield result
+
+
+def timed(kind, name=None):
+    """
+    Measure a phase with the instrument active for the current thread
+
+    Without active instrument, nothing is measured.
+
+    Parameters:
+      kind (str):
+        Phase name
+
+      name (str):
+        Table key or type name or ``None``
+
+    Returns:
+      contextmanager: Measuring context
+    """
+    stack = getattr(_local, "stack", None)
+    if not stack:
+        return _null()
+    return stack[-1].timed(kind, name)
+
+
+@_contextlib.contextmanager
+def _null():
+    """Do nothing"""
+    yield
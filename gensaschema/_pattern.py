@@ -0,0 +1,177 @@
+# -*- coding: ascii -*-
+u"""
+=====================
+ Table name patterns
+=====================
+
+Table name patterns, expanded against the catalog.
+
+A pattern is a (possibly schema qualified) glob, like ``billing.*``, or a
+regular expression, prefixed by ``re:``, like ``re:^audit_`` or
+``billing.re:^audit_``. Regular expressions are searched in the table name.
+Schema names are taken literally.
+
+Variable names of matching tables are built from templates, like
+``%(name)s`` or ``audit_%(name)s``. The template parameters are ``name``
+(the table name) and ``schema`` (the schema name or an empty string).
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import fnmatch as _fnmatch
+import logging as _logging
+import re as _re
+
+import sqlalchemy as _sa
+
+logger = _logging.getLogger(__name__)
+
+#: Default variable name template
+#:
+#: :Type: str
+VARNAME = "%(name)s"
+
+#: Regular expression prefix
+#:
+#: :Type: str
+_REGEX = "re:"
+
+#: Glob special characters
+#:
+#: :Type: str
+_GLOB = "*?["
+
+
+def split(name):
+    """
+    Split a table name or pattern into schema and name part
+
+    Parameters:
+      name (str):
+        Table name or pattern
+
+    Returns:
+      tuple: Schema (or ``None``) and name part
+    """
+    idx = name.find(_REGEX)
+    if idx == 0:
+        return None, name
+    if idx > 0 and name[idx - 1] == ".":
+        return name[: idx - 1], name[idx:]
+    if "." in name:
+        schema, name = name.split(".", 1)
+        return schema, name
+    return None, name
+
+
+def is_pattern(name):
+    """
+    Check if a table name is a pattern
+
+    Parameters:
+      name (str):
+        Table name
+
+    Returns:
+      bool: Is it a pattern?
+    """
+    _, name = split(name)
+    if name.startswith(_REGEX):
+        return True
+    return any(char in name for char in _GLOB)
+
+
+def compile(name):  # pylint: disable = redefined-builtin
+    """
+    Compile a pattern
+
+    Parameters:
+      name (str):
+        The pattern
+
+    Returns:
+      tuple: Schema (or ``None``) and matcher (callable, taking the table
+      name and returning a true value for matching tables)
+
+    Raises:
+      re.error: Invalid regular expression
+    """
+    schema, name = split(name)
+    if name.startswith(_REGEX):
+        return schema, _re.compile(name[len(_REGEX) :]).search
+    return schema, _re.compile(_fnmatch.translate(name)).match
+
+
+def expand(bind, names):
+    """
+    Expand patterns in a table list
+
+    The tables of each schema are listed once. Matching tables are added in
+    alphabetical order. Tables listed explicitly or matched by an earlier
+    pattern are not added again.
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      names (iterable):
+        Name list (list of tuples (varname or template, name or pattern))
+
+    Returns:
+      list: Expanded name list (list of tuples (varname, name))
+
+    Raises:
+      re.error: Invalid regular expression
+    """
+    names = list(names)
+    if not any(is_pattern(name) for _, name in names):
+        return names
+
+    seen = set(split(name) for _, name in names if not is_pattern(name))
+    inspector = _sa.inspect(bind)
+    listings = {}
+
+    result = []
+    for varname, name in names:
+        if not is_pattern(name):
+            result.append((varname, name))
+            continue
+
+        schema, match = compile(name)
+        if schema not in listings:
+            listings[schema] = sorted(
+                inspector.get_table_names(schema=schema)
+            )
+        count = 0
+        for table in listings[schema]:
+            if (schema, table) in seen or not match(table):
+                continue
+            seen.add((schema, table))
+            result.append(
+                (
+                    varname % dict(name=table, schema=schema or ""),
+                    table if schema is None else "%s.%s" % (schema, table),
+                )
+            )
+            count += 1
+        logger.debug("Pattern %r matched %d table(s)", name, count)
+    return result
@@ -0,0 +1,253 @@
+# -*- coding: ascii -*-
+u"""
+=====================
+ Reflection planning
+=====================
+
+Foreign key closure planning.
+
+Before reflecting anything, the foreign keys of the requested tables (and
+of their targets, level by level) are read from the catalog. The resulting
+plan tells which tables are going to be reflected. With a depth limit or a
+stop list, the tables beyond the boundary are reflected lightly (just
+columns and primary key, no foreign keys), so the closure ends there.
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import logging as _logging
+
+import sqlalchemy as _sa
+
+from . import _graph
+from . import _pattern
+from . import _reflect
+from . import _sqlite
+
+try:
+    from sqlalchemy.engine import reflection as _sa_reflection
+except ImportError:  # pragma: no cover
+    _sa_reflection = None
+
+logger = _logging.getLogger(__name__)
+
+
+class Plan(object):
+    """
+    Reflection plan
+
+    Attributes:
+      graph (ForeignKeyGraph):
+        Foreign key graph of the planned tables. Boundary tables have no
+        outgoing edges.
+
+      depth (dict):
+        Table key -> distance from the requested tables
+
+      tables (list):
+        Keys of the tables to reflect fully, in order of discovery
+
+      boundary (list):
+        Keys of the tables to reflect lightly, in order of discovery
+    """
+
+    def __init__(self, graph, depth, tables, boundary):
+        """
+        Initialization
+
+        Parameters:
+          graph (ForeignKeyGraph):
+            Foreign key graph
+
+          depth (dict):
+            Table key -> distance from the requested tables
+
+          tables (list):
+            Keys of the tables to reflect fully
+
+          boundary (list):
+            Keys of the tables to reflect lightly
+        """
+        self.graph = graph
+        self.depth = depth
+        self.tables = tables
+        self.boundary = boundary
+
+    def __repr__(self):
+        """
+        Make string representation
+
+        Returns:
+          str: The string representation
+        """
+        return "<%s: %d table(s), %d boundary table(s)>" % (
+            self.__class__.__name__,
+            len(self.tables),
+            len(self.boundary),
+        )
+
+
+def plan(bind, names, max_depth=None, stop=None, prefetch=False):
+    """
+    Plan the reflection of tables
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      names (iterable):
+        Table names (possibly qualified). They are always reflected fully.
+
+      max_depth (int):
+        Maximum foreign key distance of fully reflected tables from the
+        requested ones. Tables one step further are reflected lightly. If
+        omitted or ``None``, the depth is not limited.
+
+      stop (iterable):
+        Table names or patterns (see `Schema`) of tables to reflect lightly
+        (unless requested). If omitted or ``None``, no table is stopped at.
+
+      prefetch (bool):
+        Read the SQLite catalog in bulk (see ``_sqlite.prefetching``)?
+
+    Returns:
+      Plan: The plan
+    """
+    # pylint: disable = too-many-locals
+
+    stopped = _stopper(stop or ())
+    inspector = _sqlite.inspect(
+        bind, _sqlite.prefetching(bind.dialect) if prefetch else None
+    )
+    graph, depth, tables, boundary = _graph.ForeignKeyGraph(), {}, [], []
+
+    level = []
+    for key in map(_reflect.split_name, names):
+        if key not in depth:
+            depth[key] = 0
+            level.append(key)
+
+    while level:
+        expand = []
+        for key in level:
+            if depth[key] and (
+                (max_depth is not None and depth[key] > max_depth)
+                or stopped(key)
+            ):
+                boundary.append(key)
+                graph.add(key)
+            else:
+                expand.append(key)
+
+        found = _foreign_keys(inspector, expand)
+        level = []
+        for key in expand:
+            tables.append(key)
+            graph.add(key, found.get(key, ()))
+            for remote in found.get(key, ()):
+                if remote not in depth:
+                    depth[remote] = depth[key] + 1
+                    level.append(remote)
+
+    logger.debug(
+        "Planned %d table(s), %d boundary table(s)",
+        len(tables),
+        len(boundary),
+    )
+    return Plan(graph, depth, tables, boundary)
+
+
+def _stopper(stop):
+    """
+    Make the stop list matcher
+
+    Parameters:
+      stop (iterable):
+        Table names or patterns
+
+    Returns:
+      callable: Matcher, taking a table key and returning a boolean
+    """
+    keys, patterns = set(), []
+    for name in stop:
+        if _pattern.is_pattern(name):
+            patterns.append(_pattern.compile(name))
+        else:
+            keys.add(_reflect.split_name(name))
+
+    def stopped(key):
+        """Check if a table is stopped at"""
+        if key in keys:
+            return True
+        return any(
+            schema == key[0] and match(key[1]) for schema, match in patterns
+        )
+
+    return stopped
+
+
+def _foreign_keys(inspector, keys):
+    """
+    Read the foreign key targets of tables
+
+    Parameters:
+      inspector (sqlalchemy.engine.reflection.Inspector):
+        Inspector
+
+      keys (iterable):
+        Table keys (schema, name)
+
+    Returns:
+      dict: Table key -> target table keys (list). Missing tables are left
+      out.
+    """
+    batch = {}
+    for schema, name in keys:
+        batch.setdefault(schema, []).append(name)
+
+    result = {}
+    for schema, names in sorted(
+        batch.items(), key=lambda x: (x[0] is not None, x[0])
+    ):
+        if hasattr(inspector, "get_multi_foreign_keys"):
+            found = inspector.get_multi_foreign_keys(
+                schema=schema,
+                filter_names=names,
+                kind=_sa_reflection.ObjectKind.ANY,
+                scope=_sa_reflection.ObjectScope.ANY,
+            )
+        else:
+            found = {}
+            for name in names:
+                try:
+                    found[schema, name] = inspector.get_foreign_keys(
+                        name, schema=schema
+                    )
+                except _sa.exc.NoSuchTableError:
+                    continue
+
+        for key, fkeys in found.items():
+            result[key] = [
+                (fkey["referred_schema"], fkey["referred_table"])
+                for fkey in fkeys
+            ]
+    return result
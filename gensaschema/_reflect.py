@@ -0,0 +1,925 @@
+# -*- coding: ascii -*-
+u"""
+============
+ Reflection
+============
+
+Catalog reflection machinery.
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import contextlib as _contextlib
+import errno as _errno
+import io as _io
+import json as _json
+import logging as _logging
+import re as _re
+import warnings as _warnings
+import weakref as _weakref
+
+import sqlalchemy as _sa
+
+from . import _meta
+from . import _observe
+from . import _sqlite
+
+try:
+    from sqlalchemy.engine import reflection as _sa_reflection
+except ImportError:  # pragma: no cover
+    _sa_reflection = None
+
+logger = _logging.getLogger(__name__)
+
+#: Is the multi reflection API (SQLAlchemy 2.0+) available? Building
+#: tables from the collected information needs more, see
+#: ``_bulk.AVAILABLE``.
+#:
+#: :Type: bool
+MULTI = hasattr(
+    getattr(_sa_reflection, "Inspector", None), "get_multi_columns"
+)
+
+
+def _probe_cache(reflection):
+    """
+    Check the key layout of the inspector cache
+
+    The layout is private to SQLAlchemy. It's checked by running the cache
+    decorator of the reflection module on a dummy column lookup. If it
+    differs from the known one, the type prescan does not share the cache
+    with the reflection (see `prescan_types`).
+
+    Parameters:
+      reflection (module):
+        SQLAlchemy's reflection module (or ``None``)
+
+    Returns:
+      bool: Is the layout known?
+    """
+    cache = getattr(reflection, "cache", None)
+    if cache is None:
+        return False
+
+    def get_columns(dialect, connection, table_name, schema=None, **kw):
+        """Dummy column lookup"""
+        # pylint: disable = unused-argument
+        return []
+
+    info_cache = {}
+    quote = _sa.sql.quoted_name
+    try:
+        cache(get_columns)(
+            None,
+            None,
+            quote("t", None),
+            schema=quote("s", None),
+            info_cache=info_cache,
+        )
+    except Exception:  # pylint: disable = broad-except
+        return False
+    return list(info_cache) == [
+        ("get_columns", (("t", None),), (("schema", ("s", None)),))
+    ]
+
+
+#: Can the type prescan share the inspector cache with the reflection (see
+#: `_probe_cache`)?
+#:
+#: :Type: bool
+SHARED_CACHE = MULTI and _probe_cache(_sa_reflection)
+
+#: Matcher for the unknown type warning
+#:
+#: :Type: callable
+_TYPE_MATCH = _re.compile(u"^Did not recognize type (.+) of column").match
+
+
+def split_name(name):
+    """
+    Split a (possibly qualified) table name
+
+    Parameters:
+      name (str):
+        Table name
+
+    Returns:
+      tuple: Schema (or ``None``) and table name
+    """
+    if "." in name:
+        schema, name = name.split(".")
+        return schema, name
+    return None, name
+
+
+def type_name(e):
+    """
+    Extract type name from reflection warning
+
+    Parameters:
+      e (sqlalchemy.exc.SAWarning):
+        The warning (raised as exception)
+
+    Returns:
+      str: The type name or ``None``
+    """
+    match = _TYPE_MATCH(e.args[0])
+    if match:
+        name = match.group(1).strip()
+        if name.startswith(('"', "'")):
+            name = name[1:-1]
+        return name or None
+    return None
+
+
+@_contextlib.contextmanager
+def warning_policy():
+    """
+    Install the reflection warning policy
+
+    Unknown types turn into exceptions (so the type loader can be invoked),
+    warnings about things we do not emit anyway are silenced.
+    """
+    with _warnings.catch_warnings():
+        _warnings.filterwarnings(
+            "error",
+            category=_sa.exc.SAWarning,
+            message=r"^Did not recognize type ",
+        )
+        _warnings.filterwarnings(
+            "error",
+            category=_sa.exc.SAWarning,
+            message=r"^Unknown column definition ",
+        )
+        _warnings.filterwarnings(
+            "error",
+            category=_sa.exc.SAWarning,
+            message=r"^Incomplete reflection of " r"column definition",
+        )
+        _warnings.filterwarnings(
+            "ignore",
+            category=_sa.exc.SAWarning,
+            message=r"^Could not instantiate type ",
+        )
+        _warnings.filterwarnings(
+            "ignore",
+            category=_sa.exc.SAWarning,
+            message=r"^Skipped unsupported "
+            r"reflection of expression-based"
+            r" index ",
+        )
+        _warnings.filterwarnings(
+            "ignore",
+            category=_sa.exc.SAWarning,
+            message=r"^Predicate of partial index ",
+        )
+        yield
+
+
+def load_type(e, types, metadata, symbols, seen):
+    """
+    Feed an unknown type to the type loader
+
+    Parameters:
+      e (sqlalchemy.exc.SAWarning):
+        The warning (raised as exception)
+
+      types (callable):
+        Extra type loader. May be ``None``.
+
+      metadata (SA (bound) metadata):
+        Metadata container
+
+      symbols (Symbols):
+        Symbol table
+
+      seen (set):
+        Type names already loaded. Modified in place.
+
+    Returns:
+      bool: Was a type loaded? If false, the warning should be re-raised.
+
+    Raises:
+      sqlalchemy.exc.SAWarning: The type loader failed with an unknown type
+    """
+    if types is None:
+        return False
+
+    tname = type_name(e)
+    if not tname or tname in seen:
+        return False
+
+    call_loader(tname, types, metadata, symbols, seen)
+    return True
+
+
+def call_loader(tname, types, metadata, symbols, seen):
+    """
+    Call the type loader
+
+    If the loader itself runs into unknown types, these are loaded first.
+
+    Parameters:
+      tname (str):
+        Type name
+
+      types (callable):
+        Extra type loader
+
+      metadata (SA (bound) metadata):
+        Metadata container
+
+      symbols (Symbols):
+        Symbol table
+
+      seen (set):
+        Type names already loaded. Modified in place.
+
+    Raises:
+      sqlalchemy.exc.SAWarning: The type loader failed with an unknown type
+    """
+    stack = [tname]
+    while stack:
+        try:
+            with _observe.timed("type", stack[-1]):
+                types(stack[-1], metadata, symbols)
+        except _sa.exc.SAWarning as exc:
+            tname = type_name(exc)
+            if tname and tname not in stack and tname not in seen:
+                stack.append(tname)
+                continue
+            raise
+        else:
+            seen.add(stack.pop())
+
+
+def prescan_types(keys, types, metadata, symbols, seen, inspector=None):
+    """
+    Feed all unknown column types of the tables to the type loader upfront
+
+    The columns of the tables (and of their foreign key targets, level by
+    level) are fetched with the unknown type warnings recorded instead of
+    raised. The type loader is called once per distinct type name
+    afterwards, so the tables can be reflected in one go.
+
+    If possible (see `SHARED_CACHE`), the catalog is read through
+    `inspector`, so the reflection can reuse its cache. The cached columns
+    of tables containing unknown types are dropped then, so these tables are
+    read again (with the loaded types). Otherwise a separate inspector is
+    used. The prescan needs the multi reflection API, without it nothing
+    happens (the reflection falls back to loading the types one by one).
+
+    Parameters:
+      keys (iterable):
+        Table keys (schema, name)
+
+      types (callable):
+        Extra type loader. May be ``None``.
+
+      metadata (SA (bound) metadata):
+        Metadata container
+
+      symbols (Symbols):
+        Symbol table
+
+      seen (set):
+        Type names already loaded. Modified in place.
+
+      inspector (sqlalchemy.engine.reflection.Inspector):
+        Inspector to share the catalog reads with. If omitted or ``None``,
+        a new one is used.
+
+    Raises:
+      sqlalchemy.exc.SAWarning: The type loader failed with an unknown type
+    """
+    if types is None or not MULTI:
+        return
+
+    shared = inspector is not None and _shares_cache(inspector)
+    if not shared:
+        inspector = _sa.inspect(metadata.bind)
+    tnames, done, todo, unknown = [], set(), list(keys), []
+    with _warnings.catch_warnings(record=True) as recorded:
+        _warnings.simplefilter("always", _sa.exc.SAWarning)
+        while todo:
+            batch = {}
+            for key in todo:
+                if key not in done:
+                    done.add(key)
+                    batch.setdefault(key[0], []).append(key[1])
+            todo = []
+            for schema in sorted(batch, key=lambda x: (x is not None, x)):
+                targets, found = _scan_columns(
+                    inspector, schema, batch[schema]
+                )
+                todo.extend(targets)
+                unknown.extend(found)
+
+            for warning in recorded:
+                tname = type_name(warning.message)
+                if tname and tname not in seen and tname not in tnames:
+                    tnames.append(tname)
+            del recorded[:]
+
+    logger.debug("Found %d unknown type(s)", len(tnames))
+    if shared:
+        _forget_columns(inspector, unknown)
+    for tname in tnames:
+        if tname not in seen:
+            call_loader(tname, types, metadata, symbols, seen)
+
+
+def _scan_columns(inspector, schema, names):
+    """
+    Fetch the columns of tables of a single schema
+
+    Parameters:
+      inspector (sqlalchemy.engine.reflection.Inspector):
+        Inspector
+
+      schema (str):
+        Schema name or ``None``
+
+      names (list):
+        Table names
+
+    Returns:
+      tuple: Foreign key target keys (schema, name) of the tables found
+      (list) and keys of the tables containing unknown types (list)
+    """
+    # Quoted like by Table, so the inspector's cache is shared with the
+    # reflection.
+    quote = _sa.sql.quoted_name
+    kwargs = dict(
+        schema=None if schema is None else quote(schema, None),
+        filter_names=[quote(name, None) for name in names],
+        kind=_sa_reflection.ObjectKind.ANY,
+        scope=_sa_reflection.ObjectScope.ANY,
+    )
+    found = inspector.get_multi_columns(**kwargs)
+    fkeys = inspector.get_multi_foreign_keys(**kwargs)
+    unknown = [
+        key
+        for key, columns in sorted(found.items(), key=repr)
+        if any(
+            isinstance(column["type"], _sa.types.NullType)
+            for column in columns
+        )
+    ]
+    return [
+        (fkey["referred_schema"], fkey["referred_table"])
+        for key in found
+        for fkey in fkeys[key]
+    ], unknown
+
+
+def _shares_cache(inspector):
+    """
+    Check if the prescan can share the inspector's cache
+
+    That needs the known cache layout (see `SHARED_CACHE`) and a dialect
+    reading the columns table by table (SQLAlchemy's default
+    ``get_multi_columns`` implementation), so the cached columns can be
+    dropped per table.
+
+    Parameters:
+      inspector (sqlalchemy.engine.reflection.Inspector):
+        Inspector
+
+    Returns:
+      bool: Share the cache?
+    """
+    if not SHARED_CACHE:
+        return False
+    default = _sa.engine.default.DefaultDialect.get_multi_columns
+    return type(inspector.dialect).get_multi_columns is default
+
+
+def _forget_columns(inspector, keys):
+    """
+    Drop the cached columns of tables from the inspector's cache
+
+    The cache layout is checked by `_probe_cache`.
+
+    Parameters:
+      inspector (sqlalchemy.engine.reflection.Inspector):
+        Inspector
+
+      keys (list):
+        Table keys (schema, name)
+    """
+    if not keys:
+        return
+
+    def name_of(arg):
+        """Strip the quote flag from a cache key argument"""
+        return arg[0] if isinstance(arg, tuple) else arg
+
+    cache = inspector.info_cache
+    for ckey in list(cache):
+        if (
+            isinstance(ckey, tuple)
+            and len(ckey) == 3
+            and ckey[0] == "get_columns"
+            and ckey[1]
+        ):
+            key = (name_of(dict(ckey[2]).get("schema")), name_of(ckey[1][0]))
+            if key in keys:
+                del cache[ckey]
+
+
+class TypeRegistry(object):
+    """
+    Memoizing type loader
+
+    Wraps the user's type loader, so it's called only once per type name
+    and symbol table. It also remembers the type classes the loader
+    registered with the dialect and the type names loaded per dialect. The
+    latter can be saved and used to preload the types in subsequent runs,
+    which avoids running into the unknown type warnings in the first
+    place::
+
+        types = TypeRegistry.from_file(loader, 'types.json')
+        schema = Schema(conn, tables, schemas, symbols, types=types)
+        with open('types.json', 'w') as fp:
+            types.dump(fp)
+
+    The instance is a type loader itself and can be passed wherever one is
+    expected.
+
+    Attributes:
+      _types (callable):
+        Extra type loader
+
+      _names (dict):
+        Dialect name -> set of loaded type names
+
+      _symbols (weakref.WeakKeyDictionary):
+        Symbols -> list of loaded type names. Symbol tables are not kept
+        alive by the registry.
+
+      _classes (dict):
+        Type class -> name of the type loaded by the type loader
+    """
+
+    def __init__(self, types, names=None):
+        """
+        Initialization
+
+        Parameters:
+          types (callable):
+            Extra type loader. See `Schema` for details.
+
+          names (dict):
+            Type names to preload (dialect name -> iterable of type names).
+            If omitted or ``None``, nothing is preloaded.
+        """
+        self._types = types
+        self._names = dict(
+            (dialect, set(tnames))
+            for dialect, tnames in (names or {}).items()
+        )
+        self._symbols = _weakref.WeakKeyDictionary()
+        self._classes = {}
+
+    @classmethod
+    def from_file(cls, types, name_or_file):
+        """
+        Construct with type names saved by `dump`
+
+        Parameters:
+          types (callable):
+            Extra type loader
+
+          name_or_file (str or file):
+            Filename or file pointer
+
+        Returns:
+          TypeRegistry: New instance
+
+        Raises:
+          IOError: Error reading the file (except for ENOENT, which
+                   treats the file as empty)
+        """
+        read = getattr(name_or_file, "read", None)
+        if read is None:
+            try:
+                # pylint: disable = bad-option-value, unspecified-encoding
+                # pylint: disable = bad-option-value, consider-using-with
+                fp = open(name_or_file)
+            except IOError as e:
+                if e.errno != _errno.ENOENT:
+                    raise
+                return cls(types)
+            try:
+                content = fp.read()
+            finally:
+                fp.close()
+        else:
+            content = read()
+
+        if not isinstance(content, str):
+            content = content.decode("utf-8")
+        names = {}
+        if content.strip():
+            names = _json.loads(content).get("types", {})
+        return cls(types, names=names)
+
+    def dump(self, fp):
+        """
+        Dump the loaded type names to a file
+
+        Parameters:
+          fp (file):
+            Stream to dump to. Binary streams receive UTF-8 encoded text.
+        """
+        content = _json.dumps(
+            dict(
+                types=dict(
+                    (dialect, sorted(tnames))
+                    for dialect, tnames in self._names.items()
+                )
+            ),
+            indent=2,
+            sort_keys=True,
+        )
+        content += "\n"
+        if isinstance(fp, (_io.RawIOBase, _io.BufferedIOBase)):
+            content = content.encode("utf-8")
+        fp.write(content)
+
+    def __call__(self, tname, metadata, symbols):
+        """
+        Load type, unless already done for this symbol table
+
+        Parameters:
+          tname (str):
+            Type name
+
+          metadata (SA (bound) metadata):
+            Metadata container
+
+          symbols (Symbols):
+            Symbol table
+        """
+        loaded = self._symbols.get(symbols)
+        if loaded is None:
+            loaded = self._symbols[symbols] = []
+        if tname in loaded:
+            return
+
+        dialect = metadata.bind.dialect
+        before = set(dialect.ischema_names.values())
+        self._types(tname, metadata, symbols)
+        for value in dialect.ischema_names.values():
+            if value not in before:
+                self._classes[value] = tname
+        loaded.append(tname)
+        self._names.setdefault(dialect.name, set()).add(tname)
+
+    def preload(self, metadata, symbols):
+        """
+        Load all known types of the dialect
+
+        Parameters:
+          metadata (SA (bound) metadata):
+            Metadata container
+
+          symbols (Symbols):
+            Symbol table
+
+        Raises:
+          sqlalchemy.exc.SAWarning: The type loader failed with an unknown
+          type
+        """
+        seen = set()
+        for tname in sorted(self._names.get(metadata.bind.dialect.name, ())):
+            if tname not in seen:
+                call_loader(tname, self, metadata, symbols, seen)
+
+    def loaded(self, symbols):
+        """
+        Find the type names loaded for a symbol table
+
+        Parameters:
+          symbols (Symbols):
+            Symbol table
+
+        Returns:
+          list: Type names, in load order
+        """
+        return list(self._symbols.get(symbols, ()))
+
+    def type_names(self, type_):
+        """
+        Find the names of loaded types used by a reflected type
+
+        Parameters:
+          type_ (sqlalchemy.types.TypeEngine):
+            Reflected type
+
+        Returns:
+          set: Type names
+        """
+        result = set()
+        while type_ is not None:
+            if type_.__class__ in self._classes:
+                result.add(self._classes[type_.__class__])
+            type_ = getattr(type_, "item_type", None)
+        return result
+
+
+class ReflectionSession(object):
+    """
+    Reflection state, shared by the tables of a collection build
+
+    The caller installs the warning policy (see `warning_policy`) once
+    around the reflection of all tables. The tables are autoloaded through
+    the same inspector, so its info
+    cache is reused across the tables. With SQLAlchemy versions not
+    accepting an inspector for autoloading, the bind is used instead.
+
+    If the SQLite catalog is prefetched, foreign key targets are reflected
+    by the session as well (instead of by SQLAlchemy), so they're read
+    through the same inspector.
+
+    Attributes:
+      metadata (SA (bound) metadata):
+        Metadata container
+
+      symbols (Symbols):
+        Symbol table
+
+      types (TypeRegistry):
+        Type loader (or ``None``)
+
+      seen (set):
+        Type names already fed to the type loader
+
+      _inspector (sqlalchemy.engine.reflection.Inspector):
+        Inspector, created on first use
+
+      _prefetch (bool):
+        Read the SQLite catalog in bulk?
+    """
+
+    def __init__(
+        self, metadata, symbols, types=None, inspector=None, prefetch=False
+    ):
+        """
+        Initialization
+
+        Parameters:
+          metadata (SA (bound) metadata):
+            Metadata container
+
+          symbols (Symbols):
+            Symbol table
+
+          types (callable):
+            Extra type loader. See ``_bulk.BulkReflector`` for details. Plain
+            loaders are wrapped into a `TypeRegistry`.
+
+          inspector (sqlalchemy.engine.reflection.Inspector):
+            Inspector to use. If omitted or ``None``, one is created on
+            first use.
+
+          prefetch (bool):
+            Read the SQLite catalog in bulk (see ``_sqlite.prefetching``)?
+            Applies to a created inspector only and needs SQLAlchemy 1.4+.
+            If omitted or false, the dialect reads the catalog as usual.
+        """
+        if types is not None and not isinstance(types, TypeRegistry):
+            types = TypeRegistry(types)
+        self.metadata = metadata
+        self.symbols = symbols
+        self.types = types
+        self.seen = set()
+        self._inspector = inspector
+        self._prefetch = False
+        if inspector is None and prefetch:
+            dialect = _sqlite.prefetching(metadata.bind.dialect)
+            if dialect is not None:
+                self._inspector = _sqlite.inspect(metadata.bind, dialect)
+                self._prefetch = hasattr(
+                    self._inspector, "_inspection_context"
+                )
+
+    @property
+    def inspector(self):
+        """
+        Inspector
+
+        :Type: sqlalchemy.engine.reflection.Inspector
+        """
+        if self._inspector is None:
+            self._inspector = _sa.inspect(self.metadata.bind)
+        return self._inspector
+
+    @property
+    def autoload_with(self):
+        """
+        Object to pass as ``autoload_with``
+
+        :Type: Inspector or Connection
+        """
+        if hasattr(self.inspector, "_inspection_context"):
+            return self.inspector
+        return self.metadata.bind
+
+    def preload(self):
+        """
+        Preload the known types of the type registry
+
+        Raises:
+          sqlalchemy.exc.SAWarning: The type loader failed with an unknown
+          type
+        """
+        if self.types is not None:
+            self.types.preload(self.metadata, self.symbols)
+
+    def prescan(self, names):
+        """
+        Feed all unknown column types of the tables to the type loader
+
+        See `prescan_types`. Tables in the metadata already are skipped.
+        The catalog is read through the session's inspector, so the
+        autoloading reuses what's been read.
+
+        Parameters:
+          names (iterable):
+            Table names (possibly qualified)
+
+        Raises:
+          sqlalchemy.exc.SAWarning: The type loader failed with an unknown
+          type
+        """
+        prescan_types(
+            [
+                key
+                for key in map(split_name, names)
+                # Reflected before (shared metadata)
+                if ".".join(filter(None, key)) not in self.metadata.tables
+            ],
+            self.types,
+            self.metadata,
+            self.symbols,
+            self.seen,
+            inspector=self.inspector,
+        )
+
+    def reflect(self, name):
+        """
+        Autoload a table
+
+        Unknown types are fed to the type loader.
+
+        Parameters:
+          name (str):
+            Table name (possibly qualified)
+
+        Returns:
+          sqlalchemy.Table: The table
+
+        Raises:
+          sqlalchemy.exc.SAWarning: The type loader failed with an unknown
+          type
+        """
+        with _observe.timed("reflect", name):
+            result = self._autoload(name)
+            if self._prefetch:
+                todo = [result]
+                while todo:
+                    for fkey in todo.pop().foreign_keys:
+                        target = fkey.target_fullname.rpartition(".")[0]
+                        if target not in self.metadata.tables:
+                            todo.append(self._autoload(target))
+            return result
+
+    def _autoload(self, name):
+        """
+        Autoload a single table
+
+        Parameters:
+          name (str):
+            Table name (possibly qualified)
+
+        Returns:
+          sqlalchemy.Table: The table
+
+        Raises:
+          sqlalchemy.exc.SAWarning: The type loader failed with an unknown
+          type
+        """
+        kwargs = {}
+        schema, name = split_name(name)
+        if schema is not None:
+            kwargs["schema"] = schema
+        if self._prefetch:
+            # The foreign key targets are reflected by the session
+            kwargs["resolve_fks"] = False
+
+        while True:
+            try:
+                return _sa.Table(
+                    name,
+                    self.metadata,
+                    autoload_with=self.autoload_with,
+                    **kwargs
+                )
+            except _sa.exc.SAWarning as e:
+                if not load_type(
+                    e, self.types, self.metadata, self.symbols, self.seen
+                ):
+                    raise
+
+
+class ReflectionContext(object):
+    """
+    Reflection state, shared by several schema builds on the same database
+
+    All builds reflect into the same metadata container, through the same
+    inspector. Tables reflected by one build (including foreign key
+    targets) are reused by the others, so each table is reflected at most
+    once.
+
+    The type loader should be a `TypeRegistry` (plain loaders are wrapped),
+    so types loaded by one build are replayed into the symbol tables of
+    the others. Builds sharing a context should use the same schema
+    mapping and `shallow` setting, because stubbed tables are reused as
+    well.
+
+    Attributes:
+      metadata (BoundMetaData):
+        Metadata container
+
+      types (TypeRegistry):
+        Type loader (or ``None``)
+
+      _inspector (sqlalchemy.engine.reflection.Inspector):
+        Inspector, created on first use
+    """
+
+    def __init__(self, bind, types=None):
+        """
+        Initialization
+
+        Parameters:
+          bind (Connection or Engine):
+            Database connection
+
+          types (callable):
+            Extra type loader. See ``_bulk.BulkReflector`` for details. If
+            omitted or ``None``, the reflector will always fail on unknown
+            types.
+        """
+        if types is not None and not isinstance(types, TypeRegistry):
+            types = TypeRegistry(types)
+        self.metadata = _meta.BoundMetaData(bind)
+        self.types = types
+        self._inspector = None
+
+    @property
+    def inspector(self):
+        """
+        Inspector
+
+        :Type: sqlalchemy.engine.reflection.Inspector
+        """
+        if self._inspector is None:
+            self._inspector = _sa.inspect(self.metadata.bind)
+        return self._inspector
+
+    def session(self, symbols):
+        """
+        Create a reflection session for a single build
+
+        Parameters:
+          symbols (Symbols):
+            Symbol table of the build
+
+        Returns:
+          ReflectionSession: New session
+        """
+        return ReflectionSession(
+            self.metadata, symbols, types=self.types, inspector=self.inspector
+        )
@@ -28,7 +28,19 @@ Schema module generation code.
 """
 __author__ = u"Andr\xe9 Malo"
 
+import shutil as _shutil
+import tempfile as _tempfile
+
+from . import _bulk
+from . import _cache
+from . import _catalog
+from . import _ddl
 from . import _meta
+from . import _observe
+from . import _pattern
+from . import _plan
+from . import _reflect
+from . import _snapshot
 from . import _table
 from . import _template
 
@@ -52,15 +64,29 @@ class Schema(object):
 
       _dbname (str or None):
         DB identifier
+
+      _metadata (BoundMetaData):
+        Metadata containing the reflected tables
+
+      _names (list):
+        Requested tables, (local name, table name) pairs
+
+      _types (TypeRegistry):
+        Type loader or ``None``
+
+      _observer (callable):
+        Instrumentation observer or ``None``
     """
 
+    # pylint: disable = too-many-instance-attributes
+
     #: Template for the module
     #:
     #: :Type: Template
     _MODULE_TPL = _template.Template(
         '''
         # -*- coding: ascii -*-
-        # flake8: noqa pylint: skip-file
+        # flake8: noqa pylint: skip-file%(fingerprint)s
         """
         ==============================
          SQLAlchemy schema definition
@@ -86,7 +112,25 @@ class Schema(object):
     )
 
     def __init__(
-        self, conn, tables, schemas, symbols, dbname=None, types=None
+        self,
+        conn,
+        tables,
+        schemas,
+        symbols,
+        dbname=None,
+        types=None,
+        bulk=False,
+        max_workers=None,
+        cache=None,
+        shallow=False,
+        profile=None,
+        context=None,
+        observer=None,
+        order=None,
+        max_depth=None,
+        stop=None,
+        prefetch=False,
+        use_alter=False,
     ):
         """
         Initialization
@@ -96,7 +140,10 @@ class Schema(object):
             SQLAlchemy connection or engine
 
           tables (list):
-            List of tables to reflect, (local name, table name) pairs
+            List of tables to reflect, (local name, table name) pairs. Table
+            names may be patterns, like ``schema.*`` or ``re:^audit_``. They
+            are expanded using one table listing per schema, the local names
+            are templates then (like ``%(name)s``). Patterns imply `bulk`.
 
           schemas (dict):
             schema -> module mapping
@@ -114,63 +161,904 @@ class Schema(object):
             the type name, (bound) metadata and the symbol table. It is
             responsible for modifying the symbols and imports *and* the
             dialect's ``ischema_names``. If omitted or ``None``, the reflector
-            will always fail on unknown types.
+            will always fail on unknown types. The loader is called once per
+            type name, pass a `TypeRegistry` in order to share that across
+            builds or runs.
+
+          bulk (bool):
+            Reflect all tables at once using the inspector's multi reflection
+            API instead of autoloading them one by one? The API exists since
+            SQLAlchemy 2.0, older versions autoload the tables anyway. The
+            other bulk options (`max_workers`, `cache`, `shallow`, `profile`,
+            `max_depth` and `stop`) require SQLAlchemy 2.0+.
+
+          max_workers (int):
+            Maximum number of catalog queries to run in parallel, each on its
+            own connection from the engine's pool. Implies `bulk`. If omitted
+            or ``None``, the queries run serially.
+
+          cache (str):
+            Reflection cache directory. Reflected table definitions are
+            stored there and reused as long as the table's catalog entry does
+            not change. Implies `bulk`. If omitted or ``None``, no cache is
+            used. Note that only some dialects (currently SQLite and
+            PostgreSQL) support caching.
+
+          shallow (bool):
+            Reflect tables of the schemas mapped in `schemas` only as far
+            as needed for referencing them, i.e. just the columns referenced
+            by foreign keys? Their own foreign keys are not followed either.
+            Implies `bulk`.
+
+          profile (str):
+            Bulk reflection profile. "lean" fetches only the catalog
+            information needed for the generated code (columns, primary,
+            unique and foreign keys), "full" fetches everything (indexes,
+            check constraints, comments and table options as well), which
+            results in the same output. Implies `bulk`. If omitted or
+            ``None``, bulk reflection uses the lean profile.
+
+          context (ReflectionContext):
+            Reflection context shared with other schemas built from the same
+            database (`conn` should be its bind). Tables reflected already
+            by another schema are reused. If passed, it overrides `types`.
+            If omitted or ``None``, the tables are reflected from scratch.
+
+          observer (callable):
+            Instrumentation observer. It's called with an ``Event`` for
+            each measured phase (like the reflection of a table, a type
+            loader call or the rendering of a table), including timing and
+            statement count. The observer is kept for `dump`. Pass a
+            ``Recorder`` in order to get a summary report. If omitted or
+            ``None``, nothing is measured.
+
+          order (str):
+            Output order of the tables. "name" orders them by variable
+            name, "dependency" emits referenced tables before the
+            referencing ones, so only cyclic foreign keys are deferred
+            (defined after the referenced table). If omitted or ``None``,
+            the tables are ordered by name.
+
+          max_depth (int):
+            Maximum foreign key distance of fully reflected tables from
+            the requested ones. Tables further away, but referenced, are
+            reflected lightly (columns and primary key, no foreign keys),
+            so the foreign key closure ends there. They are marked with a
+            comment in the generated module. The tables are planned
+            upfront (see `plan`). Implies `bulk`. If omitted or ``None``,
+            the depth is not limited. Builds sharing a `context` should use
+            the same depth settings.
+
+          stop (iterable):
+            Table names or patterns of tables to reflect lightly, unless
+            requested explicitly. See `max_depth`. If omitted or ``None``,
+            no table is stopped at.
+
+          prefetch (bool):
+            Read the SQLite catalog in bulk instead of table by table? The
+            generated module is the same. Ignored for other dialects,
+            SQLAlchemy versions before 1.4 and the shared inspector of a
+            `context`. If omitted or false, the dialect reads the catalog as
+            usual.
+
+          use_alter (bool):
+            Mark the foreign keys, which are deferred in order to break
+            foreign key cycles, with ``use_alter``? They're rendered as
+            cyclic foreign keys then, and SQLAlchemy can sort the tables
+            of the generated module. If omitted or false, the foreign keys
+            are rendered as reflected.
+
+        Raises:
+          KeyError: Unknown output order
+
+          NotImplementedError: A bulk option was passed, but the multi
+          reflection API is not available
         """
-        metadata = _meta.BoundMetaData(conn)
-        self._dialect = metadata.bind.dialect.name
-        self._tables = _table.TableCollection.by_names(
-            metadata, tables, schemas, symbols, types=types
+        # pylint: disable = too-many-arguments, too-many-positional-arguments
+        # pylint: disable = too-many-locals
+
+        if context is not None:
+            metadata, types = context.metadata, context.types
+        else:
+            metadata = _meta.BoundMetaData(conn)
+        tables = list(tables)
+        if any(_pattern.is_pattern(name) for _, name in tables):
+            tables = _pattern.expand(metadata.bind, tables)
+            bulk = True
+        boundary = _boundary(
+            metadata.bind, tables, max_depth, stop, prefetch=prefetch
         )
+        if cache is not None:
+            cache = _cache.ReflectionCache(
+                cache,
+                metadata.bind.dialect.name,
+                dbname or _dbid(metadata.bind),
+            )
+        self._build(
+            metadata,
+            tables,
+            schemas,
+            symbols,
+            dbname=dbname,
+            types=types,
+            bulk=bulk,
+            max_workers=max_workers,
+            cache=cache,
+            shallow=shallow,
+            profile=profile,
+            context=context,
+            observer=observer,
+            order=order,
+            boundary=boundary,
+            prefetch=prefetch,
+            use_alter=use_alter,
+        )
+
+    @classmethod
+    def plan(cls, conn, tables, max_depth=None, stop=None, prefetch=False):
+        """
+        Plan the reflection, without reflecting anything
+
+        Only the foreign keys of the tables (and of their targets, level by
+        level) are read from the catalog. The plan tells, which tables
+        would be reflected fully and which lightly, given the same options::
+
+            plan = Schema.plan(conn, tables, max_depth=2)
+            print(len(plan.tables), len(plan.boundary))
+
+        Parameters:
+          conn (Connection or Engine):
+            SQLAlchemy connection or engine
+
+          tables (list):
+            List of tables to reflect, (local name, table name) pairs.
+            Patterns are expanded, see `__init__`.
+
+          max_depth (int):
+            Maximum foreign key distance of fully reflected tables from the
+            requested ones. See `__init__`.
+
+          stop (iterable):
+            Table names or patterns of tables to reflect lightly. See
+            `__init__`.
+
+          prefetch (bool):
+            Read the SQLite catalog in bulk? See `__init__`.
+
+        Returns:
+          Plan: The plan
+        """
+        return _plan.plan(
+            conn,
+            [name for _, name in _pattern.expand(conn, tables)],
+            max_depth=max_depth,
+            stop=stop,
+            prefetch=prefetch,
+        )
+
+    @classmethod
+    def from_ddl(
+        cls,
+        paths,
+        tables,
+        schemas,
+        symbols,
+        dbname=None,
+        types=None,
+        **kwargs
+    ):
+        """
+        Construct from SQL DDL files, without database server
+
+        The DDL is replayed into a fresh in-memory SQLite database, which is
+        reflected afterwards. Therefore the DDL needs to be understood by
+        SQLite and the module is generated for the SQLite dialect. Schemas
+        used by `tables` and `schemas` are attached (as in-memory databases)
+        before the DDL is replayed.
+
+        Parameters:
+          paths (iterable):
+            DDL filenames or file pointers, replayed in order. A single
+            filename or file pointer is accepted as well.
+
+          tables (list):
+            List of tables to reflect, (local name, table name) pairs
+
+          schemas (dict):
+            schema -> module mapping
+
+          symbols (Symbols):
+            Symbol table
+
+          dbname (str):
+            Optional db identifier. Used for informational purposes. If
+            omitted or ``None``, the information just won't be emitted.
+
+          types (callable):
+            Extra type loader. See `__init__` for details.
+
+          `**kwargs`:
+            Further reflection options, see `__init__`
+
+        Returns:
+          Schema: New schema instance
+
+        Raises:
+          sqlite3.Error: The DDL could not be replayed
+          IOError: Error reading a DDL file
+        """
+        tables = list(tables)
+        with _ddl.replay(paths, _ddl.schema_names(tables, schemas)) as conn:
+            return cls(
+                conn,
+                tables,
+                schemas,
+                symbols,
+                dbname=dbname,
+                types=types,
+                **kwargs
+            )
+
+    @classmethod
+    def reflect_async(
+        cls,
+        engine,
+        tables,
+        schemas,
+        symbols,
+        dbname=None,
+        types=None,
+        concurrency=8,
+    ):
+        """
+        Construct by reflecting over an async engine
+
+        The catalog queries run concurrently on connections from the engine's
+        pool, the tables are built afterwards on a single connection. This is
+        a coroutine function (Python 3 only)::
+
+            schema = await Schema.reflect_async(engine, tables, schemas, syms)
+
+        Requires SQLAlchemy 2.0+. Types unknown to SQLAlchemy are fed to the
+        type loader between the rounds of catalog queries. The reflection
+        warning policy (which turns unknown type warnings into exceptions)
+        is process wide, so other coroutines see it while the queries run.
+
+        Parameters:
+          engine (sqlalchemy.ext.asyncio.AsyncEngine):
+            Async engine
+
+          tables (list):
+            List of tables to reflect, (local name, table name) pairs
+
+          schemas (dict):
+            schema -> module mapping
+
+          symbols (Symbols):
+            Symbol table
+
+          dbname (str):
+            Optional db identifier. Used for informational purposes. If
+            omitted or ``None``, the information just won't be emitted.
+
+          types (callable):
+            Extra type loader. See `__init__` for details. It's called from
+            the event loop and must not use the database connection.
+
+          concurrency (int):
+            Maximum number of concurrently running catalog queries
+
+        Returns:
+          coroutine: Resolves to the new Schema instance. It raises
+          ``NotImplementedError`` with SQLAlchemy versions lacking the multi
+          reflection API.
+        """
+        # pylint: disable = import-outside-toplevel
+        from . import _async
+
+        return _async.reflect(
+            cls,
+            engine,
+            tables,
+            schemas,
+            symbols,
+            dbname=dbname,
+            types=types,
+            concurrency=concurrency,
+        )
+
+    @classmethod
+    def catalog_fingerprint(cls, conn, tables):
+        """
+        Compute the catalog fingerprint
+
+        The fingerprint is a digest of the catalog state relevant for the
+        tables and their foreign key targets, computed with a few cheap
+        queries (for SQLite and PostgreSQL it's derived from the same table
+        definitions as the reflection cache fingerprints, for other
+        dialects from the inspector results). Compare it
+        with `read_fingerprint` of the previously generated module (dumped
+        with the fingerprint) in order to skip unnecessary regenerations::
+
+            fingerprint = Schema.catalog_fingerprint(conn, tables)
+            if Schema.read_fingerprint(filename) != fingerprint:
+                schema = Schema(conn, tables, schemas, symbols)
+                with open(filename, 'w') as fp:
+                    schema.dump(fp, fingerprint=fingerprint)
+
+        The fingerprint should be computed before the reflection, so catalog
+        changes happening in between are caught by the next run.
+
+        Note that the fingerprint does not cover the symbols, schema
+        mapping or type loader.
+
+        Parameters:
+          conn (Connection or Engine):
+            SQLAlchemy connection or engine
+
+          tables (list):
+            List of tables to reflect, (local name, table name) pairs
+
+        Returns:
+          str: The fingerprint
+        """
+        return _catalog.fingerprint(conn, tables)
+
+    @classmethod
+    def read_fingerprint(cls, name_or_file):
+        """
+        Read the catalog fingerprint from a generated module
+
+        Parameters:
+          name_or_file (str or file):
+            Module filename or file pointer
+
+        Returns:
+          str: The fingerprint or ``None``, if the module does not exist or
+          was dumped without fingerprint
+
+        Raises:
+          IOError: Error reading the file (except for ENOENT)
+        """
+        return _catalog.read(name_or_file)
+
+    def _build(
+        self,
+        metadata,
+        tables,
+        schemas,
+        symbols,
+        dbname,
+        context=None,
+        observer=None,
+        **kwargs
+    ):
+        """
+        Reflect the tables and initialize the instance
+
+        Parameters:
+          metadata (BoundMetaData):
+            Metadata to reflect into
+
+          tables (list):
+            List of tables to reflect, (local name, table name) pairs
+
+          schemas (dict):
+            schema -> module mapping
+
+          symbols (Symbols):
+            Symbol table
+
+          dbname (str):
+            Optional db identifier
+
+          context (ReflectionContext):
+            Shared reflection context or ``None``
+
+          observer (callable):
+            Instrumentation observer or ``None``
+
+          `**kwargs`:
+            Reflection options, passed to ``TableCollection.by_names``
+        """
+        tables = list(tables)
+        types = kwargs.get("types")
+        if types is not None and not isinstance(types, _reflect.TypeRegistry):
+            kwargs["types"] = types = _reflect.TypeRegistry(types)
+
+        if kwargs.get("reflector") is None and context is not None:
+            kwargs["session"] = context.session(symbols)
+            kwargs.pop("types", None)
+
+        with _observe.instrument(observer, metadata.bind):
+            with _observe.timed("build"):
+                collection = _table.TableCollection.by_names(
+                    metadata, tables, schemas, symbols, **kwargs
+                )
+        self._setup(
+            metadata,
+            tables,
+            collection,
+            schemas,
+            symbols,
+            dbname,
+            types,
+            observer=observer,
+        )
+
+    def _setup(
+        self,
+        metadata,
+        names,
+        tables,
+        schemas,
+        symbols,
+        dbname,
+        types,
+        observer=None,
+    ):
+        """
+        Set up the instance attributes
+
+        All constructors (including the alternative ones) end up here.
+
+        Parameters:
+          metadata (BoundMetaData):
+            Metadata containing the tables
+
+          names (list):
+            Requested tables, (local name, table name) pairs
+
+          tables (TableCollection):
+            Table collection or ``None``
+
+          schemas (dict):
+            schema -> module mapping
+
+          symbols (Symbols):
+            Symbol table
+
+          dbname (str):
+            DB identifier or ``None``
+
+          types (TypeRegistry):
+            Type loader or ``None``
+
+          observer (callable):
+            Instrumentation observer or ``None``
+        """
+        # pylint: disable = attribute-defined-outside-init
+        self._dialect = metadata.bind.dialect.name
+        self._tables = tables
         self._schemas = schemas
         self._symbols = symbols
         self._dbname = dbname
+        self._metadata = metadata
+        self._names = names
+        self._types = types
+        self._observer = observer
+
+    @classmethod
+    def from_snapshot(
+        cls, name_or_file, schemas, symbols, types=None, order=None
+    ):
+        """
+        Construct from a snapshot, without database connection
+
+        The table list and the db identifier are taken from the snapshot.
+        The type loader is called for all types it loaded while reflecting
+        the snapshotted schema (in the same order), so it can set up the
+        symbols. Its metadata's bind cannot execute anything, though. The
+        dumped module is the same as the one of the snapshotted schema,
+        given the same schemas and symbols.
+
+        The snapshot describes the tables in plain JSON. Column types are
+        resolved from SQLAlchemy's type modules and the dialect's
+        ``ischema_names`` (after replaying the type loader), nothing else is
+        imported.
+
+        Parameters:
+          name_or_file (str or file):
+            Snapshot filename or binary stream
+
+          schemas (dict):
+            schema -> module mapping
+
+          symbols (Symbols):
+            Symbol table
+
+          types (callable):
+            Extra type loader. See `__init__` for details.
+
+          order (str):
+            Output order of the tables. See `__init__`.
+
+        Returns:
+          Schema: New schema instance
+
+        Raises:
+          SnapshotError: The snapshot is invalid or cannot be built
+          IOError: Error reading the file
+          KeyError: Unknown output order
+        """
+        snapshot = _snapshot.load(name_or_file)
+        metadata = _meta.BoundMetaData(
+            _snapshot.OfflineBind(snapshot["dialect"])
+        )
+        if types is not None and not isinstance(types, _reflect.TypeRegistry):
+            types = _reflect.TypeRegistry(types)
+        if types is not None:
+            seen = set()
+            for tname in snapshot["types"]:
+                if tname not in seen:
+                    _reflect.call_loader(
+                        tname, types, metadata, symbols, seen
+                    )
+        _snapshot.restore(metadata, snapshot["catalog"])
+
+        result = cls.__new__(cls)
+        # pylint: disable = protected-access
+        result._setup(
+            metadata,
+            snapshot["tables"],
+            _table.TableCollection.from_metadata(
+                metadata, snapshot["tables"], schemas, symbols, order=order
+            ),
+            schemas,
+            symbols,
+            snapshot["dbname"],
+            types,
+        )
+        return result
+
+    def dump_snapshot(self, fp):
+        """
+        Dump a snapshot of the reflected catalog
+
+        See `from_snapshot`.
+
+        Parameters:
+          fp (file):
+            Binary stream to write to
+
+        Raises:
+          SnapshotError: A table cannot be described
+        """
+        _snapshot.dump(
+            fp,
+            self._metadata,
+            self._names,
+            self._dbname,
+            [] if self._types is None else self._types.loaded(self._symbols),
+        )
+
+    @classmethod
+    def stream(
+        cls,
+        conn,
+        tables,
+        schemas,
+        symbols,
+        fp,
+        dbname=None,
+        types=None,
+        fingerprint=None,
+        max_workers=None,
+        cache=None,
+        shallow=False,
+        profile=None,
+        context=None,
+        observer=None,
+        order=None,
+        max_depth=None,
+        stop=None,
+        prefetch=False,
+        use_alter=False,
+    ):
+        """
+        Reflect and dump the schema module, table by table
+
+        The catalog information is collected in bulk, but the tables are
+        built, rendered and released one at a time, so only a few of them
+        are in memory at once. The rendered tables are spooled (to a
+        temporary file, if they grow large), because the imports can only
+        be written after all tables are rendered. The result is the same as
+        the one of `dump`. Streaming needs the multi reflection API
+        (SQLAlchemy 2.0+).
+
+        Parameters:
+          conn (Connection or Engine):
+            SQLAlchemy connection or engine
+
+          tables (list):
+            List of tables to reflect, (local name, table name) pairs.
+            Patterns are expanded, see `__init__`.
+
+          schemas (dict):
+            schema -> module mapping
+
+          symbols (Symbols):
+            Symbol table
+
+          fp (file):
+            File to write to
+
+          dbname (str):
+            Optional db identifier. Used for informational purposes. If
+            omitted or ``None``, the information just won't be emitted.
+
+          types (callable):
+            Extra type loader. See `__init__` for details.
+
+          fingerprint (str):
+            Catalog fingerprint to store in the module. See `dump`.
+
+          max_workers (int):
+            Maximum number of catalog queries to run in parallel. See
+            `__init__`.
+
+          cache (str):
+            Reflection cache directory. See `__init__`.
+
+          shallow (bool):
+            Reflect tables of the schemas mapped in `schemas` only as far as
+            needed for referencing them? See `__init__`.
+
+          profile (str):
+            Bulk reflection profile. See `__init__`.
+
+          context (ReflectionContext):
+            Reflection context shared with other schemas. See `__init__`.
+
+          observer (callable):
+            Instrumentation observer. See `__init__`.
 
-    def dump(self, fp):
+          order (str):
+            Output order of the tables. See `__init__`.
+
+          max_depth (int):
+            Maximum foreign key distance of fully reflected tables from the
+            requested ones. See `__init__`.
+
+          stop (iterable):
+            Table names or patterns of tables to reflect lightly. See
+            `__init__`.
+
+          prefetch (bool):
+            Read the SQLite catalog in bulk? See `__init__`.
+
+          use_alter (bool):
+            Mark the deferred foreign keys with ``use_alter``? See
+            `__init__`.
+
+        Raises:
+          KeyError: Unknown output order or reflection profile
+
+          NotImplementedError: Bulk reflection is not available
+        """
+        # pylint: disable = too-many-arguments, too-many-positional-arguments
+        # pylint: disable = too-many-locals
+
+        if not _bulk.AVAILABLE:
+            raise NotImplementedError("Streaming requires SQLAlchemy 2.0+")
+
+        tables = list(tables)
+        if context is not None:
+            metadata, types = context.metadata, context.types
+        else:
+            metadata = _meta.BoundMetaData(conn)
+        tables = _pattern.expand(metadata.bind, tables)
+        boundary = _boundary(
+            metadata.bind, tables, max_depth, stop, prefetch=prefetch
+        )
+        if types is not None and not isinstance(types, _reflect.TypeRegistry):
+            types = _reflect.TypeRegistry(types)
+        if cache is not None:
+            cache = _cache.ReflectionCache(
+                cache,
+                metadata.bind.dialect.name,
+                dbname or _dbid(metadata.bind),
+            )
+        reflector = _bulk.BulkReflector(
+            metadata,
+            symbols,
+            types=types,
+            max_workers=max_workers,
+            cache=cache,
+            shallow=schemas if shallow else None,
+            profile=profile,
+            boundary=boundary,
+            prefetch=prefetch,
+        )
+
+        result = cls.__new__(cls)
+        # pylint: disable = protected-access
+        result._setup(metadata, tables, None, schemas, symbols, dbname, types)
+        with _tempfile.SpooledTemporaryFile(
+            max_size=1 << 22, mode="w+"
+        ) as spool:
+            with _observe.instrument(observer, metadata.bind):
+                with _observe.timed("stream"):
+                    count = 0
+                    for table in _table.stream(
+                        metadata,
+                        tables,
+                        schemas,
+                        symbols,
+                        reflector,
+                        order=order,
+                        use_alter=use_alter,
+                    ):
+                        if table.is_reference:
+                            continue
+                        if count:
+                            spool.write("\n")
+                        spool.write(_render_table(table))
+                        count += 1
+
+                    spool.seek(0)
+                    result._write(fp, fingerprint, spool, count)
+
+    def dump(self, fp, fingerprint=None):
         """
         Dump schema module to fp
 
         Parameters:
           fp (file):
             File to write to
+
+          fingerprint (str):
+            Catalog fingerprint to store in the module (see
+            `catalog_fingerprint`). If omitted or ``None``, no fingerprint
+            is stored.
         """
-        lines, dlines = [], []
-        for table in self._tables:
-            if table.is_reference:
-                continue
-            name = table.sa_table.name.encode("ascii", "backslashescape")
-            if bytes is not str:
-                name = name.decode("ascii")
-            lines.append('# Table "%s"' % (name,))
-            lines.append("%s = %r" % (table.varname, table))
-            lines.append("")
-            lines.append("")
-
-        imports = [item % self._symbols for item in self._symbols.imports]
-        if imports:  # pragma: no branch
-            imports.sort()
-            imports.append("")
-
-        defines = self._symbols.types.defines
-        if defines:
-            defined = []
-            seen = set()
-            for define in defines:
-                for item in define(self._dialect, self._symbols):
-                    if item not in seen:
-                        defined.append(item)
-                        seen.add(item)
-            if defined:
-                dlines = ["", "# Custom type definitions"] + defined
-
-        if lines:
-            dlines.append("")
-
-        param = dict(
-            ((str(key), value) for key, value in self._symbols),
-            dbspec=" for %s" % self._dbname if self._dbname else "",
-            dialect=self._dialect,
-            imports="\n".join(imports),
-            lines="\n".join(dlines + lines),
+        with _observe.instrument(self._observer):
+            lines = [
+                _render_table(table)
+                for table in self._tables
+                if not table.is_reference
+            ]
+            self._write(fp, fingerprint, ["\n".join(lines)], len(lines))
+
+    def _write(self, fp, fingerprint, tables, count):
+        """
+        Write the schema module
+
+        Parameters:
+          fp (file):
+            File to write to
+
+          fingerprint (str):
+            Catalog fingerprint or ``None``
+
+          tables (iterable):
+            Rendered tables (chunks of text)
+
+          count (int):
+            Number of rendered tables
+        """
+        with _observe.timed("write"):
+            dlines = []
+            defines = self._symbols.types.defines
+            if defines:
+                defined = []
+                seen = set()
+                for define in defines:
+                    for item in define(self._dialect, self._symbols):
+                        if item not in seen:
+                            defined.append(item)
+                            seen.add(item)
+                if defined:
+                    dlines = ["", "# Custom type definitions"] + defined
+
+            if count:
+                dlines.append("")
+
+            imports = self._symbols.imports.lines(self._symbols)
+            if imports:  # pragma: no branch
+                imports.append("")
+
+            param = dict(
+                ((str(key), value) for key, value in self._symbols),
+                dbspec=" for %s" % self._dbname if self._dbname else "",
+                dialect=self._dialect,
+                fingerprint=(
+                    "\n%s%s" % (_catalog.MARKER, fingerprint)
+                    if fingerprint
+                    else ""
+                ),
+                imports="\n".join(imports),
+                lines="\0",
+            )
+            head, tail = self._MODULE_TPL.expand(**param).split("\0")
+            fp.write(head)
+            fp.write("\n".join(dlines))
+            if count:
+                fp.write("\n")
+                if hasattr(tables, "read"):
+                    _shutil.copyfileobj(tables, fp)
+                else:
+                    fp.writelines(tables)
+            fp.write(tail)
+            fp.write("\n")
+
+
+def _render_table(table):
+    """
+    Render a table definition
+
+    Parameters:
+      table (Table):
+        The table
+
+    Returns:
+      str: The rendered table, ending with an empty line
+    """
+    with _observe.timed("render", table.sa_table.key):
+        name = table.sa_table.name.encode("ascii", "backslashescape")
+        if bytes is not str:
+            name = name.decode("ascii")
+        note = ""
+        if table.is_boundary:
+            note = (
+                "# Boundary table: foreign keys and unique constraints are"
+                " not reflected\n"
+            )
+        return '# Table "%s"\n%s%s = %r\n\n' % (
+            name,
+            note,
+            table.varname,
+            table,
         )
-        fp.write(self._MODULE_TPL.expand(**param))
-        fp.write("\n")
+
+
+def _boundary(bind, tables, max_depth, stop, prefetch=False):
+    """
+    Plan the boundary tables, if requested
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      tables (list):
+        List of tables to reflect, (local name, table name) pairs
+
+      max_depth (int):
+        Maximum foreign key distance or ``None``
+
+      stop (iterable):
+        Table names or patterns to stop at or ``None``
+
+      prefetch (bool):
+        Read the SQLite catalog in bulk?
+
+    Returns:
+      list: Keys of the boundary tables or ``None``, if not limited
+    """
+    if max_depth is None and stop is None:
+        return None
+    return _plan.plan(
+        bind,
+        [name for _, name in tables],
+        max_depth=max_depth,
+        stop=stop,
+        prefetch=prefetch,
+    ).boundary
+
+
+def _dbid(bind):
+    """
+    Determine database identifier from the connection URL
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+    Returns:
+      str: The identifier (the URL without password)
+    """
+    url = getattr(bind, "engine", bind).url
+    render = getattr(url, "render_as_string", None)
+    if render is not None:
+        return render(hide_password=True)
+    return repr(url)
@@ -0,0 +1,655 @@
+# -*- coding: ascii -*-
+u"""
+==================
+ Catalog snapshots
+==================
+
+Offline snapshots of reflected catalogs.
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import importlib as _importlib
+import inspect as _inspect
+import json as _json
+
+import sqlalchemy as _sa
+
+from . import _exceptions
+from . import _meta
+
+#: Snapshot format version. Bump it, if the format changes.
+#:
+#: :Type: int
+_VERSION = 2
+
+#: Magic value identifying snapshots
+#:
+#: :Type: str
+_MAGIC = "gensaschema-snapshot"
+
+#: JSON types stored as they are
+#:
+#: :Type: tuple
+PLAIN = (type(None), bool, int, float, type(u""), str)
+
+
+class SnapshotError(_exceptions.Error):
+    """Snapshot could not be written or loaded"""
+
+
+class OfflineBind(object):
+    """
+    Stand-in for the connection of snapshot based schemas
+
+    It provides the dialect, but cannot execute anything.
+
+    Attributes:
+      dialect (sqlalchemy.engine.Dialect):
+        Dialect
+    """
+
+    def __init__(self, dialect):
+        """
+        Initialization
+
+        Parameters:
+          dialect (str):
+            Dialect name
+        """
+        self.dialect = _sa.engine.url.make_url(
+            "%s://" % (dialect,)
+        ).get_dialect()()
+
+    @property
+    def engine(self):
+        """
+        Engine (the instance itself)
+
+        :Type: OfflineBind
+        """
+        return self
+
+    def connect(self):
+        """
+        Connect
+
+        Raises:
+          sqlalchemy.exc.InvalidRequestError: Always
+        """
+        raise _sa.exc.InvalidRequestError(
+            "Cannot connect, the schema is built from a snapshot"
+        )
+
+    execute = connect
+
+
+def dump(fp, metadata, tables, dbname, types):
+    """
+    Write a snapshot
+
+    The snapshot is a JSON document describing the reflected tables (as far
+    as they are emitted by the generator).
+
+    Parameters:
+      fp (file):
+        Binary stream to write to
+
+      metadata (BoundMetaData):
+        Metadata, containing the reflected tables
+
+      tables (list):
+        List of tables, (local name, table name) pairs
+
+      dbname (str):
+        DB identifier or ``None``
+
+      types (list):
+        Names of the types loaded by the type loader, in load order
+
+    Raises:
+      SnapshotError: A table cannot be described
+    """
+    content = _json.dumps(
+        dict(
+            magic=_MAGIC,
+            version=_VERSION,
+            sa_version=_sa.__version__,
+            dialect=metadata.bind.dialect.name,
+            tables=[list(item) for item in tables],
+            dbname=dbname,
+            types=list(types),
+            catalog=[
+                _describe_table(table)
+                for _, table in sorted(metadata.tables.items())
+            ],
+        ),
+        indent=1,
+        sort_keys=True,
+    )
+    fp.write((content + "\n").encode("utf-8"))
+
+
+def load(name_or_file):
+    """
+    Read a snapshot
+
+    The tables are not built yet, see `restore`.
+
+    Parameters:
+      name_or_file (str or file):
+        Filename or binary stream to read from
+
+    Returns:
+      dict: The snapshot, containing ``dialect`` (name), ``tables``,
+      ``dbname``, ``types`` and ``catalog`` (the table descriptions)
+
+    Raises:
+      SnapshotError: The snapshot is invalid
+      IOError: Error reading the file
+    """
+    read = getattr(name_or_file, "read", None)
+    if read is None:
+        with open(name_or_file, "rb") as fp:
+            return load(fp)
+
+    content = read()
+    try:
+        if not isinstance(content, type(u"")):
+            content = content.decode("utf-8")
+        snapshot = _json.loads(content)
+    except ValueError as e:  # includes decode errors
+        # pylint: disable = raise-missing-from
+        raise SnapshotError("Cannot read snapshot: %s" % (e,))
+    if not isinstance(snapshot, dict) or snapshot.get("magic") != _MAGIC:
+        raise SnapshotError("Not a snapshot")
+    if snapshot.get("version") != _VERSION:
+        raise SnapshotError(
+            "Unsupported snapshot version %r" % (snapshot.get("version"),)
+        )
+
+    try:
+        return dict(
+            dialect=snapshot["dialect"],
+            tables=[tuple(item) for item in snapshot["tables"]],
+            dbname=snapshot["dbname"],
+            types=list(snapshot["types"]),
+            catalog=list(snapshot["catalog"]),
+        )
+    except (KeyError, TypeError) as e:
+        # pylint: disable = raise-missing-from
+        raise SnapshotError("Invalid snapshot: %s" % (e,))
+
+
+def restore(metadata, catalog):
+    """
+    Build the tables of a snapshot
+
+    Column types are resolved from ``sqlalchemy.types``, the dialect's
+    module and the dialect's ``ischema_names``. So types set up by a type
+    loader need to be loaded before.
+
+    Parameters:
+      metadata (BoundMetaData):
+        Metadata to build the tables into
+
+      catalog (list):
+        Table descriptions, as returned by `load`
+
+    Raises:
+      SnapshotError: The tables cannot be built
+    """
+    classes = type_classes(metadata.bind.dialect)
+    try:
+        tables = {}
+        for desc in catalog:
+            table = _sa.Table(
+                desc["name"],
+                metadata,
+                *[
+                    _restore_column(column, classes)
+                    for column in desc["columns"]
+                ],
+                schema=desc["schema"]
+            )
+            if desc.get("boundary"):
+                table.info[_meta.BOUNDARY] = True
+            for con in desc["constraints"]:
+                if con["kind"] != "foreign_key":
+                    table.append_constraint(_restore_constraint(con))
+            tables[desc["schema"], desc["name"]] = table
+
+        for desc in catalog:
+            table = tables[desc["schema"], desc["name"]]
+            for con in desc["constraints"]:
+                if con["kind"] == "foreign_key":
+                    target = tables[tuple(con["target"])]
+                    table.append_constraint(
+                        _restore_constraint(
+                            con,
+                            [target.c[name] for name in con["refcolumns"]],
+                        )
+                    )
+    except (KeyError, TypeError, ValueError, _sa.exc.ArgumentError) as e:
+        # pylint: disable = raise-missing-from
+        raise SnapshotError("Invalid table description: %r" % (e,))
+
+
+def _describe_table(table):
+    """
+    Describe a table
+
+    Parameters:
+      table (sqlalchemy.Table):
+        Table
+
+    Returns:
+      dict: The description
+
+    Raises:
+      SnapshotError: The table cannot be described
+    """
+    constraints = []
+    for con in table.constraints:
+        kind = _CONSTRAINTS.get(type(con).__name__)
+        if kind is None:  # not emitted anyway
+            continue
+        desc = dict(
+            kind=kind,
+            name=con.name,
+            columns=[col.name for col in con.columns],
+            deferrable=con.deferrable,
+            initially=con.initially,
+        )
+        if kind == "foreign_key":
+            target = con.elements[0].column.table
+            desc.update(
+                target=[target.schema, target.name],
+                refcolumns=[elem.column.name for elem in con.elements],
+                onupdate=con.onupdate,
+                ondelete=con.ondelete,
+                match=con.match,
+                use_alter=con.use_alter,
+            )
+        constraints.append(desc)
+    constraints.sort(key=lambda x: (x["kind"], repr(x)))
+
+    return dict(
+        schema=table.schema,
+        name=table.name,
+        boundary=bool(table.info.get(_meta.BOUNDARY)),
+        columns=[
+            dict(
+                name=col.name,
+                type=describe_type(col.type),
+                nullable=col.nullable,
+                autoincrement=col.autoincrement,
+                server_default=_describe_default(col.server_default),
+            )
+            for col in table.columns
+        ],
+        constraints=constraints,
+    )
+
+
+def _describe_default(default):
+    """
+    Describe a server default
+
+    Parameters:
+      default (sqlalchemy.schema.FetchedValue):
+        Server default or ``None``
+
+    Returns:
+      dict: The description or ``None``
+
+    Raises:
+      SnapshotError: The default cannot be described
+    """
+    if default is None:
+        return None
+    name = type(default).__name__
+    if name == "Identity":
+        return dict(kind="identity", args=_arguments(default)[0])
+    if name == "Computed":
+        return dict(
+            kind="computed",
+            arg=u"%s" % (default.sqltext,),
+            persisted=default.persisted,
+        )
+    if name == "DefaultClause":
+        return dict(
+            kind="default",
+            arg=u"%s" % (default.arg,),
+            for_update=default.for_update,
+        )
+    raise SnapshotError("Cannot describe server default %r" % (default,))
+
+
+def describe_type(ctype):
+    """
+    Describe a column type
+
+    The constructor arguments are taken from the instance attributes named
+    like the parameters of the constructors (the same way the generator
+    renders them).
+
+    Parameters:
+      ctype (sqlalchemy.types.TypeEngine):
+        Column type
+
+    Returns:
+      dict: The description
+
+    Raises:
+      SnapshotError: The type cannot be described
+    """
+    args, varargs = _arguments(ctype)
+    return dict(
+        cls="%s.%s" % (type(ctype).__module__, type(ctype).__name__),
+        args=args,
+        varargs=varargs,
+    )
+
+
+def _describe_value(value):
+    """
+    Describe a type argument
+
+    Parameters:
+      value (any):
+        The value
+
+    Returns:
+      any: The JSON compatible description
+
+    Raises:
+      SnapshotError: The value cannot be described
+    """
+    if isinstance(value, PLAIN):
+        return value
+    if isinstance(value, list):
+        return list(map(_describe_value, value))
+    if isinstance(value, tuple):
+        return dict(tuple=list(map(_describe_value, value)))
+    if isinstance(value, _sa.types.TypeEngine):
+        return dict(type=describe_type(value))
+    raise SnapshotError("Cannot describe value %r" % (value,))
+
+
+def _arguments(obj):
+    """
+    Determine the constructor arguments of an object
+
+    Arguments equal to their defaults are left out.
+
+    Parameters:
+      obj (any):
+        The object
+
+    Returns:
+      tuple: Keyword arguments (dict) and positional arguments (list)
+
+    Raises:
+      SnapshotError: An argument cannot be described
+    """
+    unset = object()
+    args, varargs = {}, None
+    for cls in type(obj).__mro__:
+        if "__init__" not in vars(cls) or cls in (
+            object,
+            _sa.types.TypeEngine,
+        ):
+            continue
+        params = _parameters(vars(cls)["__init__"])
+        if varargs is None:
+            name = params.get("*")
+            varargs = list(getattr(obj, name, ())) if name else []
+        for name, default in params.items():
+            if name.startswith(("*", "_")) or name in args:
+                continue
+            value = getattr(obj, name, unset)
+            if value is unset or (default is not unset and default == value):
+                continue
+            args[name] = _describe_value(value)
+    return args, [_describe_value(value) for value in varargs or ()]
+
+
+def _parameters(func):
+    """
+    Inspect the parameters of a constructor
+
+    Parameters:
+      func (callable):
+        The (unbound) ``__init__`` function
+
+    Returns:
+      dict: Parameter name -> default (or an arbitrary object, if there's
+      no default) mapping. The name of the variable positional parameter
+      is stored under ``"*"``, the one of the variable keyword parameter
+      under ``"**"``.
+    """
+    result = {}
+    if hasattr(_inspect, "signature"):
+        try:
+            # pylint: disable = no-member
+            sign = _inspect.signature(func)
+        except (TypeError, ValueError):
+            return result
+        for param in list(sign.parameters.values())[1:]:
+            if param.kind == param.VAR_POSITIONAL:
+                result["*"] = param.name
+            elif param.kind == param.VAR_KEYWORD:
+                result["**"] = param.name
+            else:
+                result[param.name] = (
+                    object()
+                    if param.default is param.empty
+                    else param.default
+                )
+        return result
+
+    try:
+        # pylint: disable = deprecated-method, no-member
+        spec = _inspect.getargspec(func)
+    except TypeError:
+        return result
+    defaults = dict(zip(spec[0][::-1], (spec[3] or ())[::-1]))
+    for name in spec[0][1:]:
+        result[name] = defaults.get(name, object())
+    if spec[1] is not None:
+        result["*"] = spec[1]
+    if spec[2] is not None:
+        result["**"] = spec[2]
+    return result
+
+
+def type_classes(dialect):
+    """
+    Determine the type classes snapshots may refer to
+
+    Parameters:
+      dialect (sqlalchemy.engine.Dialect):
+        Dialect
+
+    Returns:
+      dict: Name (module.class) -> class mapping
+    """
+    candidates = list(vars(_sa.types).values())
+    try:
+        module = _importlib.import_module(
+            "sqlalchemy.dialects.%s" % (dialect.name,)
+        )
+    except ImportError:
+        pass
+    else:
+        candidates.extend(vars(module).values())
+    candidates.extend(dialect.ischema_names.values())
+
+    return dict(
+        ("%s.%s" % (cls.__module__, cls.__name__), cls)
+        for cls in candidates
+        if isinstance(cls, type) and issubclass(cls, _sa.types.TypeEngine)
+    )
+
+
+def restore_type(desc, classes):
+    """
+    Build a column type from its description
+
+    Parameters:
+      desc (dict):
+        Type description
+
+      classes (dict):
+        Allowed type classes (see `type_classes`)
+
+    Returns:
+      sqlalchemy.types.TypeEngine: The type
+
+    Raises:
+      SnapshotError: Unknown type class
+    """
+    cls = classes.get(desc["cls"])
+    if cls is None:
+        raise SnapshotError("Unknown column type %s" % (desc["cls"],))
+
+    args = dict(
+        (str(name), _restore_value(value, classes))
+        for name, value in desc["args"].items()
+    )
+    params = _parameters(cls.__init__)
+    if "**" not in params:
+        args = dict(
+            (name, value) for name, value in args.items() if name in params
+        )
+    return cls(
+        *[_restore_value(value, classes) for value in desc["varargs"]], **args
+    )
+
+
+def _restore_value(value, classes):
+    """
+    Build a type argument from its description
+
+    Parameters:
+      value (any):
+        The description
+
+      classes (dict):
+        Allowed type classes (see `type_classes`)
+
+    Returns:
+      any: The value
+    """
+    if isinstance(value, list):
+        return [_restore_value(item, classes) for item in value]
+    if isinstance(value, dict):
+        if "type" in value:
+            return restore_type(value["type"], classes)
+        return tuple(_restore_value(item, classes) for item in value["tuple"])
+    return value
+
+
+def _restore_column(desc, classes):
+    """
+    Build a column from its description
+
+    Parameters:
+      desc (dict):
+        Column description
+
+      classes (dict):
+        Allowed type classes (see `type_classes`)
+
+    Returns:
+      sqlalchemy.Column: The column
+    """
+    default = desc["server_default"]
+    if default is not None:
+        if default["kind"] == "identity":
+            default = _sa.Identity(
+                **dict(
+                    (str(name), value)
+                    for name, value in default["args"].items()
+                )
+            )
+        elif default["kind"] == "computed":
+            default = _sa.Computed(
+                _sa.text(default["arg"]), persisted=default["persisted"]
+            )
+        else:
+            default = _sa.DefaultClause(
+                _sa.text(default["arg"]), for_update=default["for_update"]
+            )
+
+    return _sa.Column(
+        desc["name"],
+        restore_type(desc["type"], classes),
+        nullable=desc["nullable"],
+        autoincrement=desc["autoincrement"],
+        server_default=default,
+    )
+
+
+def _restore_constraint(desc, refcolumns=None):
+    """
+    Build a constraint from its description
+
+    Parameters:
+      desc (dict):
+        Constraint description
+
+      refcolumns (list):
+        Target columns of foreign keys
+
+    Returns:
+      sqlalchemy.Constraint: The constraint
+    """
+    kwargs = dict(
+        name=desc["name"],
+        deferrable=desc["deferrable"],
+        initially=desc["initially"],
+    )
+    if desc["kind"] == "foreign_key":
+        return _sa.ForeignKeyConstraint(
+            desc["columns"],
+            refcolumns,
+            onupdate=desc["onupdate"],
+            ondelete=desc["ondelete"],
+            match=desc["match"],
+            use_alter=desc["use_alter"],
+            **kwargs
+        )
+    if desc["kind"] == "primary_key":
+        return _sa.PrimaryKeyConstraint(*desc["columns"], **kwargs)
+    return _sa.UniqueConstraint(*desc["columns"], **kwargs)
+
+
+#: Class name -> kind mapping of the described constraints
+#:
+#: :Type: dict
+_CONSTRAINTS = {
+    "PrimaryKeyConstraint": "primary_key",
+    "UniqueConstraint": "unique",
+    "ForeignKeyConstraint": "foreign_key",
+}
@@ -0,0 +1,419 @@
+# -*- coding: ascii -*-
+u"""
+=====================
+ SQLite catalog reads
+=====================
+
+Bulk catalog reads for SQLite.
+
+The SQLite dialect reflects table by table, issuing several ``PRAGMA``
+statements (and ``sqlite_master`` lookups) per table. A `prefetching` copy
+of the dialect answers these from a few joined queries per schema instead,
+using the table-valued ``pragma_*`` functions. The dialect still interprets
+the results, so the reflected tables are the same.
+
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import contextlib as _contextlib
+import copy as _copy
+import logging as _logging
+import threading as _threading
+import weakref as _weakref
+
+import sqlalchemy as _sa
+
+logger = _logging.getLogger(__name__)
+
+#: Pragmas taking a table name
+#:
+#: :Type: frozenset
+_TABLE_PRAGMAS = frozenset(
+    ["table_info", "table_xinfo", "foreign_key_list", "index_list"]
+)
+
+#: Pragmas taking an index name
+#:
+#: :Type: frozenset
+_INDEX_PRAGMAS = frozenset(["index_info", "index_xinfo"])
+
+#: Minimum SQLite version providing table-valued pragma functions
+#:
+#: :Type: tuple
+_MIN_VERSION = (3, 16)
+
+#: Key of the catalog reads in the connection info
+#:
+#: :Type: str
+_INFO_KEY = "gensaschema_catalog"
+
+
+def prefetching(dialect):
+    """
+    Make a dialect answering catalog queries from bulk reads
+
+    The passed dialect is not modified. Instead, a (shallow) copy is made,
+    which is meant to be used by inspectors (see `inspect`). For other
+    dialects (or old SQLite versions) no copy is made.
+
+    The catalog is read lazily, one schema at a time and per DBAPI
+    connection (temporary tables and attached databases are connection
+    specific). Pooled connections keep the reads, so inspectors bound to an
+    engine profit as well. The catalog is not refreshed during the lifetime
+    of the copy. Lookups not found in
+    the bulk reads are passed through to the original dialect.
+
+    Parameters:
+      dialect (sqlalchemy.engine.Dialect):
+        Dialect to copy
+
+    Returns:
+      sqlalchemy.engine.Dialect: The copy or ``None``, if not applicable
+    """
+    # pylint: disable = protected-access
+
+    if (
+        dialect.name != "sqlite"
+        or not hasattr(dialect, "_get_table_pragma")
+        or not hasattr(dialect, "_get_table_sql")
+        or (dialect.server_version_info or (0,)) < _MIN_VERSION
+    ):
+        return None
+
+    catalog = Catalog(dialect)
+    get_table_pragma = dialect._get_table_pragma
+    get_table_sql = dialect._get_table_sql
+
+    def _get_table_pragma(connection, pragma, table_name, schema=None):
+        """Look up pragma results"""
+        result = catalog.pragma(connection, pragma, table_name, schema)
+        if result is None:
+            result = get_table_pragma(
+                connection, pragma, table_name, schema=schema
+            )
+        return result
+
+    def _get_table_sql(connection, table_name, schema=None, **kwargs):
+        """Look up table SQL"""
+        result = catalog.table_sql(connection, table_name, schema)
+        if result is None:
+            result = get_table_sql(
+                connection, table_name, schema=schema, **kwargs
+            )
+        return result
+
+    result = _copy.copy(dialect)
+    result._get_table_pragma = _get_table_pragma
+    result._get_table_sql = _get_table_sql
+    return result
+
+
+def inspect(bind, dialect=None):
+    """
+    Create an inspector
+
+    With a `dialect` passed, the inspector and the inspectors derived from
+    it for autoloading tables (SQLAlchemy 1.4+) use that dialect.
+
+    Parameters:
+      bind (Connection or Engine):
+        Database connection
+
+      dialect (sqlalchemy.engine.Dialect):
+        Dialect to use instead of the bind's one (see `prefetching`). If
+        omitted or ``None``, the bind's dialect is used.
+
+    Returns:
+      sqlalchemy.engine.reflection.Inspector: The inspector
+    """
+    # pylint: disable = protected-access
+
+    inspector = _sa.inspect(bind)
+    if dialect is None:
+        return inspector
+
+    inspector.dialect = dialect
+    context = getattr(inspector, "_inspection_context", None)
+    if context is not None:
+
+        @_contextlib.contextmanager
+        def inspection_context():
+            """Derive inspector"""
+            with context() as derived:
+                derived.dialect = dialect
+                yield derived
+
+        inspector._inspection_context = inspection_context
+    return inspector
+
+
+class Catalog(object):
+    """
+    Bulk read SQLite catalog
+
+    The reads are stored in the info dict of the DBAPI connection (see
+    ``Connection.info``), as (schema, pragma) -> (name -> rows) mapping per
+    catalog instance. The ``sqlite_master`` contents are stored with a
+    pragma name of ``None``. They are kept as long as both the catalog and
+    the DBAPI connection live.
+
+    Attributes:
+      _dialect (sqlalchemy.engine.Dialect):
+        Dialect
+
+      _lock (threading.Lock):
+        Lock guarding the reads
+    """
+
+    def __init__(self, dialect):
+        """
+        Initialization
+
+        Parameters:
+          dialect (sqlalchemy.engine.Dialect):
+            Dialect
+        """
+        self._dialect = dialect
+        self._lock = _threading.Lock()
+
+    def table_sql(self, connection, table_name, schema):
+        """
+        Find the ``CREATE`` statement of a table or view
+
+        Parameters:
+          connection (Connection):
+            Database connection
+
+          table_name (str):
+            Table name
+
+          schema (str):
+            Schema name or ``None``
+
+        Returns:
+          str: The SQL or ``None``, if not found
+        """
+        owner = self._owner(connection, table_name, schema)
+        if owner is None:
+            return None
+        return self._read(connection, None, owner)[table_name]
+
+    def pragma(self, connection, pragma, name, schema):
+        """
+        Find pragma results
+
+        Parameters:
+          connection (Connection):
+            Database connection
+
+          pragma (str):
+            Pragma name
+
+          name (str):
+            Table or index name
+
+          schema (str):
+            Schema name or ``None``
+
+        Returns:
+          list: The result rows or ``None``, if not found
+        """
+        if pragma in _TABLE_PRAGMAS:
+            owner = self._owner(connection, name, schema)
+            if owner is None:
+                return None
+            reads = self._read(connection, pragma, owner)
+            if reads is None:
+                return None
+            # Tables without foreign keys and such
+            return reads.get(name, [])
+
+        if pragma in _INDEX_PRAGMAS:
+            for schema_name in _schemas(schema):
+                reads = self._read(connection, pragma, schema_name)
+                if reads is None:
+                    return None
+                if name in reads:
+                    return reads[name]
+        return None
+
+    def _owner(self, connection, table_name, schema):
+        """
+        Find the schema a table or view is read from
+
+        Parameters:
+          connection (Connection):
+            Database connection
+
+          table_name (str):
+            Table name
+
+          schema (str):
+            Schema name or ``None``
+
+        Returns:
+          str: The schema name or ``None``, if not found
+        """
+        for name in _schemas(schema):
+            reads = self._read(connection, None, name)
+            if reads is None:
+                return None
+            if table_name in reads:
+                return name
+        return None
+
+    def _read(self, connection, pragma, schema):
+        """
+        Read pragma results of all tables of a schema
+
+        Parameters:
+          connection (Connection):
+            Database connection
+
+          pragma (str):
+            Pragma name or ``None`` for the ``sqlite_master`` contents
+
+          schema (str):
+            Schema name
+
+        Returns:
+          dict: Table or index name -> rows mapping (or table name -> SQL
+          mapping for ``sqlite_master``) or ``None``, if the catalog could
+          not be read
+        """
+        key = (schema, pragma)
+        with self._lock:
+            reads = connection.info.setdefault(
+                _INFO_KEY, _weakref.WeakKeyDictionary()
+            ).setdefault(self, {})
+            if key in reads:
+                return reads[key]
+
+            if pragma is None:
+                params = ()
+                query = (
+                    "SELECT name, sql FROM %s.sqlite_master"
+                    " WHERE type IN ('table', 'view')"
+                    % (self._quote(schema),)
+                )
+            elif pragma in _INDEX_PRAGMAS:
+                query = (
+                    "SELECT l.name, p.* FROM %s.sqlite_master AS m,"
+                    " pragma_index_list(m.name, ?) AS l,"
+                    " pragma_%s(l.name, ?) AS p"
+                    " WHERE m.type = 'table'" % (self._quote(schema), pragma)
+                )
+                params = (schema, schema)
+            else:
+                params = (schema,)
+                query = (
+                    "SELECT m.name, p.* FROM %s.sqlite_master AS m,"
+                    " pragma_%s(m.name, ?) AS p"
+                    " WHERE m.type IN ('table', 'view')"
+                    % (self._quote(schema), pragma)
+                )
+
+            rows = self._query(connection, query, params)
+            if rows is None:
+                reads[key] = None
+                return None
+
+            if pragma is None:
+                result = dict(rows)
+            else:
+                result = {}
+                for row in rows:
+                    result.setdefault(row[0], []).append(row[1:])
+            logger.debug(
+                "Read %s of %d object(s) in schema %r",
+                pragma or "sqlite_master",
+                len(result),
+                schema,
+            )
+            reads[key] = result
+            return result
+
+    def _quote(self, name):
+        """
+        Quote an identifier
+
+        Parameters:
+          name (str):
+            The identifier
+
+        Returns:
+          str: The quoted identifier
+        """
+        return self._dialect.identifier_preparer.quote_identifier(name)
+
+    def _query(self, connection, query, params=()):
+        """
+        Run a catalog query
+
+        Failing queries (e.g. on unknown schemas or if the ``pragma_*``
+        functions are not available) are not fatal. The dialect answers the
+        lookups then.
+
+        Parameters:
+          connection (Connection):
+            Database connection
+
+          query (str):
+            SQL query
+
+          params (tuple):
+            Query parameters
+
+        Returns:
+          list: Result rows (tuples) or ``None``, if the query failed
+        """
+        execute = getattr(connection, "exec_driver_sql", None)
+        if execute is None:
+            execute = connection.execute
+        try:
+            return [tuple(row) for row in execute(query, params).fetchall()]
+        except _sa.exc.DBAPIError as e:
+            logger.debug("Catalog query failed: %s", e)
+            return None
+
+
+def _schemas(schema):
+    """
+    Determine the schemas to look up
+
+    Unqualified names refer to the main database first and to temporary
+    objects second, like the dialect's table SQL lookup does. Note that
+    SQLite itself resolves temporary objects first. All information about a
+    table is read from the first schema containing it, so the results of a
+    temporary table never mix with the ones of a main table of the same
+    name.
+
+    Parameters:
+      schema (str):
+        Schema name or ``None``
+
+    Returns:
+      tuple: Schema names
+    """
+    if schema is None:
+        return ("main", "temp")
+    return (schema,)
@@ -28,14 +28,21 @@ Symbol management.
 """
 __author__ = u"Andr\xe9 Malo"
 
+import collections as _collections
+import inspect as _inspect
 import keyword as _keyword
-import operator as _op
 import weakref as _weakref
 
 from . import _exceptions
 from . import _util
 
 
+#: Type catalogs, module name -> public names
+#:
+#: :Type: dict
+_CATALOGS = {}
+
+
 class SymbolException(_exceptions.Error):
     """Symbol error"""
 
@@ -48,6 +55,12 @@ class Symbols(object):
       _symbols (dict):
         Symbols
 
+      _owners (dict):
+        Reverse index, symbol -> set of identifiers
+
+      _generation (int):
+        Modification counter
+
       imports (_Imports):
         Import container
 
@@ -68,6 +81,8 @@ class Symbols(object):
             ``None``, it's empty.
         """
         self._symbols = {}
+        self._owners = {}
+        self._generation = 0
         defaults = dict(
             sa="_sa",  # SQLAlchemy shortname
             meta="m",  # MetaData shortname
@@ -102,9 +117,15 @@ class Symbols(object):
             Symbol identifier
         """
         try:
-            del self._symbols[name]
+            symbol = self._symbols.pop(name)
         except KeyError:
             pass
+        else:
+            owners = self._owners[symbol]
+            owners.discard(name)
+            if not owners:
+                del self._owners[symbol]
+            self._generation += 1
 
     def __setitem__(self, name, symbol):
         """
@@ -128,12 +149,15 @@ class Symbols(object):
             raise SymbolException(
                 "Cannot use keyword %r as symbol" % (symbol,)
             )
-        elif symbol in list(self._symbols.values()):
-            if name in self._symbols and self._symbols[name] != symbol:
+        if name in self._symbols:
+            if self._symbols[name] == symbol:
+                return
+            elif symbol in self._owners:
                 raise SymbolException("Symbol conflict: %r" % (symbol,))
-        elif name in self._symbols and self._symbols[name] != symbol:
             raise SymbolException("Symbol identifier conflict: %r" % (name,))
         self._symbols[name] = symbol
+        self._owners.setdefault(symbol, set()).add(name)
+        self._generation += 1
 
     def __getitem__(self, name):
         """
@@ -168,6 +192,19 @@ class Symbols(object):
             name = str(name).decode("ascii")
         return name in self._symbols
 
+    def owners(self, symbol):
+        """
+        Find the identifiers using a symbol
+
+        Parameters:
+          symbol (str):
+            Symbol
+
+        Returns:
+          set: Symbol identifiers (empty, if the symbol is unused)
+        """
+        return set(self._owners.get(symbol, ()))
+
     def __iter__(self):
         """
         Make item iterator (id, value)
@@ -186,6 +223,10 @@ class _Types(object):
       _types (dict):
         Type map
 
+      _resolved (dict):
+        Resolution cache, (type class, dialect) -> (symbol identifier,
+        suffix) or ``None`` (for unresolvable types)
+
       _symbols (Symbols):
         Symbol table
     """
@@ -199,6 +240,7 @@ class _Types(object):
             Symbol table
         """
         self._types = {}
+        self._resolved = {}
         self._symbols = symbols
         self.instance_repr = {}
         self.defines = []
@@ -222,11 +264,15 @@ class _Types(object):
                 raise SymbolException("Type conflict: %r" % (symbol,))
         else:
             self._types[class_] = symbol
+            self._resolved.clear()
 
     def resolve(self, type_, dialect):
         """
         Resolve type to module symbol
 
+        Registered types are matched along the method resolution order of
+        the type's class. The results are cached per class and dialect.
+
         Parameters:
           type_ (object):
             Type to resolve
@@ -240,34 +286,49 @@ class _Types(object):
         Raises:
           SymbolException: Type could not be resolved
         """
-        if type_.__class__ in self._types:
-            return self._symbols[self._types[type_.__class__]]
-        for class_, symbol in self._types.items():
-            if isinstance(type_, class_):
-                return self._symbols[symbol]
+        key = (type_.__class__, dialect)
+        try:
+            found = self._resolved[key]
+        except KeyError:
+            found = self._resolved[key] = self._find(type_.__class__, dialect)
+        if found is None:
+            raise SymbolException(
+                "Don't know how to address type %r" % (type_,)
+            )
+        name, suffix = found
+        return self._symbols[name] + suffix
+
+    def _find(self, class_, dialect):
+        """
+        Find the symbol of a type class
+
+        Parameters:
+          class_ (type):
+            Type class
+
+          dialect (str):
+            Dialect name
+
+        Returns:
+          tuple: Symbol identifier and suffix or ``None`` (if the type class
+          could not be resolved)
+        """
+        for base in _inspect.getmro(class_):
+            if base in self._types:
+                return self._types[base], ""
 
-        mod = type_.__module__
+        mod = class_.__module__
         if mod.startswith("sqlalchemy."):
             mod = ".".join(mod.split(".")[:3])
             if mod == "sqlalchemy.dialects.%s" % dialect:
-                return self._symbols["type"]
-            else:
-                try:
-                    _load_dotted(
-                        "sqlalchemy.dialects.%s.%s"
-                        % (dialect, type_.__class__.__name__)
-                    )
-                    return self._symbols["type"]
-                except ImportError:
-                    try:
-                        _load_dotted(
-                            "sqlalchemy.types.%s"
-                            % (type_.__class__.__name__,)
-                        )
-                        return "%s.types" % (self._symbols["sa"],)
-                    except ImportError:
-                        pass
-        raise SymbolException("Don't know how to address type %r" % (type_,))
+                return "type", ""
+            elif class_.__name__ in _catalog(
+                "sqlalchemy.dialects.%s" % dialect
+            ):
+                return "type", ""
+            elif class_.__name__ in _catalog("sqlalchemy.types"):
+                return "sa", ".types"
+        return None
 
 
 class _Imports(object):
@@ -275,8 +336,12 @@ class _Imports(object):
     Import table
 
     Attributes:
-      _imports (list):
-        Import list
+      _imports (collections.OrderedDict):
+        Import identifier -> import statement, in order of registration
+
+      _lines (tuple):
+        Cached rendered lines (see `lines`), (weak reference to the symbol
+        table, its modification counter, lines) or ``None``
     """
 
     def __init__(self, imports=None):
@@ -288,7 +353,10 @@ class _Imports(object):
             List of initial (id, import statement) tuples. If omitted or
             ``None``, it's empty.
         """
-        self._imports = list(imports or ())
+        self._imports = _collections.OrderedDict()
+        self._lines = None
+        for name, import_ in imports or ():
+            self[name] = import_
 
     def __contains__(self, name):
         """
@@ -301,10 +369,7 @@ class _Imports(object):
         Returns:
           bool: Does an import with that identifier exist?
         """
-        for key, _ in self._imports:
-            if key == name:
-                return True
-        return False
+        return name in self._imports
 
     def __setitem__(self, name, import_):
         """
@@ -324,15 +389,15 @@ class _Imports(object):
             name, _util.unicode
         ):  # pragma: no cover
             name = str(name).decode("ascii")
-        imports = dict(self._imports)
-        if name in imports:
-            if imports[name] != import_:
+        if name in self._imports:
+            if self._imports[name] != import_:
                 raise SymbolException(
                     "Import conflict: %r: %r vs. %r"
-                    % (name, imports[name], import_)
+                    % (name, self._imports[name], import_)
                 )
         else:
-            self._imports.append((name, import_))
+            self._imports[name] = import_
+            self._lines = None
 
     def __iter__(self):
         """
@@ -341,7 +406,64 @@ class _Imports(object):
         Returns:
           iterable: The iterator
         """
-        return iter(map(_op.itemgetter(1), self._imports))
+        return iter(list(self._imports.values()))
+
+    def lines(self, symbols):
+        """
+        Render the import statements
+
+        The result is cached until the imports or the symbols change.
+
+        Parameters:
+          symbols (Symbols):
+            Symbol table, filled into the statements
+
+        Returns:
+          list: Rendered import statements, sorted
+        """
+        # pylint: disable = protected-access
+        cached = self._lines
+        if (
+            cached is None
+            or cached[0]() is not symbols
+            or cached[1] != symbols._generation
+        ):
+            self._lines = cached = (
+                _weakref.ref(symbols),
+                symbols._generation,
+                sorted(
+                    import_ % symbols for import_ in self._imports.values()
+                ),
+            )
+        return list(cached[2])
+
+
+def _catalog(module):
+    """
+    Find the names provided by a type module
+
+    The catalog is built once per module, from its namespace.
+
+    Parameters:
+      module (str):
+        Module name, like ``sqlalchemy.dialects.sqlite``
+
+    Returns:
+      frozenset: The names. If the module cannot be loaded, it's empty.
+    """
+    try:
+        return _CATALOGS[module]
+    except KeyError:
+        pass
+
+    try:
+        names = frozenset(
+            name for name in vars(_load_dotted(module)) if name[:1] != "_"
+        )
+    except ImportError:
+        names = frozenset()
+    _CATALOGS[module] = names
+    return names
 
 
 def _load_dotted(name):
@@ -29,18 +29,25 @@ Table inspection and representation
 __author__ = u"Andr\xe9 Malo"
 
 import logging as _logging
-import operator as _op
-import re as _re
-import warnings as _warnings
-
-import sqlalchemy as _sa
 
+from . import _bulk
 from . import _column
 from . import _constraint
+from . import _graph
+from . import _meta
+from . import _observe
+from . import _reflect
 from . import _util
 
 logger = _logging.getLogger(__name__)
 
+#: Output orders. "name" sorts the tables by variable name, "dependency"
+#: emits referenced tables before the referencing ones (by variable name
+#: otherwise), so only cyclic foreign keys need to be deferred.
+#:
+#: :Type: tuple
+ORDERS = ("name", "dependency")
+
 
 class Table(object):
     """
@@ -66,6 +73,16 @@ class Table(object):
     #: :Type: bool
     is_reference = False
 
+    @property
+    def is_boundary(self):
+        """
+        Is it a boundary table (reflected without foreign keys and further
+        constraints)?
+
+        :Type: bool
+        """
+        return bool(self.sa_table.info.get(_meta.BOUNDARY))
+
     def __new__(cls, varname, table, schemas, symbols):
         """
         Construct
@@ -132,7 +149,16 @@ class Table(object):
         )
 
     @classmethod
-    def by_name(cls, name, varname, metadata, schemas, symbols, types=None):
+    def by_name(
+        cls,
+        name,
+        varname,
+        metadata,
+        schemas,
+        symbols,
+        types=None,
+        session=None,
+    ):
         """
         Construct by name
 
@@ -160,96 +186,23 @@ class Table(object):
             dialect's ``ischema_names``. If omitted or ``None``, the reflector
             will always fail on unknown types.
 
+          session (ReflectionSession):
+            Reflection session to use. The caller installs the warning
+            policy (see ``_reflect.warning_policy``) then. If passed, it
+            overrides `types`. If omitted or ``None``, a session is created
+            for this table only.
+
         Returns:
           Table: new Table instance
         """
-        # pylint: disable = too-many-locals
-
-        kwargs = {}
-        if "." in name:
-            schema, name = name.split(".")
-            kwargs["schema"] = schema
-        else:
-            schema = None
-
-        tmatch = _re.compile(u"^Did not recognize type (.+) of column").match
-
-        def type_name(e):
-            """Extract type name from exception"""
-            match = tmatch(e.args[0])
-            if match:
-                type_name = match.group(1).strip()
-                if type_name.startswith(('"', "'")):
-                    type_name = type_name[1:-1]
-                return type_name or None
-            return None
-
-        with _warnings.catch_warnings():
-            _warnings.filterwarnings(
-                "error",
-                category=_sa.exc.SAWarning,
-                message=r"^Did not recognize type ",
-            )
-            _warnings.filterwarnings(
-                "error",
-                category=_sa.exc.SAWarning,
-                message=r"^Unknown column definition ",
-            )
-            _warnings.filterwarnings(
-                "error",
-                category=_sa.exc.SAWarning,
-                message=r"^Incomplete reflection of " r"column definition",
-            )
-            _warnings.filterwarnings(
-                "ignore",
-                category=_sa.exc.SAWarning,
-                message=r"^Could not instantiate type ",
-            )
-            _warnings.filterwarnings(
-                "ignore",
-                category=_sa.exc.SAWarning,
-                message=r"^Skipped unsupported "
-                r"reflection of expression-based"
-                r" index ",
-            )
-            _warnings.filterwarnings(
-                "ignore",
-                category=_sa.exc.SAWarning,
-                message=r"^Predicate of partial index ",
-            )
+        if session is not None:
+            return cls(varname, session.reflect(name), schemas, symbols)
 
-            seen = set()
-            while True:
-                try:
-                    table = _sa.Table(
-                        name, metadata, autoload_with=metadata.bind, **kwargs
-                    )
-                except _sa.exc.SAWarning as e:
-                    if types is not None:
-                        tname = type_name(e)
-                        if tname and tname not in seen:
-                            stack = [tname]
-                            while stack:
-                                try:
-                                    types(stack[-1], metadata, symbols)
-                                except _sa.exc.SAWarning as exc:
-                                    tname = type_name(exc)
-                                    if (
-                                        tname
-                                        and tname not in stack
-                                        and tname not in seen
-                                    ):
-                                        stack.append(tname)
-                                        continue
-                                    raise
-                                else:
-                                    seen.add(stack.pop())
-                            continue
-                    raise
-                else:
-                    break
-
-        return cls(varname, table, schemas, symbols)
+        with _reflect.warning_policy():
+            sa_table = _reflect.ReflectionSession(
+                metadata, symbols, types=types
+            ).reflect(name)
+        return cls(varname, sa_table, schemas, symbols)
 
     def __repr__(self):
         """
@@ -301,6 +254,11 @@ class TableReference(object):
     #: :Type: bool
     is_reference = True
 
+    #: Is it a boundary table?
+    #:
+    #: :Type: bool
+    is_boundary = False
+
     def __init__(self, varname, table, schema, symbols):
         """
         Initialization
@@ -336,7 +294,25 @@ class TableCollection(tuple):
     """Table collection"""
 
     @classmethod
-    def by_names(cls, metadata, names, schemas, symbols, types=None):
+    def by_names(
+        cls,
+        metadata,
+        names,
+        schemas,
+        symbols,
+        types=None,
+        bulk=False,
+        max_workers=None,
+        cache=None,
+        shallow=False,
+        profile=None,
+        reflector=None,
+        session=None,
+        order=None,
+        boundary=None,
+        prefetch=False,
+        use_alter=False,
+    ):
         """
         Construct by table names
 
@@ -356,124 +332,628 @@ class TableCollection(tuple):
             the type name, (bound) metadata and the symbol table. It is
             responsible for modifying the symbols and imports *and* the
             dialect's ``ischema_names``. If omitted or ``None``, the reflector
-            will always fail on unknown types.
+            will always fail on unknown types. The loader is called once per
+            type name, pass a `TypeRegistry` in order to share that across
+            builds or runs.
+
+          bulk (bool):
+            Reflect all tables at once using the inspector's multi reflection
+            API instead of autoloading them one by one? This saves a lot of
+            round trips for larger schemas. The API exists since SQLAlchemy
+            2.0, older versions autoload the tables anyway. The other bulk
+            options require SQLAlchemy 2.0+.
+
+          max_workers (int):
+            Maximum number of catalog queries to run in parallel, each on its
+            own connection from the engine's pool. Implies `bulk`. If omitted
+            or ``None``, the queries run serially.
+
+          cache (ReflectionCache):
+            Reflection cache to consult before querying the catalog and to
+            store new table definitions into. Implies `bulk`. If omitted or
+            ``None``, no cache is used.
+
+          shallow (bool):
+            Do not reflect tables of the schemas mapped in `schemas`, but
+            build stubs containing only the columns referenced by foreign
+            keys? These tables end up as references anyway. Implies `bulk`.
+
+          profile (str):
+            Bulk reflection profile, "lean" (only what's needed for the
+            generated code) or "full". Implies `bulk`. If omitted or
+            ``None``, bulk reflection uses the lean profile.
+
+          reflector (BulkReflector):
+            Prepared bulk reflector, possibly with catalog information
+            collected already. If passed, it overrides `types`, `bulk`,
+            `max_workers`, `cache`, `shallow`, `profile` and `boundary`.
+
+          session (ReflectionSession):
+            Reflection session to autoload the tables with. If passed, it
+            overrides `types`. If omitted or ``None``, a new session is
+            used.
+
+          order (str):
+            Output order (one of `ORDERS`). If omitted or ``None``, the
+            tables are ordered by name.
+
+          boundary (iterable):
+            Keys (schema, name) of tables to reflect lightly, without
+            foreign keys (see ``Plan``). Implies `bulk`. If omitted or
+            ``None``, all tables are reflected fully.
+
+          prefetch (bool):
+            Read the SQLite catalog in bulk instead of table by table (see
+            ``_sqlite.prefetching``)? The tables are the same. It applies to
+            new sessions and reflectors only (not to passed ones). If
+            omitted or false, the dialect reads the catalog as usual.
+
+          use_alter (bool):
+            Mark the foreign keys deferred in order to break cycles with
+            ``use_alter``? They're rendered as cyclic foreign keys then. If
+            omitted or false, the foreign keys are not modified.
 
         Returns:
           TableCollection: New table collection instance
+
+        Raises:
+          KeyError: Unknown output order
+
+          NotImplementedError: A bulk option was passed, but the multi
+          reflection API is not available
         """
-        objects = dict(
-            (table.sa_table.key, table)
-            for table in [
-                Table.by_name(
-                    name, varname, metadata, schemas, symbols, types=types
+        # pylint: disable = too-many-arguments, too-many-positional-arguments
+        # pylint: disable = too-many-locals
+
+        if session is not None:
+            types = session.types
+        if types is not None and not isinstance(types, _reflect.TypeRegistry):
+            types = _reflect.TypeRegistry(types)
+        if reflector is None and (
+            bulk
+            or shallow
+            or any(
+                option is not None
+                for option in (max_workers, cache, profile, boundary)
+            )
+        ):
+            reflector = _bulk.BulkReflector(
+                metadata,
+                symbols,
+                types=types,
+                max_workers=max_workers,
+                cache=cache,
+                shallow=schemas if shallow else None,
+                profile=profile,
+                boundary=boundary,
+                prefetch=prefetch,
+            )
+        names = list(names)
+        if reflector is not None:
+            objects = [
+                Table(varname, sa_table, schemas, symbols)
+                for (varname, _), sa_table in zip(
+                    names, reflector.reflect([name for _, name in names])
                 )
-                for varname, name in names
             ]
+        else:
+            if session is None:
+                session = _reflect.ReflectionSession(
+                    metadata, symbols, types=types, prefetch=prefetch
+                )
+            with _reflect.warning_policy():
+                session.preload()
+                session.prescan([name for _, name in names])
+                objects = [
+                    Table.by_name(
+                        name,
+                        varname,
+                        metadata,
+                        schemas,
+                        symbols,
+                        session=session,
+                    )
+                    for varname, name in names
+                ]
+        return cls.from_tables(
+            metadata,
+            objects,
+            schemas,
+            symbols,
+            order=order,
+            use_alter=use_alter,
+        )
+
+    @classmethod
+    def from_metadata(cls, metadata, names, schemas, symbols, order=None):
+        """
+        Construct from tables reflected already
+
+        Parameters:
+          metadata (sqlalchemy.MetaData):
+            Metadata, containing the tables and all tables referenced by
+            them
+
+          names (iterable):
+            Name list (list of tuples (varname, name))
+
+          schemas (dict):
+            Schema -> module mapping
+
+          symbols (Symbols):
+            Symbol table
+
+          order (str):
+            Output order (one of `ORDERS`). If omitted or ``None``, the
+            tables are ordered by name.
+
+        Returns:
+          TableCollection: New table collection instance
+
+        Raises:
+          KeyError: A table is missing in the metadata or unknown output
+          order
+        """
+        return cls.from_tables(
+            metadata,
+            [
+                Table(
+                    varname,
+                    metadata.tables[
+                        ".".join(filter(None, _reflect.split_name(name)))
+                    ],
+                    schemas,
+                    symbols,
+                )
+                for varname, name in names
+            ],
+            schemas,
+            symbols,
+            order=order,
+        )
+
+    @classmethod
+    def from_tables(
+        cls, metadata, tables, schemas, symbols, order=None, use_alter=False
+    ):
+        """
+        Construct from the requested tables
+
+        All tables of the metadata reachable from the requested tables via
+        foreign keys are added as well. Foreign key cycles are broken up.
+
+        Parameters:
+          metadata (sqlalchemy.MetaData):
+            Metadata
+
+          tables (iterable):
+            Requested tables (`Table` or `TableReference` instances)
+
+          schemas (dict):
+            Schema -> module mapping
+
+          symbols (Symbols):
+            Symbol table
+
+          order (str):
+            Output order (one of `ORDERS`). If omitted or ``None``, the
+            tables are ordered by name.
+
+          use_alter (bool):
+            Mark the foreign keys deferred in order to break cycles with
+            ``use_alter``? They're rendered as cyclic foreign keys then. If
+            omitted or false, the foreign keys are not modified.
+
+        Returns:
+          TableCollection: New table collection instance
+
+        Raises:
+          KeyError: Unknown output order
+        """
+        order = _check_order(order)
+        objects = dict(
+            (_graph.key_of(table.sa_table), table) for table in tables
+        )
+        graph = _graph.ForeignKeyGraph.from_tables(
+            table.sa_table for table in objects.values()
         )
 
         def map_table(sa_table):
             """Map SA table to table object"""
-            if sa_table.key not in objects:
+            key = _graph.key_of(sa_table)
+            if key not in objects:
                 varname = sa_table.name
                 if _util.py2 and isinstance(varname, _util.unicode):
                     varname = varname.encode("ascii")
-                objects[sa_table.key] = Table(
-                    varname, sa_table, schemas, symbols
-                )
-            return objects[sa_table.key]
+                objects[key] = Table(varname, sa_table, schemas, symbols)
+            return objects[key]
+
+        # The metadata may contain other tables as well, if it's shared
+        # between several builds.
+        keys = [
+            _graph.key_of(map_table(sa_table).sa_table)
+            for sa_table in metadata.tables.values()
+            if _graph.key_of(sa_table) in graph.tables
+        ]
 
-        tables = list(map(map_table, metadata.tables.values()))
-        tables.sort(key=lambda x: (not (x.is_reference), x.varname))
+        with _observe.timed("cycles"):
+            graph.break_cycles(use_alter=use_alter)
+        keys = _sort(
+            graph,
+            keys,
+            lambda key: objects[key].varname,
+            lambda key: objects[key].is_reference,
+            order,
+        )
+        _annotate(graph, objects, keys)
+        return cls(objects[key] for key in keys)
 
-        _break_cycles(metadata)
-        seen = set()
 
-        for table in tables:
-            seen.add(table.sa_table.key)
-            for con in table.constraints:
-                # pylint: disable = unidiomatic-typecheck
-                if type(con) == _constraint.ForeignKeyConstraint:
-                    if con.options == "seen":
-                        continue
+def stream(
+    metadata, names, schemas, symbols, reflector, order=None, use_alter=False
+):
+    """
+    Reflect tables one by one, in output order
 
-                    remote_key = con.constraint.elements[0].column.table.key
-                    if remote_key not in seen:
-                        con.options = "unseen: %s" % (
-                            objects[remote_key].varname,
-                        )
-                        remote_con = con.copy()
-                        remote_con.options = "seen: %s" % (table.varname,)
-                        objects[remote_key].constraints.append(remote_con)
+    The catalog information is collected upfront, when called (see
+    `BulkReflector`), but the SQLAlchemy tables are built one at a time,
+    right before they are yielded. Foreign key annotations and deferred
+    (cyclic) foreign keys are the same as for
+    `TableCollection.from_tables`. Once a table has been yielded (and,
+    therefore, rendered by the consumer), it's removed from the metadata,
+    unless it's a foreign key target of a table yet to come. The collected
+    information of a table is dropped as soon as the table is built.
 
-        return cls(tables)
+    Parameters:
+      metadata (sqlalchemy.MetaData):
+        Metadata
 
+      names (iterable):
+        Name list (list of tuples (varname, name))
 
-def _break_cycles(metadata):
+      schemas (dict):
+        Schema -> module mapping
+
+      symbols (Symbols):
+        Symbol table
+
+      reflector (BulkReflector):
+        Bulk reflector
+
+      order (str):
+        Output order (one of `ORDERS`). If omitted or ``None``, the tables
+        are ordered by name.
+
+      use_alter (bool):
+        Mark the deferred foreign keys with ``use_alter``? See
+        `TableCollection.from_tables`.
+
+    Returns:
+      iterable: Generator of `Table` and `TableReference` instances
+
+    Raises:
+      KeyError: Unknown output order
+
+      NotImplementedError: Bulk reflection is not available
+    """
+    order = _check_order(order)
+    varnames = dict(
+        (_reflect.split_name(name), varname) for varname, name in names
+    )
+    with _reflect.warning_policy():
+        if not reflector.prepare(list(varnames)):
+            raise NotImplementedError("Streaming requires SQLAlchemy 2.0+")
+
+    targets = _stream_targets(metadata, reflector, list(varnames))
+    graph = _graph.ForeignKeyGraph()
+    for key, remotes in targets.items():
+        graph.add(key, remotes)
+    with _observe.timed("cycles"):
+        graph.break_cycles(use_alter=use_alter)
+
+    def varname_of(key):
+        """Determine variable name"""
+        if key in varnames:
+            return varnames[key]
+        varname = key[1]
+        if _util.py2 and isinstance(varname, _util.unicode):
+            varname = varname.encode("ascii")
+        return varname
+
+    order = _sort(
+        graph, list(targets), varname_of, lambda key: key[0] in schemas, order
+    )
+    for key in order:
+        if key[0] not in schemas:
+            symbols[u"table_%s" % key[1]] = varname_of(key)
+
+    return _stream_tables(
+        metadata,
+        schemas,
+        symbols,
+        reflector,
+        graph,
+        targets,
+        order,
+        varname_of,
+    )
+
+
+def _stream_targets(metadata, reflector, keys):
     """
-    Find foreign key cycles and break them apart
+    Find the foreign key closure of the streamed tables
 
     Parameters:
       metadata (sqlalchemy.MetaData):
         Metadata
+
+      reflector (BulkReflector):
+        Prepared bulk reflector
+
+      keys (list):
+        Keys (schema, name) of the requested tables
+
+    Returns:
+      dict: Table key -> list of foreign key target keys
     """
+    targets, todo = {}, list(keys)
+    while todo:
+        key = todo.pop()
+        if key in targets:
+            continue
+        if reflector.collected(key):
+            targets[key] = reflector.targets(key)
+        elif _dotted(key) in metadata.tables:
+            targets[key] = [
+                (fkey.column.table.schema, fkey.column.table.name)
+                for fkey in metadata.tables[_dotted(key)].foreign_keys
+            ]
+        else:
+            targets[key] = []
+        todo.extend(targets[key])
+    return targets
 
-    def break_cycle(e):
-        """Break foreign key cycle"""
-        cycle_keys = set(map(_op.attrgetter("key"), e.cycles))
-        cycle_path = [
-            (parent, child)
-            for parent, child in e.edges
-            if parent.key in cycle_keys and child.key in cycle_keys
-        ]
-        deps = [cycle_path.pop()]
-        while cycle_path:
-            tmp = []
-            for parent, child in cycle_path:
-                if parent == deps[-1][1]:
-                    deps.append((parent, child))
-                else:
-                    tmp.append((parent, child))
-            if len(tmp) == len(cycle_path):
-                raise AssertionError("Could not construct sorted cycle path")
-            cycle_path = tmp
-        if deps[0][0].key != deps[-1][1].key:
-            raise AssertionError("Could not construct sorted cycle path")
-
-        deps = list(map(_op.itemgetter(0), deps))
-        first_dep = list(sorted(deps, key=_op.attrgetter("name")))[0]
-        while first_dep != deps[-1]:
-            deps = [deps[-1]] + deps[:-1]
-        deps.reverse()
-        logger.debug(
-            "Found foreign key cycle: %s",
-            " -> ".join([repr(table.name) for table in deps + [deps[0]]]),
-        )
 
-        def visit_foreign_key(fkey):
-            """Visit foreign key"""
-            if fkey.column.table == deps[1]:
-                fkey.use_alter = True
-                fkey.constraint.use_alter = True
-
-        _sa.sql.visitors.traverse(
-            deps[0],
-            dict(schema_visitor=True),
-            dict(
-                foreign_key=visit_foreign_key,
-            ),
-        )
+def _stream_tables(
+    metadata, schemas, symbols, reflector, graph, targets, order, varname_of
+):
+    """
+    Build and yield the tables of a `stream`
 
-    while True:
-        try:
-            with _warnings.catch_warnings():
-                _warnings.filterwarnings(
-                    "ignore",
-                    category=_sa.exc.SAWarning,
-                    message=(r"^Cannot correctly sort " r"tables"),
-                )
+    Parameters:
+      metadata (sqlalchemy.MetaData):
+        Metadata
 
-                metadata.sorted_tables  # pylint: disable = pointless-statement
-        except _sa.exc.CircularDependencyError as e:
-            break_cycle(e)
-        else:
-            break
+      schemas (dict):
+        Schema -> module mapping
+
+      symbols (Symbols):
+        Symbol table
+
+      reflector (BulkReflector):
+        Prepared bulk reflector
+
+      graph (ForeignKeyGraph):
+        Foreign key graph of the tables, cycles broken already
+
+      targets (dict):
+        Table key -> list of foreign key target keys
+
+      order (list):
+        Table keys in output order
+
+      varname_of (callable):
+        Variable name of a table, called with the table key
+
+    Returns:
+      iterable: Generator of `Table` and `TableReference` instances
+    """
+    # pylint: disable = too-many-arguments, too-many-positional-arguments
+    # pylint: disable = too-many-locals
+
+    referrers = dict(
+        (key, set(graph.incoming[key]) - set([key])) for key in targets
+    )
+    position = dict((key, idx) for idx, key in enumerate(order))
+    extra = dict((key, []) for key in order)
+    for key in order:
+        with _reflect.warning_policy():
+            sa_table = _stream_build(metadata, reflector, key, targets[key])
+        graph.defer(sa_table)
+
+        table = Table(varname_of(key), sa_table, schemas, symbols)
+        for remote, con in _stream_deferred(table, key, position, varname_of):
+            extra[remote].append(con)
+        table.constraints.extend(extra.pop(key))
+
+        yield table
+        table = sa_table = None
+
+        for item in [key] + targets[key]:
+            referrers[item].discard(key)
+            if (
+                not referrers[item]
+                and position[item] <= position[key]
+                and reflector.collected(item)
+                and _dotted(item) in metadata.tables
+            ):
+                metadata.remove(metadata.tables[_dotted(item)])
+
+
+def _stream_build(metadata, reflector, key, remotes):
+    """
+    Build a streamed table and its foreign key targets
+
+    The collected information of the built tables is released. Must be
+    called with the warning policy installed.
+
+    Parameters:
+      metadata (sqlalchemy.MetaData):
+        Metadata
+
+      reflector (BulkReflector):
+        Prepared bulk reflector
+
+      key (tuple):
+        Table key (schema, name)
+
+      remotes (list):
+        Foreign key target keys
+
+    Returns:
+      sqlalchemy.Table: The table
+    """
+    result = reflector.table(key, resolve_fks=False)
+    reflector.release(key)
+    for remote in remotes:
+        if _dotted(remote) not in metadata.tables:
+            reflector.table(remote, resolve_fks=False)
+            reflector.release(remote)
+    return result
+
+
+def _stream_deferred(table, key, position, varname_of):
+    """
+    Defer foreign keys pointing to tables streamed later
+
+    Such foreign keys are commented out at the referencing table (modified
+    in place) and emitted at the referenced table instead.
+
+    Parameters:
+      table (Table):
+        The streamed table
+
+      key (tuple):
+        Table key (schema, name)
+
+      position (dict):
+        Table key -> output position
+
+      varname_of (callable):
+        Variable name of a table, called with the table key
+
+    Returns:
+      list: Constraints to emit at the referenced tables, (remote key,
+      constraint) pairs
+    """
+    result = []
+    for con in table.constraints:
+        # pylint: disable = unidiomatic-typecheck
+        if type(con) == _constraint.ForeignKeyConstraint:
+            remote_table = con.constraint.elements[0].column.table
+            remote = (remote_table.schema, remote_table.name)
+            if position[remote] > position[key]:
+                con.options = "unseen: %s" % (varname_of(remote),)
+                remote_con = con.copy()
+                remote_con.options = "seen: %s" % (table.varname,)
+                result.append((remote, _constraint.Rendered(remote_con)))
+    return result
+
+
+def _dotted(key):
+    """
+    Make the metadata key of a table
+
+    Parameters:
+      key (tuple):
+        Table key (schema, name)
+
+    Returns:
+      str: The metadata key
+    """
+    return ".".join(filter(None, key))
+
+
+def _check_order(order):
+    """
+    Check the output order
+
+    Parameters:
+      order (str):
+        Output order or ``None``
+
+    Returns:
+      str: The output order
+
+    Raises:
+      KeyError: Unknown output order
+    """
+    if order is None:
+        return ORDERS[0]
+    if order not in ORDERS:
+        raise KeyError("Unknown output order %r" % (order,))
+    return order
+
+
+def _sort(graph, keys, varname_of, is_reference, order):
+    """
+    Determine the output order
+
+    Table references come first, ordered by variable name.
+
+    Parameters:
+      graph (ForeignKeyGraph):
+        Foreign key graph of the tables, cycles broken already
+
+      keys (list):
+        Table keys to sort
+
+      varname_of (callable):
+        Variable name of a table, called with the table key
+
+      is_reference (callable):
+        Check if a table is a table reference, called with the table key
+
+      order (str):
+        Output order (one of `ORDERS`)
+
+    Returns:
+      list: The sorted table keys
+    """
+    references = sorted(
+        (key for key in keys if is_reference(key)), key=varname_of
+    )
+    tables = [key for key in keys if not is_reference(key)]
+    if order == "dependency":
+        tables = graph.topological(tables, varname_of)
+    else:
+        tables.sort(key=varname_of)
+    return references + tables
+
+
+def _annotate(graph, objects, order):
+    """
+    Annotate foreign keys pointing to tables emitted later
+
+    Such foreign keys are commented out at the referencing table and
+    emitted at the referenced table instead.
+
+    Parameters:
+      graph (ForeignKeyGraph):
+        Foreign key graph of the tables
+
+      objects (dict):
+        Table key -> `Table` or `TableReference`
+
+      order (list):
+        Table keys in output order
+    """
+    seen = set()
+    for key in order:
+        seen.add(key)
+        table, remotes = objects[key], graph.outgoing[key]
+        if table.is_reference or all(remote in seen for remote in remotes):
+            continue
+
+        wrappers = dict(
+            (id(con.constraint), con) for con in table.constraints
+        )
+        for remote in remotes:
+            if remote in seen:
+                continue
+            for constraint in graph.constraints[key, remote]:
+                con = wrappers[id(constraint)]
+                con.options = "unseen: %s" % (objects[remote].varname,)
+                remote_con = con.copy()
+                remote_con.options = "seen: %s" % (table.varname,)
+                objects[remote].constraints.append(remote_con)
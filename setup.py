@@ -62,7 +62,9 @@ package = dict(
 
     packages=True,
     # py_modules=[],
-    # version_file='__init__.py',
+    # Modules using Python 3 syntax, not installed with Python 2
+    py3_modules=["gensaschema._async"],
+    version_file="_version.py",
     install_requires=[],
 
     entry_points={},
@@ -93,6 +95,38 @@ package = dict(
 )
 
 
+def _build_py(py3_modules):
+    """
+    Create build_py command, which skips Python 3 only modules on Python 2
+
+    Parameters:
+      py3_modules (iterable):
+        Module names (dotted)
+
+    Returns:
+      type: The command class
+    """
+    # pylint: disable = import-outside-toplevel
+    from setuptools.command import build_py as _build_py_cmd
+
+    py3_modules = frozenset(py3_modules)
+
+    class build_py(_build_py_cmd.build_py):  # pylint: disable = invalid-name
+        """build_py command, skipping Python 3 only modules"""
+
+        def find_package_modules(self, package, package_dir):
+            """Find the modules of a package"""
+            return [
+                item
+                for item in _build_py_cmd.build_py.find_package_modules(
+                    self, package, package_dir
+                )
+                if "%s.%s" % (item[0], item[1]) not in py3_modules
+            ]
+
+    return build_py
+
+
 def setup():
     """Main"""
     # pylint: disable = too-many-branches
@@ -131,6 +165,8 @@ def setup():
         kwargs["classifiers"] = package["classifiers"]
     if package.get("entry_points"):
         kwargs["entry_points"] = package["entry_points"]
+    if str is bytes and package.get("py3_modules"):
+        kwargs["cmdclass"] = dict(build_py=_build_py(package["py3_modules"]))
 
     _setuptools.setup(
         name=package["name"],
@@ -27,10 +27,17 @@ Test setup
 """
 __author__ = u"Andr\xe9 Malo, Andr\xe9s Reyes Monge"
 
+import sys as _sys
 import time as _time
 
 import docker as _docker
 import pytest as _pytest
+import sqlalchemy as _sa
+
+#: Test modules not to be collected. The async tests use Python 3 syntax.
+collect_ignore = []
+if _sys.version_info < (3, 7):
+    collect_ignore.append("integration/test_async.py")
 
 POSTGRES_PASSWORD = "supersecretpassword"
 POSTGRES_PORT = 65432
@@ -103,3 +110,26 @@ def postgres_url(postgres_docker):
         POSTGRES_PORT,
         POSTGRES_DB,
     )
+
+
+@_pytest.fixture(name="unknown_types")
+def unknown_types_fixture(mocker):
+    """Make SQLite warn about the FOO and BAR types, like other dialects"""
+    # pylint: disable = import-outside-toplevel, protected-access
+    from sqlalchemy.dialects.sqlite import base as _sqlite
+
+    dialect = _sqlite.SQLiteDialect
+    resolve = dialect._resolve_type_affinity
+
+    def resolve_type(self, type_):
+        """Warn about unknown types"""
+        if type_ in ("FOO", "BAR") and type_ not in self.ischema_names:
+            _sa.util.warn(
+                "Did not recognize type '%s' of column 'x'" % (type_,)
+            )
+            return _sa.types.NullType
+        return resolve(self, type_)
+
+    mocker.patch.object(dialect, "_resolve_type_affinity", resolve_type)
+    mocker.patch.dict(dialect.ischema_names)
+    return dialect.ischema_names
@@ -0,0 +1,202 @@
+# -*- coding: ascii -*-
+u"""
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+========================
+ Async reflection tests
+========================
+
+Async reflection tests (Python 3 only, see conftest)
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import asyncio as _asyncio
+import io as _io
+import os as _os
+import warnings as _warnings
+
+import pytest as _pytest
+import sqlalchemy as _sa
+
+from gensaschema import _bulk
+from gensaschema import _schema
+from gensaschema import _symbols
+
+from .test_schema import runner
+from .test_table import type_loader
+from .test_table import typed_tables
+
+# pylint: disable = invalid-name
+
+_pytest.importorskip("aiosqlite")
+_sa_asyncio = _pytest.importorskip("sqlalchemy.ext.asyncio")
+
+
+@_pytest.mark.skipif(not _bulk.AVAILABLE, reason="Requires SQLAlchemy 2.0+")
+def test_schema_async(tmpdir):
+    """_schema.Schema.reflect_async() matches the sync reflection"""
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        run = runner(db)
+        run(
+            """
+            CREATE TABLE names (
+                id  INT(11) PRIMARY KEY,
+                last   VARCHAR(129) NOT NULL
+            );
+        """
+        )
+        run(
+            """
+            CREATE TABLE persons (
+                id  INT(11) PRIMARY KEY,
+                name  INT(11) NOT NULL REFERENCES names (id),
+                boss  INT(11) REFERENCES persons (id)
+            );
+        """
+        )
+        tables = [("persons", "persons")]
+        schema = _schema.Schema(db, tables, {}, _symbols.Symbols())
+    finally:
+        db.close()
+
+    async def reflect():
+        """Reflect async"""
+        engine = _sa_asyncio.create_async_engine(
+            "sqlite+aiosqlite:///%s" % (filename,)
+        )
+        try:
+            return await _schema.Schema.reflect_async(
+                engine, tables, {}, _symbols.Symbols(), concurrency=2
+            )
+        finally:
+            await engine.dispose()
+
+    async_schema = _asyncio.run(reflect())
+
+    expected, result = _io.StringIO(), _io.StringIO()
+    schema.dump(expected)
+    async_schema.dump(result)
+    assert result.getvalue() == expected.getvalue()
+    assert "names = T(" in result.getvalue()
+
+
+@_pytest.mark.skipif(not _bulk.AVAILABLE, reason="Requires SQLAlchemy 2.0+")
+def test_schema_async_types(tmpdir, unknown_types):
+    """_schema.Schema.reflect_async() feeds unknown types to the loader"""
+    # pylint: disable = unused-argument
+    filename = _os.path.join(str(tmpdir), "tabletest.db")
+    typed_tables(_sa.create_engine("sqlite:///%s" % (filename,)))
+
+    loaded = []
+
+    async def reflect():
+        """Reflect async"""
+        engine = _sa_asyncio.create_async_engine(
+            "sqlite+aiosqlite:///%s" % (filename,)
+        )
+        try:
+            return await _schema.Schema.reflect_async(
+                engine,
+                [("persons", "persons")],
+                {},
+                _symbols.Symbols(),
+                types=type_loader(loaded),
+                concurrency=2,
+            )
+        finally:
+            await engine.dispose()
+
+    result = _io.StringIO()
+    # Like outside the test suite, where warnings are no errors
+    with _warnings.catch_warnings():
+        _warnings.simplefilter("ignore", _sa.exc.SAWarning)
+        schema = _asyncio.run(reflect())
+    schema.dump(result)
+    assert loaded == ["FOO", "BAR"]
+    assert "NullType" not in result.getvalue()
+    assert "C('a', _sa.types.Integer)" in result.getvalue()
+
+
+@_pytest.mark.skipif(not _bulk.AVAILABLE, reason="Requires SQLAlchemy 2.0+")
+def test_schema_async_concurrent(tmpdir, unknown_types):
+    """Concurrent async reflections leave the warning filters alone"""
+    # pylint: disable = unused-argument
+    filename = _os.path.join(str(tmpdir), "tabletest.db")
+    typed_tables(_sa.create_engine("sqlite:///%s" % (filename,)))
+
+    async def reflect(engine, loaded):
+        """Reflect async"""
+        return await _schema.Schema.reflect_async(
+            engine,
+            [("persons", "persons"), ("names", "names")],
+            {},
+            _symbols.Symbols(),
+            types=type_loader(loaded),
+            concurrency=2,
+        )
+
+    async def both():
+        """Run two reflections concurrently"""
+        engine = _sa_asyncio.create_async_engine(
+            "sqlite+aiosqlite:///%s" % (filename,)
+        )
+        try:
+            return await _asyncio.gather(
+                reflect(engine, []), reflect(engine, [])
+            )
+        finally:
+            await engine.dispose()
+
+    with _warnings.catch_warnings():
+        _warnings.simplefilter("ignore", _sa.exc.SAWarning)
+        before = list(_warnings.filters)
+        first, second = _asyncio.run(both())
+        assert _warnings.filters == before
+
+    expected, result = _io.StringIO(), _io.StringIO()
+    first.dump(expected)
+    second.dump(result)
+    assert result.getvalue() == expected.getvalue()
+    assert "NullType" not in result.getvalue()
+
+
+@_pytest.mark.skipif(_bulk.AVAILABLE, reason="Requires SQLAlchemy < 2.0")
+def test_schema_async_unsupported(tmpdir):
+    """_schema.Schema.reflect_async() rejects old SQLAlchemy versions"""
+    filename = _os.path.join(str(tmpdir), "tabletest.db")
+
+    async def reflect():
+        """Reflect async"""
+        engine = _sa_asyncio.create_async_engine(
+            "sqlite+aiosqlite:///%s" % (filename,)
+        )
+        try:
+            return await _schema.Schema.reflect_async(
+                engine, [("t", "t")], {}, _symbols.Symbols()
+            )
+        finally:
+            await engine.dispose()
+
+    with _pytest.raises(NotImplementedError):
+        _asyncio.run(reflect())
@@ -28,12 +28,17 @@ Schema generation tests
 """
 __author__ = u"Andr\xe9 Malo, Andr\xe9s Reyes Monge"
 
+import json as _json
 import os as _os
 import sys as _sys
 import warnings as _warnings
 
+import pytest as _pytest
 import sqlalchemy as _sa
 
+from gensaschema import _bulk
+from gensaschema import _cache
+from gensaschema import _reflect
 from gensaschema import _symbols
 from gensaschema import _schema
 
@@ -41,6 +46,11 @@ from gensaschema import _schema
 
 sa_version = tuple(map(int, _sa.__version__.split(".")[:3]))
 
+#: Marker for tests of options requiring the multi reflection API
+multi_only = _pytest.mark.skipif(
+    not _bulk.AVAILABLE, reason="Requires SQLAlchemy 2.0+"
+)
+
 
 def runner(db):
     """Create runner"""
@@ -53,6 +63,83 @@ def runner(db):
     return run
 
 
+def example_tables(db):
+    """Create the tables of the example schema"""
+    run = runner(db)
+    run(
+        """
+        CREATE TABLE names (
+            id  INT(11) PRIMARY KEY,
+            first  VARCHAR(128) DEFAULT NULL,
+            last   VARCHAR(129) NOT NULL
+        );
+    """
+    )
+    run(
+        """
+        CREATE TABLE emails (
+            id  INT(11) PRIMARY KEY,
+            address  VARCHAR(127) NOT NULL,
+
+            UNIQUE (address)
+        );
+    """
+    )
+    run(
+        """
+        CREATE TABLE addresses (
+            id  INT(11) PRIMARY KEY,
+            zip_code  VARCHAR(32) DEFAULT NULL,
+            place     VARCHAR(78) NOT NULL,
+            street    VARCHAR(64) DEFAULT NULL
+        );
+    """
+    )
+    run(
+        """
+        CREATE TABLE persons (
+            id  INT(11) PRIMARY KEY,
+            address  INT(11) NOT NULL,
+            name  INT(11) NOT NULL,
+            email  INT(11) DEFAULT NULL,
+
+            FOREIGN KEY (address) REFERENCES addresses (id),
+            FOREIGN KEY (name) REFERENCES names (id),
+            FOREIGN KEY (email) REFERENCES emails (id)
+        );
+    """
+    )
+    run(
+        """
+        ALTER TABLE addresses
+            ADD COLUMN owner INT(11) DEFAULT NULL REFERENCES persons (id);
+    """
+    )
+    run(
+        """
+        CREATE TABLE temp.blub (id INT PRIMARY KEY);
+    """
+    )
+
+
+def dump_example(db, **options):
+    """Generate the example schema module"""
+    # pylint: disable = import-outside-toplevel
+    import io as _io
+
+    schema = _schema.Schema(
+        db,
+        [("persons", "persons"), ("blah", "temp.blub")],
+        {"temp": "foo.bar.baz"},
+        _symbols.Symbols(dict(type="t")),
+        dbname="foo",
+        **options
+    )
+    fp = _io.StringIO()
+    schema.dump(fp)
+    return fp.getvalue()
+
+
 def test_schema(tmpdir):
     """_schema.Schema() works as expected"""
     _warnings.simplefilter("error", _sa.exc.SAWarning)
@@ -245,6 +332,814 @@ del _sa, T, C, D, m
         exec("exec result in glob, loc")
 
 
+@_pytest.mark.parametrize(
+    "options",
+    [
+        dict(bulk=True),
+        _pytest.param(dict(max_workers=4), marks=multi_only),
+        _pytest.param(dict(shallow=True), marks=multi_only),
+        _pytest.param(dict(profile="full"), marks=multi_only),
+    ],
+    ids=["bulk", "parallel", "shallow", "full"],
+)
+def test_schema_bulk(tmpdir, options):
+    """_schema.Schema() reflection options don't change the output"""
+    _warnings.simplefilter("error", _sa.exc.SAWarning)
+
+    filename = _os.path.join(str(tmpdir), "tabletest.db")
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        example_tables(db)
+        expected = dump_example(db)
+        result = dump_example(db, **options)
+    finally:
+        db.close()
+
+    assert result == expected
+    assert "# Table \"persons\"" in result
+
+
+def test_schema_snapshot(tmpdir):
+    """_schema.Schema.from_snapshot() matches the live reflection"""
+    _warnings.simplefilter("error", _sa.exc.SAWarning)
+
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+    snapshot = _os.path.join(tmpdir, "schema.snapshot")
+
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        example_tables(db)
+        expected = dump_example(db)
+        schema = _schema.Schema(
+            db,
+            [("persons", "persons"), ("blah", "temp.blub")],
+            {"temp": "foo.bar.baz"},
+            _symbols.Symbols(dict(type="t")),
+            dbname="foo",
+        )
+    finally:
+        db.close()
+
+    with open(snapshot, "wb") as fp:
+        schema.dump_snapshot(fp)
+    offline = _schema.Schema.from_snapshot(
+        snapshot, {"temp": "foo.bar.baz"}, _symbols.Symbols(dict(type="t"))
+    )
+    with open(_os.path.join(tmpdir, "offline.py"), "w") as fp:
+        offline.dump(fp)
+    with open(_os.path.join(tmpdir, "offline.py")) as fp:
+        assert fp.read() == expected
+
+
+def test_schema_stream(tmpdir):
+    """_schema.Schema.stream() matches the regular dump"""
+    # pylint: disable = import-outside-toplevel
+    import io as _io
+
+    _warnings.simplefilter("error", _sa.exc.SAWarning)
+
+    filename = _os.path.join(str(tmpdir), "tabletest.db")
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        example_tables(db)
+        context = _reflect.ReflectionContext(db)
+        if not _bulk.AVAILABLE:
+            with _pytest.raises(NotImplementedError):
+                _schema.Schema.stream(
+                    db, [], {}, _symbols.Symbols(), _io.StringIO()
+                )
+            return
+
+        expected = dump_example(db)
+        result = _io.StringIO()
+        _schema.Schema.stream(
+            db,
+            [("persons", "persons"), ("blah", "temp.blub")],
+            {"temp": "foo.bar.baz"},
+            _symbols.Symbols(dict(type="t")),
+            result,
+            dbname="foo",
+            context=context,
+        )
+    finally:
+        db.close()
+
+    assert result.getvalue() == expected
+
+    # Everything (except stubs) is released after rendering
+    assert [
+        table
+        for table in context.metadata.tables.values()
+        if table.schema != "temp"
+    ] == []
+
+
+@multi_only
+def test_schema_cache(tmpdir):
+    """_schema.Schema() reuses cached table definitions"""
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+    cache = _os.path.join(tmpdir, "cache")
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    statements = []
+    _sa.event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    def generate():
+        """Generate schema module"""
+        del statements[:]
+        db = engine.connect()
+        try:
+            schema = _schema.Schema(
+                db,
+                [("persons", "persons")],
+                {},
+                _symbols.Symbols(),
+                cache=cache,
+            )
+        finally:
+            db.close()
+        with open(_os.path.join(tmpdir, "schema.py"), "w") as fp:
+            schema.dump(fp)
+        with open(_os.path.join(tmpdir, "schema.py")) as fp:
+            return fp.read()
+
+    db = engine.connect()
+    try:
+        run = runner(db)
+        run(
+            """
+            CREATE TABLE names (
+                id  INT(11) PRIMARY KEY,
+                last   VARCHAR(129) NOT NULL
+            );
+        """
+        )
+        run(
+            """
+            CREATE TABLE persons (
+                id  INT(11) PRIMARY KEY,
+                name  INT(11) NOT NULL REFERENCES names (id)
+            );
+        """
+        )
+    finally:
+        db.close()
+
+    first = generate()
+    assert len(statements) > 2
+    assert generate() == first
+    assert len(statements) == 2  # fingerprints only
+
+    db = engine.connect()
+    try:
+        runner(db)("ALTER TABLE names ADD COLUMN first VARCHAR(128)")
+    finally:
+        db.close()
+
+    second = generate()
+    assert "C('first', t.VARCHAR(128))" in second
+    assert "C('first', t.VARCHAR(128))" not in first
+
+
+def test_schema_from_ddl(tmpdir):
+    """_schema.Schema.from_ddl() matches reflection of a real database"""
+    # pylint: disable = import-outside-toplevel
+    import io as _io
+
+    tmpdir = str(tmpdir)
+    ddl = _os.path.join(tmpdir, "schema.sql")
+    with open(ddl, "w") as fp:
+        fp.write(
+            """
+            CREATE TABLE names (
+                id  INT(11) PRIMARY KEY,
+                last   VARCHAR(129) NOT NULL
+            );
+            CREATE TABLE persons (
+                id  INT(11) PRIMARY KEY,
+                name  INT(11) NOT NULL REFERENCES names (id),
+                boss  INT(11) REFERENCES persons (id)
+            );
+            CREATE TABLE extra.blub (id INT PRIMARY KEY);
+        """
+        )
+    tables = [("persons", "persons"), ("blub", "extra.blub")]
+    schemas = {}
+
+    filename = _os.path.join(tmpdir, "tabletest.db")
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        run = runner(db)
+        run("ATTACH DATABASE ':memory:' AS extra")
+        with open(ddl) as fp:
+            for stmt in fp.read().split(";"):
+                if stmt.strip():
+                    run(stmt)
+        schema = _schema.Schema(db, tables, schemas, _symbols.Symbols())
+    finally:
+        db.close()
+
+    with open(ddl, "rb") as fp:
+        ddl_schema = _schema.Schema.from_ddl(
+            [fp], tables, schemas, _symbols.Symbols(), bulk=True
+        )
+
+    expected, result = _io.StringIO(), _io.StringIO()
+    schema.dump(expected)
+    ddl_schema.dump(result)
+    assert result.getvalue() == expected.getvalue()
+    assert "names = T(" in result.getvalue()
+    assert "blub = T('blub', m," in result.getvalue()
+
+
+@_pytest.mark.parametrize("bulk", [False, True], ids=["autoload", "bulk"])
+def test_schema_context(tmpdir, bulk):
+    """_schema.Schema() shares reflected tables via a context"""
+    # pylint: disable = import-outside-toplevel
+    import io as _io
+
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    statements = []
+    _sa.event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    with engine.begin() as db:
+        db.execute(
+            _sa.text("CREATE TABLE names (id INT PRIMARY KEY, last TEXT)")
+        )
+        db.execute(
+            _sa.text(
+                "CREATE TABLE persons (id INT PRIMARY KEY,"
+                " name INT REFERENCES names (id))"
+            )
+        )
+        db.execute(
+            _sa.text(
+                "CREATE TABLE emails (id INT PRIMARY KEY,"
+                " name INT REFERENCES names (id))"
+            )
+        )
+
+    configs = [[("persons", "persons")], [("emails", "emails")]]
+
+    def dump(schema):
+        """Dump schema"""
+        fp = _io.StringIO()
+        schema.dump(fp)
+        return fp.getvalue()
+
+    db = engine.connect()
+    try:
+        expected = [
+            dump(
+                _schema.Schema(db, tables, {}, _symbols.Symbols(), bulk=bulk)
+            )
+            for tables in configs
+        ]
+
+        context = _reflect.ReflectionContext(db)
+        result = []
+        for tables in configs:
+            del statements[:]
+            result.append(
+                dump(
+                    _schema.Schema(
+                        db,
+                        tables,
+                        {},
+                        _symbols.Symbols(),
+                        bulk=bulk,
+                        context=context,
+                    )
+                )
+            )
+    finally:
+        db.close()
+
+    assert result == expected
+    assert "persons = T(" not in result[1]
+    assert "names = T(" in result[1]
+
+    # names was reflected with persons already
+    assert not [stmt for stmt in statements if "names" in stmt]
+    assert [stmt for stmt in statements if "emails" in stmt]
+
+
+def test_schema_patterns(tmpdir, mocker):
+    """_schema.Schema() expands table name patterns"""
+    # pylint: disable = import-outside-toplevel
+    import io as _io
+
+    from gensaschema import _config
+
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        run = runner(db)
+        run("CREATE TABLE names (id INT PRIMARY KEY, last TEXT)")
+        run("CREATE TABLE audit_log (id INT PRIMARY KEY, msg TEXT)")
+        run("CREATE TABLE audit_user (id INT PRIMARY KEY, who TEXT)")
+        run(
+            """
+            CREATE TABLE persons (
+                id  INT(11) PRIMARY KEY,
+                name  INT(11) NOT NULL REFERENCES names (id)
+            );
+        """
+        )
+        explicit = _schema.Schema(
+            db,
+            [
+                ("people", "persons"),
+                ("a_audit_log", "audit_log"),
+                ("a_audit_user", "audit_user"),
+            ],
+            {},
+            _symbols.Symbols(),
+        )
+
+        conf = _config.Config.from_lines(
+            ["people = persons\n", "a_%(name)s = re:^audit_\n", "p*\n"]
+        )
+        listing = mocker.spy(
+            _sa.engine.reflection.Inspector, "get_table_names"
+        )
+        patterns = _schema.Schema(db, conf.tables, {}, _symbols.Symbols())
+    finally:
+        db.close()
+
+    assert listing.call_count == 1
+    assert patterns._names == [  # pylint: disable = protected-access
+        ("people", "persons"),
+        ("a_audit_log", "audit_log"),
+        ("a_audit_user", "audit_user"),
+    ]
+
+    expected, result = _io.StringIO(), _io.StringIO()
+    explicit.dump(expected)
+    patterns.dump(result)
+    assert result.getvalue() == expected.getvalue()
+    assert "a_audit_user = T(" in result.getvalue()
+
+
+@_pytest.mark.parametrize(
+    "bulk",
+    [False, _pytest.param(True, marks=multi_only)],
+    ids=["autoload", "bulk"],
+)
+def test_schema_observer(tmpdir, unknown_types, bulk):
+    """_schema.Schema(observer=...) reports the phases"""
+    # pylint: disable = unused-argument, import-outside-toplevel
+    import io as _io
+
+    from gensaschema import _observe
+
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    def types(tname, metadata, symbols):
+        """Type loader"""
+        metadata.bind.dialect.ischema_names[tname] = _sa.types.Integer
+
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        run = runner(db)
+        run("CREATE TABLE names (id INT PRIMARY KEY, a FOO)")
+        run(
+            "CREATE TABLE persons (id INT PRIMARY KEY,"
+            " name INT REFERENCES names (id))"
+        )
+        recorder = _observe.Recorder()
+        schema = _schema.Schema(
+            db,
+            [("persons", "persons")],
+            {},
+            _symbols.Symbols(),
+            types=types,
+            bulk=bulk,
+            observer=recorder,
+        )
+        assert not db.engine.dispatch.before_cursor_execute
+    finally:
+        db.close()
+    schema.dump(_io.StringIO())
+
+    events = dict(
+        ((event.kind, event.name), event) for event in recorder.events
+    )
+    assert ("type", "FOO") in events
+    assert ("reflect", "persons") in events
+    assert ("cycles", None) in events
+    assert ("render", "persons") in events
+    assert ("render", "names") in events
+    assert ("write", None) in events
+    assert events["build", None].statements > 0
+    assert events["reflect", "persons"].seconds >= 0
+    if bulk:
+        assert ("collect", None) in events
+    else:
+        assert events["reflect", "persons"].statements > 0
+
+    totals = recorder.totals()
+    assert totals["render"][0] == 2
+    assert recorder.slowest("render", top=1)[0].name in ("persons", "names")
+    summary = recorder.summary()
+    assert "slowest reflect:" in summary
+    assert "FOO" in summary
+
+
+@_pytest.mark.parametrize("order", ["name", "dependency"])
+def test_schema_order(tmpdir, order):
+    """_schema.Schema(order=...) determines the table order"""
+    # pylint: disable = import-outside-toplevel
+    import io as _io
+
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        run = runner(db)
+        run("CREATE TABLE z_places (id INT PRIMARY KEY)")
+        run(
+            "CREATE TABLE m_users (id INT PRIMARY KEY,"
+            " place INT REFERENCES z_places (id))"
+        )
+        run(
+            "CREATE TABLE a_orders (id INT PRIMARY KEY,"
+            " usr INT REFERENCES m_users (id),"
+            " place INT REFERENCES z_places (id))"
+        )
+        names = [("a_orders", "a_orders")]
+        schema = _schema.Schema(
+            db, names, {}, _symbols.Symbols(), order=order
+        )
+        result = _io.StringIO()
+        schema.dump(result)
+        streamed = _io.StringIO()
+        if _bulk.AVAILABLE:
+            _schema.Schema.stream(
+                db, names, {}, _symbols.Symbols(), streamed, order=order
+            )
+        with _pytest.raises(KeyError):
+            _schema.Schema(db, names, {}, _symbols.Symbols(), order="foo")
+    finally:
+        db.close()
+
+    result = result.getvalue()
+    if _bulk.AVAILABLE:
+        assert streamed.getvalue() == result
+    tables = [
+        line.split('"')[1]
+        for line in result.splitlines()
+        if line.startswith("# Table ")
+    ]
+    if order == "name":
+        assert tables == ["a_orders", "m_users", "z_places"]
+        assert result.count("# Defined at table ") == 3
+    else:
+        assert tables == ["z_places", "m_users", "a_orders"]
+        assert "# Defined at table " not in result
+        assert "# Foreign key belongs to " not in result
+
+
+def test_schema_use_alter(tmpdir):
+    """_schema.Schema(use_alter=True) renders cyclic foreign keys"""
+    # pylint: disable = import-outside-toplevel
+    import io as _io
+
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        run = runner(db)
+        run("CREATE TABLE a (id INT PRIMARY KEY, b INT REFERENCES b (id))")
+        run("CREATE TABLE b (id INT PRIMARY KEY, a INT REFERENCES a (id))")
+        results = []
+        for use_alter in (False, True):
+            result = _io.StringIO()
+            _schema.Schema(
+                db, [("a", "a")], {}, _symbols.Symbols(), use_alter=use_alter
+            ).dump(result)
+            results.append(result.getvalue())
+    finally:
+        db.close()
+
+    plain, cyclic = results
+    assert "use_alter" not in plain
+    assert "# Foreign key belongs to 'a':" in plain
+    assert "# Cyclic foreign key:" in cyclic
+    assert cyclic.count("use_alter=True") == 2
+
+
+@multi_only
+def test_schema_max_depth(tmpdir):
+    """_schema.Schema(max_depth=...) ends the closure at the boundary"""
+    # pylint: disable = import-outside-toplevel
+    import io as _io
+
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        run = runner(db)
+        # orders -> users -> places -> countries, orders -> codes
+        run("CREATE TABLE countries (id INT PRIMARY KEY, name TEXT)")
+        run(
+            "CREATE TABLE places (id INT PRIMARY KEY, name TEXT UNIQUE,"
+            " country INT REFERENCES countries (id))"
+        )
+        run(
+            "CREATE TABLE users (id INT PRIMARY KEY,"
+            " place INT REFERENCES places (id))"
+        )
+        run("CREATE TABLE codes (code CHAR(2) PRIMARY KEY)")
+        run(
+            "CREATE TABLE orders (id INT PRIMARY KEY,"
+            " usr INT REFERENCES users (id),"
+            " code CHAR(2) REFERENCES codes (code))"
+        )
+        names = [("orders", "orders")]
+
+        plan = _schema.Schema.plan(db, names)
+        assert sorted(plan.tables) == [
+            (None, name)
+            for name in ("codes", "countries", "orders", "places", "users")
+        ]
+        assert plan.boundary == []
+        assert plan.depth[None, "countries"] == 3
+
+        plan = _schema.Schema.plan(db, names, max_depth=1, stop=["cod*"])
+        assert sorted(plan.tables) == [(None, "orders"), (None, "users")]
+        assert sorted(plan.boundary) == [(None, "codes"), (None, "places")]
+
+        schema = _schema.Schema(
+            db, names, {}, _symbols.Symbols(), max_depth=1, stop=["cod*"]
+        )
+        result = _io.StringIO()
+        schema.dump(result)
+        streamed = _io.StringIO()
+        _schema.Schema.stream(
+            db,
+            names,
+            {},
+            _symbols.Symbols(),
+            streamed,
+            max_depth=1,
+            stop=["cod*"],
+        )
+    finally:
+        db.close()
+    snapshot = _io.BytesIO()
+    schema.dump_snapshot(snapshot)
+    snapshot.seek(0)
+    restored = _io.StringIO()
+    _schema.Schema.from_snapshot(snapshot, {}, _symbols.Symbols()).dump(
+        restored
+    )
+
+    result = result.getvalue()
+    assert streamed.getvalue() == result
+    assert restored.getvalue() == result
+    tables = [
+        line.split('"')[1]
+        for line in result.splitlines()
+        if line.startswith("# Table ")
+    ]
+    assert tables == ["codes", "orders", "places", "users"]
+    places = result[result.index('# Table "places"') :]
+    places = places[: places.index('# Table "users"')]
+    assert "C('country'" in places
+    assert "ForeignKey" not in places
+    assert "Unique" not in places
+    assert "PrimaryKey(places.c.id)" in places
+    assert places.startswith(
+        '# Table "places"\n# Boundary table: foreign keys and unique'
+    )
+    assert result.count("# Boundary table:") == 2
+
+
+def test_schema_snapshot_types(tmpdir, unknown_types):
+    """_schema.Schema.from_snapshot() replays the type loader"""
+    # pylint: disable = unused-argument, protected-access
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+    snapshot = _os.path.join(tmpdir, "schema.snapshot")
+    loaded = []
+
+    def types(tname, metadata, symbols):
+        """Type loader"""
+        loaded.append(tname)
+        symbols.imports["foo"] = "from foo import FOO"
+        metadata.bind.dialect.ischema_names[tname] = _sa.types.Integer
+
+    def generate(schema):
+        """Generate schema module"""
+        with open(_os.path.join(tmpdir, "schema.py"), "w") as fp:
+            schema.dump(fp)
+        with open(_os.path.join(tmpdir, "schema.py")) as fp:
+            return fp.read()
+
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        runner(db)("CREATE TABLE names (id INT PRIMARY KEY, a FOO)")
+        schema = _schema.Schema(
+            db, [("names", "names")], {}, _symbols.Symbols(), types=types
+        )
+    finally:
+        db.close()
+    with open(snapshot, "wb") as fp:
+        schema.dump_snapshot(fp)
+
+    offline = _schema.Schema.from_snapshot(
+        snapshot, {}, _symbols.Symbols(), types=types
+    )
+    assert loaded == ["FOO", "FOO"]
+    result = generate(offline)
+    assert result == generate(schema)
+    assert "from foo import FOO" in result
+
+    # Only type classes known to SQLAlchemy are instantiated
+    with open(snapshot, "rb") as fp:
+        content = _json.loads(fp.read().decode("utf-8"))
+    content["catalog"][0]["columns"][0]["type"]["cls"] = "subprocess.Popen"
+    with open(snapshot, "wb") as fp:
+        fp.write(_json.dumps(content).encode("utf-8"))
+    with _pytest.raises(_schema._snapshot.SnapshotError):
+        _schema.Schema.from_snapshot(snapshot, {}, _symbols.Symbols())
+
+    with open(snapshot, "wb") as fp:
+        fp.write(b"garbage")
+    with _pytest.raises(_schema._snapshot.SnapshotError):
+        _schema.Schema.from_snapshot(snapshot, {}, _symbols.Symbols())
+
+
+@multi_only
+def test_schema_profile(tmpdir):
+    """_schema.Schema(profile="lean") skips unneeded catalog queries"""
+    # pylint: disable = import-outside-toplevel
+    import io as _io
+
+    _warnings.simplefilter("error", _sa.exc.SAWarning)
+
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    statements = []
+    _sa.event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    db = engine.connect()
+    try:
+        runner(db)(
+            """
+            CREATE TABLE names (
+                id  INT(11) PRIMARY KEY,
+                last   VARCHAR(129) NOT NULL CHECK (last != '')
+            );
+        """
+        )
+        runner(db)("CREATE INDEX names_last ON names (lower(last))")
+        counts, results = {}, {}
+        for profile in ("lean", "full"):
+            del statements[:]
+            schema = _schema.Schema(
+                db,
+                [("names", "names")],
+                {},
+                _symbols.Symbols(),
+                profile=profile,
+            )
+            counts[profile] = len(statements)
+            results[profile] = _io.StringIO()
+            schema.dump(results[profile])
+    finally:
+        db.close()
+
+    assert counts["lean"] < counts["full"]
+    assert results["lean"].getvalue() == results["full"].getvalue()
+
+    with _pytest.raises(KeyError):
+        _schema.Schema(
+            engine, [("names", "names")], {}, _symbols.Symbols(), profile="x"
+        )
+
+
+@_pytest.mark.parametrize("generic", [False, True], ids=["sqlite", "generic"])
+def test_schema_fingerprint_types(tmpdir, mocker, unknown_types, generic):
+    """_schema.Schema.catalog_fingerprint() detects changed unknown types"""
+    # pylint: disable = unused-argument
+    if generic:
+        mocker.patch.dict(_cache._FINGERPRINTS, clear=True)
+
+    filename = _os.path.join(str(tmpdir), "tabletest.db")
+    tables = [("names", "names")]
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    db = engine.connect()
+    try:
+        run = runner(db)
+        run("CREATE TABLE names (id INT PRIMARY KEY, a FOO)")
+        first = _schema.Schema.catalog_fingerprint(engine, tables)
+        assert _schema.Schema.catalog_fingerprint(engine, tables) == first
+        run("DROP TABLE names")
+        run("CREATE TABLE names (id INT PRIMARY KEY, a BAR)")
+        second = _schema.Schema.catalog_fingerprint(engine, tables)
+    finally:
+        db.close()
+
+    assert second != first
+
+
+@_pytest.mark.parametrize("generic", [False, True], ids=["sqlite", "generic"])
+def test_schema_fingerprint(tmpdir, mocker, generic):
+    """_schema.Schema.catalog_fingerprint() detects catalog changes"""
+    if generic:
+        mocker.patch.dict(_cache._FINGERPRINTS, clear=True)
+
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+    modname = _os.path.join(tmpdir, "schema.py")
+    tables = [("persons", "persons")]
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    db = engine.connect()
+    try:
+        run = runner(db)
+        run("CREATE TABLE names (id INT(11) PRIMARY KEY)")
+        run(
+            """
+            CREATE TABLE persons (
+                id  INT(11) PRIMARY KEY,
+                name  INT(11) NOT NULL REFERENCES names (id)
+            );
+        """
+        )
+        schema = _schema.Schema(db, tables, {}, _symbols.Symbols())
+    finally:
+        db.close()
+
+    first = _schema.Schema.catalog_fingerprint(engine, tables)
+    assert _schema.Schema.catalog_fingerprint(engine, tables) == first
+    assert _schema.Schema.catalog_fingerprint(engine, tables[:0]) != first
+    assert _schema.Schema.read_fingerprint(modname) is None
+
+    with open(modname, "w") as fp:
+        schema.dump(fp)
+    assert _schema.Schema.read_fingerprint(modname) is None
+
+    with open(modname, "w") as fp:
+        schema.dump(fp, fingerprint=first)
+    assert _schema.Schema.read_fingerprint(modname) == first
+    with open(modname) as fp:
+        assert fp.read().splitlines()[2] == (
+            "# Catalog fingerprint: %s" % (first,)
+        )
+
+    # Changes of referenced tables count as well
+    db = engine.connect()
+    try:
+        runner(db)("ALTER TABLE names ADD COLUMN last VARCHAR(128)")
+    finally:
+        db.close()
+    assert _schema.Schema.catalog_fingerprint(engine, tables) != first
+
+    # Different databases with the same history differ as well
+    fingerprints = []
+    for column in ("name", "last"):
+        db = _sa.create_engine("sqlite://").connect()
+        try:
+            runner(db)(
+                "CREATE TABLE persons (id INT(11) PRIMARY KEY, %s TEXT)"
+                % (column,)
+            )
+            fingerprints.append(
+                _schema.Schema.catalog_fingerprint(db, tables)
+            )
+        finally:
+            db.close()
+    assert fingerprints[0] != fingerprints[1]
+
+
 def test_postgresql_schema_with_enums(postgres_url, tmpdir):
     _warnings.simplefilter("error", _sa.exc.SAWarning)
 
@@ -433,3 +1328,63 @@ del _sa, T, C, D, m
     if bytes is not str:
         expected = expected.replace("u'", "'").replace('u"', '"')
     assert result == expected
+
+
+@multi_only
+def test_postgresql_schema_shallow(postgres_url, tmpdir):
+    """_schema.Schema(shallow=True) stubs referenced alien tables"""
+    # pylint: disable = protected-access
+    _warnings.simplefilter("error", _sa.exc.SAWarning)
+
+    db = _sa.create_engine(postgres_url).connect()
+    try:
+        run = runner(db)
+        run(
+            """
+            CREATE SCHEMA core;
+            CREATE TABLE core.orgs (id serial PRIMARY KEY);
+            CREATE TABLE core.users (
+                id  serial PRIMARY KEY,
+                name  VARCHAR(64) NOT NULL,
+                org  INT REFERENCES core.orgs (id)
+            );
+            CREATE TABLE persons (
+                id  serial PRIMARY KEY,
+                owner  INT NOT NULL REFERENCES core.users (id)
+            );
+        """
+        )
+        schemas = [
+            _schema.Schema(
+                db,
+                [("persons", "persons")],
+                {"core": "foo.core"},
+                _symbols.Symbols(dict(type="t")),
+                shallow=shallow,
+            )
+            for shallow in (False, True)
+        ]
+    finally:
+        db.close()
+
+    filename = _os.path.join(str(tmpdir), "schema.py")
+    full, shallow = [], []
+    for schema, result in zip(schemas, (full, shallow)):
+        with open(filename, "w") as fp:
+            schema.dump(fp)
+        with open(filename) as fp:
+            result.append(fp.read())
+        result.append(
+            sorted(
+                (table.sa_table.key, [col.name for col in table.sa_table.c])
+                for table in schema._tables
+            )
+        )
+
+    assert shallow[0] == full[0]
+    assert "[_core.users.c.id]" in shallow[0]
+    assert shallow[1] == [
+        ("core.users", ["id"]),
+        ("persons", ["id", "owner"]),
+    ]
+    assert ("core.orgs", ["id"]) in full[1]
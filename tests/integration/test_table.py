@@ -27,11 +27,19 @@ Tests for gensaschema._table
 """
 __author__ = u"Andr\xe9 Malo"
 
+import gc as _gc
+import io as _io
 import os as _os
+import warnings as _warnings
+import weakref as _weakref
 
+import pytest as _pytest
 import sqlalchemy as _sa
 
+from gensaschema import _bulk
 from gensaschema import _meta
+from gensaschema import _reflect
+from gensaschema import _sqlite
 from gensaschema import _symbols
 from gensaschema import _table
 
@@ -78,3 +86,561 @@ def test_table(tmpdir):
         nullable=("" if sa_version >= (1, 4) else ", nullable=False"),
     )
     assert repr(table) == expected
+
+
+def typed_tables(engine):
+    """Create tables with unknown types"""
+    with engine.begin() as db:
+        db.execute(_sa.text("CREATE TABLE names (id INT PRIMARY KEY, a BAR)"))
+        db.execute(
+            _sa.text(
+                """
+            CREATE TABLE persons
+            (id INT PRIMARY KEY, a FOO, b BAR, c FOO,
+             name INT REFERENCES names (id))
+        """
+            )
+        )
+
+
+def type_loader(loaded):
+    """Create type loader"""
+
+    def types(tname, metadata, symbols):
+        """Type loader"""
+        assert symbols is not None
+        loaded.append(tname)
+        metadata.bind.dialect.ischema_names[tname] = _sa.types.Integer
+
+    return types
+
+
+@_pytest.mark.parametrize("shared", [True, False], ids=["shared", "separate"])
+def test_table_collection_types(tmpdir, mocker, unknown_types, shared):
+    """_table.TableCollection.by_names() loads each unknown type once"""
+    # pylint: disable = unused-argument
+    mocker.patch.object(
+        _reflect, "SHARED_CACHE", shared and _reflect.SHARED_CACHE
+    )
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    typed_tables(engine)
+    with engine.begin() as db:
+        db.execute(_sa.text("CREATE TABLE codes (code CHAR(2) PRIMARY KEY)"))
+    statements = []
+    _sa.event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    loaded = []
+    db = engine.connect()
+    try:
+        tables = _table.TableCollection.by_names(
+            _meta.BoundMetaData(db),
+            [("persons", "persons"), ("codes", "codes")],
+            {},
+            _symbols.Symbols(),
+            types=type_loader(loaded),
+        )
+    finally:
+        db.close()
+
+    assert loaded == ["FOO", "BAR"]
+    assert "NullType" not in "".join(map(repr, tables))
+    assert sorted(table.varname for table in tables) == [
+        "codes",
+        "names",
+        "persons",
+    ]
+    codes = 1 if _reflect.SHARED_CACHE else 2
+    for name, count in (("codes", codes), ("names", 2), ("persons", 2)):
+        reflected = [
+            stmt
+            for stmt in statements
+            if "table_xinfo" in stmt and '"%s"' % (name,) in stmt
+        ]
+        # The reflection reuses a shared pre-scan, unless types were unknown
+        expected = count if _reflect.MULTI else 1
+        assert len(reflected) == expected, name
+
+
+def test_table_collection_type_registry(tmpdir, unknown_types):
+    """_reflect.TypeRegistry memoizes and persists the loaded types"""
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+    typefile = _os.path.join(tmpdir, "types.json")
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    typed_tables(engine)
+
+    def build(types, symbols):
+        """Build table collection"""
+        db = engine.connect()
+        try:
+            return _table.TableCollection.by_names(
+                _meta.BoundMetaData(db),
+                [("persons", "persons")],
+                {},
+                symbols,
+                types=types,
+            )
+        finally:
+            db.close()
+
+    loaded = []
+    registry = _reflect.TypeRegistry.from_file(type_loader(loaded), typefile)
+    symbols = _symbols.Symbols()
+    build(registry, symbols)
+    build(registry, symbols)
+    assert loaded == ["FOO", "BAR"]
+    assert registry.loaded(symbols) == ["FOO", "BAR"]
+
+    # The registry does not keep the symbol tables alive
+    ref = _weakref.ref(symbols)
+    del symbols
+    _gc.collect()
+    assert ref() is None
+    assert not list(registry._symbols)  # pylint: disable = protected-access
+
+    # Another symbol table needs its own loader calls (preloaded, sorted)
+    build(registry, _symbols.Symbols())
+    assert loaded == ["FOO", "BAR", "BAR", "FOO"]
+
+    with open(typefile, "w") as fp:
+        registry.dump(fp)
+
+    # Binary streams receive the same content, encoded
+    binary = _io.BytesIO()
+    registry.dump(binary)
+    with open(typefile) as fp:
+        assert binary.getvalue().decode("utf-8") == fp.read()
+
+    # Next run: the types are preloaded without running into warnings
+    for key in ("FOO", "BAR"):
+        del unknown_types[key]
+    del loaded[:]
+    registry = _reflect.TypeRegistry.from_file(type_loader(loaded), typefile)
+    with _warnings.catch_warnings(record=True) as recorded:
+        _warnings.simplefilter("always", _sa.exc.SAWarning)
+        build(registry, _symbols.Symbols())
+    assert loaded == ["BAR", "FOO"]
+    assert not recorded
+
+
+@_pytest.mark.skipif(
+    tuple(map(int, _sa.__version__.split(".")[:2])) < (1, 4),
+    reason="Autoloading through an inspector needs SQLAlchemy 1.4+",
+)
+def test_table_collection_sqlite_prefetch(tmpdir):
+    """_table.TableCollection.by_names(prefetch=True) reads in bulk"""
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    engine = _sa.create_engine(
+        "sqlite:///%s" % (filename,), poolclass=_sa.pool.NullPool
+    )
+    statements = []
+    _sa.event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    def build(options):
+        """Build table collection"""
+        del statements[:]
+        db = engine.connect()
+        try:
+            with db.begin():
+                db.execute(_sa.text("ATTACH DATABASE ':memory:' AS extra"))
+                db.execute(
+                    _sa.text("CREATE TABLE extra.codes (code CHAR(2))")
+                )
+                db.execute(_sa.text("CREATE TEMP TABLE scratch (id INT)"))
+            return _table.TableCollection.by_names(
+                _meta.BoundMetaData(db),
+                [
+                    ("persons", "persons"),
+                    ("codes", "extra.codes"),
+                    ("scratch", "scratch"),
+                ],
+                {},
+                _symbols.Symbols(),
+                **options
+            )
+        finally:
+            db.close()
+
+    with engine.begin() as db:
+        for stmt in (
+            """
+            CREATE TABLE names (
+                id  INT(11),
+                first  VARCHAR(128) DEFAULT 'x',
+                last   VARCHAR(129) NOT NULL,
+                PRIMARY KEY (id, last),
+                CONSTRAINT uq_names UNIQUE (first)
+            )
+            """,
+            "CREATE INDEX names_last ON names (last)",
+            """
+            CREATE TABLE persons (
+                id  INTEGER PRIMARY KEY,
+                name  INT(11) NOT NULL,
+                last  VARCHAR(129) NOT NULL,
+                boss  INT,
+                CONSTRAINT fk_boss FOREIGN KEY (boss)
+                    REFERENCES persons (id) ON DELETE CASCADE,
+                CONSTRAINT fk_name FOREIGN KEY (name, last)
+                    REFERENCES names (id, last),
+                CHECK (boss != id)
+            )
+            """,
+            "CREATE UNIQUE INDEX persons_name ON persons (name, last)",
+        ):
+            db.execute(_sa.text(stmt))
+
+    for options in ({}, dict(bulk=True)):
+        fast = build(dict(options, prefetch=True))
+        fast_statements = list(statements)
+        slow = build(options)
+        assert [repr(table) for table in fast] == [
+            repr(table) for table in slow
+        ]
+        assert len(fast_statements) < len(statements)
+        if options:
+            # Pooled connections don't see temp tables and attached
+            # databases, they fall back to the bound connection.
+            continue
+        assert not [
+            stmt
+            for stmt in fast_statements
+            if stmt.startswith("PRAGMA") and "(" in stmt
+        ]
+
+    # The shared dialect is left alone
+    assert "_get_table_pragma" not in vars(engine.dialect)
+    assert "_get_table_sql" not in vars(engine.dialect)
+
+
+@_pytest.mark.skipif(
+    tuple(map(int, _sa.__version__.split(".")[:2])) < (1, 4),
+    reason="Autoloading through an inspector needs SQLAlchemy 1.4+",
+)
+def test_table_collection_sqlite_prefetch_engine(tmpdir):
+    """_table.TableCollection.by_names(prefetch=True) reads once per engine"""
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    statements = []
+    _sa.event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    with engine.begin() as db:
+        db.execute(_sa.text("CREATE TABLE t0 (id INT PRIMARY KEY)"))
+        for idx in range(1, 30):
+            db.execute(
+                _sa.text(
+                    "CREATE TABLE t%d (id INT PRIMARY KEY,"
+                    " up INT REFERENCES t%d (id))" % (idx, idx - 1)
+                )
+            )
+
+    def build(options):
+        """Build table collection"""
+        del statements[:]
+        return _table.TableCollection.by_names(
+            _meta.BoundMetaData(engine),
+            [("t29", "t29")],
+            {},
+            _symbols.Symbols(),
+            **options
+        )
+
+    for options in ({}, dict(bulk=True)):
+        fast = build(dict(options, prefetch=True))
+        scans = [stmt for stmt in statements if "sqlite_master" in stmt]
+        slow = build(options)
+        assert [repr(table) for table in fast] == [
+            repr(table) for table in slow
+        ]
+        assert len(fast) == 30
+
+        # Each kind of catalog read runs once per schema, not once per
+        # table
+        assert len(scans) == len(set(scans))
+        assert len(scans) < 30
+
+
+def test_sqlite_catalog_failure(tmpdir):
+    """_sqlite.Catalog leaves failing catalog reads to the dialect"""
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    with engine.begin() as db:
+        db.execute(_sa.text("CREATE TABLE names (id INT PRIMARY KEY)"))
+
+    catalog = _sqlite.Catalog(engine.dialect)
+    with engine.connect() as db:
+        assert catalog.table_sql(db, "names", "main")
+        assert catalog.pragma(db, "table_info", "names", "main")
+
+        # Unknown schema
+        assert catalog.table_sql(db, "names", "nope") is None
+        assert catalog.pragma(db, "table_info", "names", "nope") is None
+        assert catalog.pragma(db, "foreign_key_list", "names", "nope") is None
+
+
+def test_sqlite_catalog_shadowing(tmpdir):
+    """_sqlite.Catalog reads a table from one schema only"""
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    catalog = _sqlite.Catalog(engine.dialect)
+    with engine.connect() as db:
+        db.execute(_sa.text("CREATE TABLE names (id INT PRIMARY KEY)"))
+        db.execute(_sa.text("CREATE TABLE persons (id INT PRIMARY KEY)"))
+        db.execute(
+            _sa.text(
+                "CREATE TEMP TABLE persons (id INT PRIMARY KEY, other INT,"
+                " name INT REFERENCES names (id))"
+            )
+        )
+        db.execute(_sa.text("CREATE TEMP TABLE scratch (id INT)"))
+
+        assert "other" not in catalog.table_sql(db, "persons", None)
+        assert len(catalog.pragma(db, "table_info", "persons", None)) == 1
+        assert catalog.pragma(db, "foreign_key_list", "persons", None) == []
+        assert catalog.pragma(db, "foreign_key_list", "persons", "temp")
+        assert catalog.pragma(db, "table_info", "scratch", None)
+        assert catalog.pragma(db, "table_info", "nope", None) is None
+
+
+def test_table_collection_session(tmpdir, mocker):
+    """_table.TableCollection.by_names() shares one reflection session"""
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    engine = _sa.create_engine("sqlite:///%s" % (filename,))
+    with engine.begin() as db:
+        db.execute(_sa.text("CREATE TABLE names (id INT PRIMARY KEY)"))
+        db.execute(
+            _sa.text(
+                "CREATE TABLE persons (id INT PRIMARY KEY,"
+                " name INT REFERENCES names (id))"
+            )
+        )
+        db.execute(
+            _sa.text(
+                "CREATE TABLE emails (id INT PRIMARY KEY,"
+                " name INT REFERENCES names (id))"
+            )
+        )
+
+    policy = mocker.spy(_reflect, "warning_policy")
+    db = engine.connect()
+    try:
+        meta = _meta.BoundMetaData(db)
+        session = _reflect.ReflectionSession(meta, _symbols.Symbols())
+        tables = _table.TableCollection.by_names(
+            meta,
+            [("persons", "persons"), ("emails", "emails")],
+            {},
+            _symbols.Symbols(),
+            session=session,
+        )
+    finally:
+        db.close()
+
+    assert sorted(table.varname for table in tables) == [
+        "emails",
+        "names",
+        "persons",
+    ]
+    assert policy.call_count == 1
+    if sa_version >= (1, 4):
+        assert session.autoload_with is session.inspector
+        assert session.inspector.info_cache
+
+
+def test_table_collection_cycles(tmpdir):
+    """_table.TableCollection.by_names(use_alter=True) breaks the cycles"""
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        with db.begin():
+            # a <-> b, b -> c -> d -> b, e -> e (self reference), f -> a,
+            # g <-> h, g -> g (self reference within a cycle)
+            for stmt in (
+                "CREATE TABLE a (id INT PRIMARY KEY, b INT REFERENCES b)",
+                "CREATE TABLE b (id INT PRIMARY KEY, a INT REFERENCES a,"
+                " c INT REFERENCES c)",
+                "CREATE TABLE c (id INT PRIMARY KEY, d INT REFERENCES d)",
+                "CREATE TABLE d (id INT PRIMARY KEY, b INT REFERENCES b)",
+                "CREATE TABLE e (id INT PRIMARY KEY, e INT REFERENCES e)",
+                "CREATE TABLE f (id INT PRIMARY KEY, a INT REFERENCES a)",
+                "CREATE TABLE g (id INT PRIMARY KEY, g INT REFERENCES g,"
+                " h INT REFERENCES h)",
+                "CREATE TABLE h (id INT PRIMARY KEY, g INT REFERENCES g)",
+            ):
+                db.execute(_sa.text(stmt))
+
+        def build(**options):
+            """Build table collection, return the deferred foreign keys"""
+            metadata = _meta.BoundMetaData(db)
+            _table.TableCollection.by_names(
+                metadata,
+                [("f", "f"), ("e", "e"), ("g", "g")],
+                {},
+                _symbols.Symbols(),
+                **options
+            )
+            return metadata, sorted(
+                (fkey.parent.table.name, fkey.column.table.name)
+                for sa_table in metadata.tables.values()
+                for fkey in sa_table.foreign_keys
+                if fkey.use_alter
+            )
+
+        # The foreign keys are left alone by default
+        assert build()[1] == []
+
+        metadata, deferred = build(use_alter=True)
+    finally:
+        db.close()
+
+    assert deferred == [("a", "b"), ("b", "c"), ("g", "h")]
+
+    with _warnings.catch_warnings(record=True) as recorded:
+        _warnings.simplefilter("always", _sa.exc.SAWarning)
+        assert len(metadata.sorted_tables) == 8
+    assert not recorded
+
+
+@_pytest.mark.skipif(
+    not _bulk.AVAILABLE, reason="Bulk reflection not available"
+)
+def test_stream_release(tmpdir):
+    """_table.stream() drops the catalog information of built tables"""
+    # pylint: disable = protected-access
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        with db.begin():
+            for stmt in (
+                "CREATE TABLE a (id INT PRIMARY KEY)",
+                "CREATE TABLE b (id INT PRIMARY KEY, a INT REFERENCES a)",
+                "CREATE TABLE c (id INT PRIMARY KEY, b INT REFERENCES b)",
+            ):
+                db.execute(_sa.text(stmt))
+
+        metadata = _meta.BoundMetaData(db)
+        symbols = _symbols.Symbols()
+        reflector = _bulk.BulkReflector(metadata, symbols)
+        seen = []
+        for table in _table.stream(
+            metadata, [("c", "c")], {}, symbols, reflector
+        ):
+            key = (None, table.sa_table.name)
+            seen.append(key[1])
+            assert reflector.collected(key)
+            assert key not in reflector._info.columns
+    finally:
+        db.close()
+
+    assert seen == ["a", "b", "c"]
+    assert not reflector._info.columns
+    assert not metadata.tables
+
+
+def test_reflect_cache_probe():
+    """_reflect._probe_cache() checks the inspector cache layout"""
+    # pylint: disable = protected-access
+
+    class Broken(object):
+        """Reflection module with a different cache layout"""
+
+        @staticmethod
+        def cache(func):
+            """Cache by function name only"""
+
+            def inner(dialect, connection, *args, **kwargs):
+                """Cached function"""
+                info_cache = kwargs.pop("info_cache")
+                if func.__name__ not in info_cache:
+                    info_cache[func.__name__] = func(
+                        dialect, connection, *args, **kwargs
+                    )
+                return info_cache[func.__name__]
+
+            return inner
+
+    assert not _reflect._probe_cache(None)
+    assert not _reflect._probe_cache(Broken)
+    if _reflect.MULTI:
+        assert _reflect._probe_cache(_reflect._sa_reflection)
+
+
+def test_bulk_fallback(tmpdir, mocker):
+    """_bulk.BulkReflector autoloads, if bulk reflection is not available"""
+    # pylint: disable = protected-access
+    tmpdir = str(tmpdir)
+    filename = _os.path.join(tmpdir, "tabletest.db")
+
+    class Table(object):
+        """Table class without the private reflection argument"""
+
+        def _autoload(self, metadata, autoload_with, _extend_on=None):
+            """Autoload"""
+
+    class Broken(object):
+        """Reflection module with an unexpected info container"""
+
+        Inspector = _sa.engine.reflection.Inspector
+
+        class _ReflectionInfo(object):
+            """Info container with a new required field"""
+
+            def __init__(self, columns, unreflectable, new_field):
+                pass
+
+    assert not _bulk._probe(None, _sa.Table)
+    assert not _bulk._probe(Broken, _sa.Table)
+    if _bulk.AVAILABLE:
+        assert _bulk._probe(_bulk._sa_reflection, _sa.Table)
+        assert not _bulk._probe(_bulk._sa_reflection, Table)
+
+    mocker.patch.object(_bulk, "AVAILABLE", False)
+    db = _sa.create_engine("sqlite:///%s" % (filename,)).connect()
+    try:
+        with db.begin():
+            db.execute(_sa.text("CREATE TABLE a (id INT PRIMARY KEY)"))
+            db.execute(
+                _sa.text(
+                    "CREATE TABLE b (id INT PRIMARY KEY, a INT REFERENCES a)"
+                )
+            )
+        metadata = _meta.BoundMetaData(db)
+        reflector = _bulk.BulkReflector(metadata, _symbols.Symbols())
+        (table,) = reflector.reflect(["b"])
+        assert reflector._info is None
+        assert sorted(metadata.tables) == ["a", "b"]
+        assert [col.name for col in table.columns] == ["id", "a"]
+
+        with _pytest.raises(NotImplementedError):
+            _bulk.BulkReflector(metadata, _symbols.Symbols(), profile="full")
+    finally:
+        db.close()
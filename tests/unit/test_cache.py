@@ -0,0 +1,120 @@
+# -*- coding: ascii -*-
+u"""
+:Copyright:
+
+ Copyright 2010 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+==============================
+ Tests for gensaschema._cache
+==============================
+
+Tests for gensaschema._cache
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import json as _json
+import os as _os
+import pickle as _pickle
+
+import pytest as _pytest
+import sqlalchemy as _sa
+
+from gensaschema import _cache
+from gensaschema import _snapshot
+
+# pylint: disable = invalid-name
+
+
+def test_store_unserializable(tmpdir):
+    """ReflectionCache.store() skips entries which cannot be serialized"""
+    directory = str(tmpdir)
+    cache = _cache.ReflectionCache(directory, "sqlite", "db")
+
+    cache.store((None, "t"), "fp", "lean", dict(columns=lambda: None))
+    assert cache.load((None, "t"), "fp", "lean") is None
+    assert _os.listdir(directory) == []
+
+    cache.store((None, "t"), "fp", "lean", dict(columns=[1, 2]))
+    assert cache.load((None, "t"), "fp", "lean") == dict(columns=[1, 2])
+
+
+def test_load_unusable(tmpdir):
+    """ReflectionCache.load() ignores files, which are no valid entries"""
+    directory = str(tmpdir)
+    cache = _cache.ReflectionCache(directory, "sqlite", "db")
+    cache.store((None, "t"), "fp", "lean", dict(columns=[1, 2]))
+    (filename,) = _os.listdir(directory)
+    filename = _os.path.join(directory, filename)
+
+    called = []
+
+    class Payload(object):
+        """Pickle payload"""
+
+        def __reduce__(self):
+            return (called.append, (True,))
+
+    for content in (
+        _pickle.dumps(dict(columns=Payload()), 2),
+        b"[1, 2]",
+        b'{"version": 1, "entry": {}}',
+        b"\xff",
+    ):
+        with open(filename, "wb") as fp:
+            fp.write(content)
+        assert cache.load((None, "t"), "fp", "lean") is None
+    assert not called
+
+
+def test_encode_decode():
+    """_cache.encode() and _cache.decode() restore reflected information"""
+    dialect = _sa.engine.url.make_url("sqlite://").get_dialect()()
+    info = dict(
+        columns=[
+            dict(
+                name="id",
+                type=_sa.types.VARCHAR(12),
+                nullable=False,
+                default=None,
+                dialect_options=dict(sqlite_autoincrement=True),
+            ),
+            dict(name="n", type=_sa.types.NUMERIC(10, 2), nullable=True),
+        ],
+        pk_constraint=dict(constrained_columns=["id"], name=None),
+        indexes=[dict(name="ix", column_sorting=dict(n=("desc",)))],
+    )
+    encoded = _cache.encode(info)
+    assert _json.loads(_json.dumps(encoded)) == encoded
+
+    result = _cache.decode(encoded, dialect)
+    assert result["pk_constraint"] == info["pk_constraint"]
+    assert result["indexes"] == info["indexes"]
+    columns = result["columns"]
+    assert isinstance(columns[0]["type"], _sa.types.VARCHAR)
+    assert columns[0]["type"].length == 12
+    assert columns[0]["dialect_options"] == dict(sqlite_autoincrement=True)
+    assert isinstance(columns[1]["type"], _sa.types.NUMERIC)
+    assert (columns[1]["type"].precision, columns[1]["type"].scale) == (
+        10,
+        2,
+    )
+
+    with _pytest.raises(_snapshot.SnapshotError):
+        _cache.encode(dict(columns=[object()]))
+    with _pytest.raises(_snapshot.SnapshotError):
+        _cache.decode(dict(type=dict(cls="foo.Bar")), dialect)
@@ -30,6 +30,8 @@ __author__ = u"Andr\xe9 Malo"
 import os as _os
 import tempfile as _tempfile
 
+import pytest as _pytest
+
 from gensaschema import _config
 
 # pylint: disable = protected-access
@@ -102,6 +104,16 @@ def test_dump():
 #
 # name = table
 #
+# Patterns select all matching tables (listed in the database):
+#
+# schema.*
+# re:^audit_
+# schema.re:^audit_
+#
+# The variable names can be built from a template then:
+#
+# audit_%(name)s = schema.*
+#
 # The basename of this file (modulo .schema extension) is used as
 # basename for the python file.
 
@@ -117,3 +129,60 @@ foo = bar
         + "\n"
     )
     fp.close()
+
+
+def test_patterns():
+    """Config keeps table patterns"""
+    inst = _config.Config.from_lines(
+        [
+            "Yo\n",
+            "billing.*\n",
+            "re:^audit_\n",
+            "log_%(name)s = logs.re:^(app|web):?$\n",
+            "some = table\n",
+            "\n",
+            "[schemas]\n",
+            "foo = bar\n",
+        ]
+    )
+    assert inst.tables == [
+        ("Yo", "Yo"),
+        ("%(name)s", "billing.*"),
+        ("%(name)s", "re:^audit_"),
+        ("log_%(name)s", "logs.re:^(app|web):?$"),
+        ("some", "table"),
+    ]
+    assert inst.schemas == {"foo": "bar"}
+
+    fp = _tempfile.TemporaryFile(mode="w+")
+    _config.Config(inst.tables, inst.schemas).dump(fp)
+    fp.seek(0, 0)
+    again = _config.Config.from_file(fp)
+    fp.close()
+    assert again.tables == inst.tables
+    assert again.schemas == inst.schemas
+
+
+def test_bracket_patterns():
+    """Config treats bracket globs as patterns, not as section headers"""
+    inst = _config.Config.from_lines(
+        [
+            "[ab]*\n",
+            "Yo\n",
+            "x_%(name)s = logs.[!_]*\n",
+            "[ tables ]\n",
+            "some = table\n",
+            "[schemas]\n",
+            "foo = bar\n",
+        ]
+    )
+    assert inst.tables == [
+        ("%(name)s", "[ab]*"),
+        ("Yo", "Yo"),
+        ("x_%(name)s", "logs.[!_]*"),
+        ("some", "table"),
+    ]
+    assert inst.schemas == {"foo": "bar"}
+
+    with _pytest.raises(_config.ConfigError):
+        _config.Config.from_lines(["Yo\n", "[extra]\n", "some = table\n"])
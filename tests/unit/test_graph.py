@@ -0,0 +1,127 @@
+# -*- coding: ascii -*-
+u"""
+:Copyright:
+
+ Copyright 2014 - 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+==============================
+ Tests for gensaschema._graph
+==============================
+
+Tests for gensaschema._graph
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import sqlalchemy as _sa
+
+from gensaschema import _graph
+
+# pylint: disable = protected-access
+
+
+def graph(edges):
+    """Make graph from "referencing:referenced ..." spec"""
+    result = _graph.ForeignKeyGraph()
+    for edge in edges.split():
+        key, remote = edge.split(":")
+        result.add((None, key), [(None, remote)] if remote else [])
+    return result
+
+
+def test_edges():
+    """ForeignKeyGraph stores each edge once"""
+    result = graph("a:b a:b b:c c:")
+    assert result.outgoing == {
+        (None, "a"): [(None, "b")],
+        (None, "b"): [(None, "c")],
+        (None, "c"): [],
+    }
+    assert result.incoming[None, "b"] == [(None, "a")]
+    assert len(result) == 3
+    assert (None, "c") in result
+    assert result.closure([(None, "b")]) == set([(None, "b"), (None, "c")])
+
+
+def test_break_cycles():
+    """ForeignKeyGraph.break_cycles() defers one edge per simple cycle"""
+    result = graph("b:a a:b b:c c:d d:b d:d e:e f:a")
+    assert sorted(map(sorted, result.components())) == [
+        [(None, "a"), (None, "b"), (None, "c"), (None, "d")]
+    ]
+    assert result.break_cycles() == set(
+        [((None, "a"), (None, "b")), ((None, "b"), (None, "c"))]
+    )
+
+    # Insertion order does not matter
+    result = graph("f:a e:e d:d d:b c:d b:c a:b b:a")
+    assert result.break_cycles() == set(
+        [((None, "a"), (None, "b")), ((None, "b"), (None, "c"))]
+    )
+
+    assert graph("a:b b:c c:").break_cycles() == set()
+
+
+def test_break_cycles_use_alter():
+    """ForeignKeyGraph.break_cycles(use_alter=True) marks the constraints"""
+    meta = _sa.MetaData()
+    left = _sa.Table(
+        "left",
+        meta,
+        _sa.Column("id", _sa.Integer, primary_key=True),
+        _sa.Column("right", _sa.Integer, _sa.ForeignKey("right.id")),
+    )
+    right = _sa.Table(
+        "right",
+        meta,
+        _sa.Column("id", _sa.Integer, primary_key=True),
+        _sa.Column("left", _sa.Integer, _sa.ForeignKey("left.id")),
+    )
+
+    result = _graph.ForeignKeyGraph.from_tables([right])
+    assert set(result.tables) == set([(None, "left"), (None, "right")])
+    edges = set([((None, "left"), (None, "right"))])
+
+    # Not by default
+    assert result.break_cycles() == edges
+    assert [fkey.use_alter for fkey in left.foreign_keys] == [False]
+
+    assert result.break_cycles(use_alter=True) == edges
+    assert [fkey.use_alter for fkey in left.foreign_keys] == [True]
+    assert [fkey.use_alter for fkey in right.foreign_keys] == [False]
+
+
+def test_topological():
+    """ForeignKeyGraph.topological() emits referenced tables first"""
+    result = graph("a:c b: c:b d:d e:a a:e")
+    keys = [(None, name) for name in "abcde"]
+    name = lambda key: key[1]  # noqa
+
+    # a <-> e is a cycle, a -> e is deferred
+    assert result.break_cycles() == set([((None, "a"), (None, "e"))])
+    assert [key[1] for key in result.topological(keys, name)] == list("bcade")
+
+    # Tables outside the keys are ignored, the sort key decides otherwise
+    assert [
+        key[1] for key in result.topological(keys[:2] + keys[3:], name)
+    ] == list("abde")
+    assert [
+        key[1]
+        for key in result.topological(
+            keys[:2] + keys[3:], lambda key: -ord(key[1])
+        )
+    ] == list("dbae")
@@ -0,0 +1,228 @@
+# -*- coding: ascii -*-
+u"""
+:Copyright:
+
+ Copyright 2025
+ Andr\xe9 Malo or his licensors, as applicable
+
+:License:
+
+ Licensed under the Apache License, Version 2.0 (the "License");
+ you may not use this file except in compliance with the License.
+ You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+ Unless required by applicable law or agreed to in writing, software
+ distributed under the License is distributed on an "AS IS" BASIS,
+ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ See the License for the specific language governing permissions and
+ limitations under the License.
+
+================================
+ Tests for gensaschema._symbols
+================================
+
+Tests for gensaschema._symbols
+"""
+__author__ = u"Andr\xe9 Malo"
+
+import pytest as _pytest
+
+from gensaschema import _symbols
+
+# pylint: disable = protected-access
+
+
+def test_conflicts():
+    """Symbols detects symbol and identifier conflicts"""
+    symbols = _symbols.Symbols()
+    symbols[u"table_a"] = "a"
+    symbols[u"table_a"] = "a"
+    symbols[u"alias_a"] = "a"
+    assert symbols.owners("a") == set([u"table_a", u"alias_a"])
+
+    with _pytest.raises(_symbols.SymbolException) as e:
+        symbols[u"table_a"] = "T"
+    assert "Symbol conflict" in str(e.value)
+
+    with _pytest.raises(_symbols.SymbolException) as e:
+        symbols[u"table_a"] = "b"
+    assert "Symbol identifier conflict" in str(e.value)
+
+    with _pytest.raises(_symbols.SymbolException):
+        symbols[u"table_b"] = "class"
+
+
+def test_delete():
+    """Deleting a symbol updates the reverse index"""
+    symbols = _symbols.Symbols()
+    symbols[u"table_a"] = "a"
+    symbols[u"alias_a"] = "a"
+
+    del symbols[u"table_a"]
+    del symbols[u"table_a"]
+    assert symbols.owners("a") == set([u"alias_a"])
+
+    del symbols[u"alias_a"]
+    assert symbols.owners("a") == set()
+    assert "a" not in symbols._owners
+
+    symbols[u"table_a"] = "b"
+    assert symbols[u"table_a"] == "b"
+
+
+class _ScanCounter(dict):
+    """Dict counting full scans of its contents"""
+
+    scans = 0
+
+    def _scan(self, method, *args):
+        """Count a scan and run it"""
+        _ScanCounter.scans += 1
+        return getattr(dict, method)(self, *args)
+
+    def __iter__(self):
+        """Scan"""
+        return self._scan("__iter__")
+
+    def keys(self):
+        """Scan"""
+        return self._scan("keys")
+
+    def values(self):
+        """Scan"""
+        return self._scan("values")
+
+    def items(self):
+        """Scan"""
+        return self._scan("items")
+
+
+def test_scaling(monkeypatch):
+    """Registering and looking up symbols never scans the symbol table"""
+    symbols = _symbols.Symbols()
+    monkeypatch.setattr(_ScanCounter, "scans", 0)
+    symbols._symbols = _ScanCounter(symbols._symbols)
+    symbols._owners = _ScanCounter(symbols._owners)
+
+    count = 50000
+    for idx in range(count):
+        symbols[u"table_t%d" % (idx,)] = "t%d" % (idx,)
+    for idx in range(count):
+        name = u"table_t%d" % (idx,)
+        symbols[name] = "t%d" % (idx,)
+        assert name in symbols
+        assert symbols[name] == "t%d" % (idx,)
+        assert symbols.owners("t%d" % (idx,)) == set([name])
+    with _pytest.raises(_symbols.SymbolException):
+        symbols[u"table_t0"] = "t1"
+
+    assert _ScanCounter.scans == 0
+
+
+def test_imports():
+    """Imports keep their order and detect conflicts"""
+    imports = _symbols._Imports(
+        imports=[(u"b", "import b"), (u"a", "import a")]
+    )
+    imports[u"b"] = "import b"
+    imports[u"c"] = "import c"
+    assert u"a" in imports
+    assert u"d" not in imports
+    assert list(imports) == ["import b", "import a", "import c"]
+
+    with _pytest.raises(_symbols.SymbolException) as e:
+        imports[u"a"] = "import aa"
+    assert "Import conflict" in str(e.value)
+
+
+def test_import_lines():
+    """Import lines are rendered, sorted and cached"""
+    symbols = _symbols.Symbols()
+    symbols.imports[u"b"] = "import b as %(b)s"
+    symbols.imports[u"a"] = "import a"
+    symbols[u"b"] = "_b"
+
+    lines = symbols.imports.lines(symbols)
+    assert lines == ["import a", "import b as _b"]
+    lines.append("")
+    assert symbols.imports.lines(symbols) is not lines
+    assert symbols.imports.lines(symbols) == ["import a", "import b as _b"]
+
+    symbols.imports[u"0"] = "import 0"
+    assert symbols.imports.lines(symbols)[0] == "import 0"
+
+    del symbols[u"b"]
+    symbols[u"b"] = "__b"
+    assert symbols.imports.lines(symbols)[-1] == "import b as __b"
+
+
+def test_import_lines_symbols(mocker):
+    """Import lines are not shared between symbol tables"""
+    # Ids of collected objects are reused
+    mocker.patch.object(_symbols, "id", create=True, return_value=1)
+
+    imports = _symbols._Imports([(u"b", "import b as %(b)s")])
+    first = _symbols.Symbols(dict(b="_b"))
+    second = _symbols.Symbols(dict(b="__b"))
+    assert first._generation == second._generation
+    assert imports.lines(first) == ["import b as _b"]
+    assert imports.lines(second) == ["import b as __b"]
+
+
+def test_resolve_types(mocker):
+    """Types are resolved along the MRO and cached"""
+    import sqlalchemy as _sa
+
+    class Base(_sa.types.TypeDecorator):
+        """Custom base type"""
+
+        impl = _sa.Integer
+
+    class Derived(Base):
+        """Derived custom type"""
+
+    class Other(object):
+        """Unresolvable type"""
+
+    mocker.patch.object(_symbols, "_CATALOGS", {})
+    load = mocker.spy(_symbols, "_load_dotted")
+    symbols = _symbols.Symbols(symbols=dict(custom="ct"))
+
+    assert symbols.types.resolve(_sa.Integer(), "sqlite") == "_sa.types"
+    assert symbols.types.resolve(_sa.Integer(), "sqlite") == "_sa.types"
+    count = load.call_count
+    assert count
+
+    for _ in range(2):
+        with _pytest.raises(_symbols.SymbolException):
+            symbols.types.resolve(Derived(), "sqlite")
+        with _pytest.raises(_symbols.SymbolException):
+            symbols.types.resolve(Other(), "sqlite")
+    assert load.call_count == count
+
+    symbols.types[Base] = "custom"
+    assert symbols.types.resolve(Derived(), "sqlite") == "ct"
+    assert symbols.types.resolve(_sa.Integer(), "sqlite") == "_sa.types"
+    assert symbols.types.resolve(_sa.Integer(), "nope") == "_sa.types"
+    assert load.call_count == count + 1
+
+    symbols.types[Derived] = "type"
+    assert symbols.types.resolve(Derived(), "sqlite") == "t"
+    assert symbols.types.resolve(Base(), "sqlite") == "ct"
+
+
+def test_catalog(mocker):
+    """Type catalogs are built once per module"""
+    mocker.patch.object(_symbols, "_CATALOGS", {})
+    load = mocker.spy(_symbols, "_load_dotted")
+
+    names = _symbols._catalog("sqlalchemy.dialects.sqlite")
+    assert "JSON" in names
+    assert "DATETIME" in names
+    assert not [name for name in names if name.startswith("_")]
+    assert _symbols._catalog("sqlalchemy.dialects.sqlite") is names
+    assert _symbols._catalog("sqlalchemy.dialects.nope") == frozenset()
+    assert _symbols._catalog("sqlalchemy.dialects.nope") == frozenset()
+    assert load.call_count == 2